@@ -0,0 +1,69 @@
+"""
+匯入時間基準測試
+以 python -X importtime 測量各進入點的冷啟動匯入時間，並列出最耗時的模組
+
+用法:
+    python scripts/bench_import.py
+    python scripts/bench_import.py --runs 10 --top 20 src.mcp_server.main
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+DEFAULT_MODULES = ["src.shared.config", "src.mcp_server.main", "src.discord_bot.main"]
+
+
+def measure_import(module: str) -> Tuple[int, Dict[str, int]]:
+    """在新的直譯器中匯入模組，回傳總累計時間與各模組累計時間（微秒）"""
+    env = dict(os.environ, PYTHONPATH=str(PROJECT_ROOT))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"匯入 {module} 失敗:\n{result.stderr[-2000:]}")
+    
+    cumulative: Dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, total_us, name = [part.strip() for part in line.replace("import time:", "|", 1).split("|")]
+        cumulative[name] = int(total_us)
+    return cumulative.get(module, 0), cumulative
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="測量進入點的匯入時間")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--runs", type=int, default=5, help="每個模組量測次數")
+    parser.add_argument("--top", type=int, default=10, help="列出最耗時的模組數量")
+    args = parser.parse_args(argv)
+    
+    for module in args.modules:
+        totals = []
+        breakdown: Dict[str, int] = {}
+        for _ in range(args.runs):
+            total, breakdown = measure_import(module)
+            totals.append(total)
+        
+        print(f"{module}: 中位數 {statistics.median(totals) / 1000:.1f} ms "
+              f"(最小 {min(totals) / 1000:.1f} ms, {args.runs} 次)")
+        slowest = sorted(
+            ((name, us) for name, us in breakdown.items() if name != module and ("." not in name or name.startswith("src."))),
+            key=lambda item: item[1], reverse=True
+        )[:args.top]
+        for name, us in slowest:
+            print(f"    {us / 1000:8.1f} ms  {name}")
+    
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+MCP 協定基準測試
+測量 stdio 與 POST /mcp 共用的 JSON-RPC 處理器每次呼叫的額外成本（解析、分派、序列化），
+工具以立即回傳的假服務取代，不包含資料庫與派送
+
+用法:
+    python scripts/bench_mcp.py
+    python scripts/bench_mcp.py --iterations 50000
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.mcp_server import jsonrpc  # noqa: E402
+from src.mcp_server.auth import ADMIN_PRINCIPAL  # noqa: E402
+from src.mcp_server.jsonrpc import MCPProtocol  # noqa: E402
+from src.mcp_server.tools import build_tools  # noqa: E402
+
+
+class InstantService:
+    """立即回傳的通知服務"""
+    
+    async def submit_notification(self, notification_data, principal, idempotency_key=None):
+        return {"notification_id": "12345678-0000-0000-0000-000000000000", "message": "通知建立成功，正在處理發送"}
+    
+    async def update_work_status(self, status_data, principal):
+        return {"message": "工作狀態更新成功"}
+
+
+async def measure(protocol: MCPProtocol, line: bytes, iterations: int) -> float:
+    """完整處理一行訊息（解析、處理、序列化回應）的平均微秒數"""
+    async def once():
+        response = await protocol.handle_payload(jsonrpc.loads(line), ADMIN_PRINCIPAL)
+        jsonrpc.dumps(response)
+    
+    await once()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await once()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+async def run(iterations: int):
+    service = InstantService()
+    protocol = MCPProtocol("bench", "1.0.0", build_tools(lambda: service))
+    cases = {
+        "ping": {"method": "ping"},
+        "tools/list": {"method": "tools/list"},
+        "send_notification": {"method": "tools/call", "params": {"name": "send_notification", "arguments": {
+            "title": "步驟完成", "content": "已完成資料遷移並通過所有測試", "priority": "high"
+        }}},
+        "update_work_status": {"method": "tools/call", "params": {"name": "update_work_status", "arguments": {
+            "project_id": "p1", "current_task": "實作 API", "progress": 40
+        }}},
+    }
+    
+    print(f"JSON: {'orjson' if jsonrpc.orjson is not None else 'json'}")
+    for name, message in cases.items():
+        line = jsonrpc.dumps({"jsonrpc": "2.0", "id": 1, **message})
+        print(f"{name:<20} {await measure(protocol, line, iterations):8.2f} µs/次")
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="測量 MCP 協定處理時間")
+    parser.add_argument("--iterations", type=int, default=20000, help="每個案例的執行次數")
+    args = parser.parse_args(argv)
+    
+    asyncio.run(run(args.iterations))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
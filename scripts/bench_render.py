@@ -0,0 +1,66 @@
+"""
+嵌入訊息渲染基準測試
+測量單則通知、摘要（快取命中與未命中）與專案列表的平均渲染時間
+
+用法:
+    python scripts/bench_render.py
+    python scripts/bench_render.py --iterations 50000
+"""
+
+import argparse
+import sys
+import timeit
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.discord_bot import rendering  # noqa: E402
+
+
+def sample_items(count: int, offset: int = 0) -> List[dict]:
+    return [
+        {
+            "notification_id": f"{offset + index:08d}-0000-0000-0000-000000000000",
+            "type": "status" if index % 2 else "milestone",
+            "title": f"步驟 {offset + index} 完成",
+            "content": "已完成資料遷移並通過所有測試，準備進行下一個步驟。" * 2
+        }
+        for index in range(count)
+    ]
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="測量嵌入訊息渲染時間")
+    parser.add_argument("--iterations", type=int, default=20000, help="每個案例的執行次數")
+    args = parser.parse_args(argv)
+    
+    items = sample_items(20)
+    projects = [
+        {"name": f"專案 {index}", "progress": index * 9, "current_task": "實作 API", "status": "active"}
+        for index in range(10)
+    ]
+    counter = iter(range(10 ** 9))
+    
+    cases = {
+        "通知": lambda: rendering.build_notification_embed(
+            "12345678-0000-0000-0000-000000000000", "question", "部署到正式環境？", "請確認是否部署 v2.1", "high"
+        ),
+        "摘要（快取命中）": lambda: rendering.build_digest_embed("p1", items),
+        "摘要（未命中）": lambda: rendering.build_digest_embed("p1", sample_items(20, next(counter) * 20)),
+        "專案列表（快取命中）": lambda: rendering.build_projects_embed(projects),
+        "進度條": lambda: rendering.progress_bar(57),
+    }
+    
+    for name, case in cases.items():
+        case()
+        seconds = timeit.timeit(case, number=args.iterations)
+        print(f"{name:<16} {seconds / args.iterations * 1e6:8.2f} µs/次")
+    
+    cache = rendering.embed_cache
+    print(f"快取: {len(cache)} 筆, 命中 {cache.hits}, 未命中 {cache.misses}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
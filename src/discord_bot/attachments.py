@@ -0,0 +1,58 @@
+"""
+附件送出模組
+從 MCP Server 串流下載大型內容：文字內容不長時分頁成多則嵌入訊息，
+否則以檔案附件送出（超過記憶體門檻的部分暫存在磁碟，不整份載入記憶體）
+"""
+
+import tempfile
+from typing import Dict, List, Optional
+
+import httpx
+
+
+# 下載內容超過此大小時改暫存到磁碟
+SPOOL_MAX_BYTES = 1024 * 1024
+# UTF-8 每個字元最多 4 bytes，用於在下載前判斷文字是否可能放得進分頁
+MAX_BYTES_PER_CHAR = 4
+
+TEXT_CONTENT_TYPES = ("text/", "application/json", "application/x-ndjson", "application/xml")
+
+
+def is_text(content_type: Optional[str]) -> bool:
+    """是否為可直接顯示的文字內容"""
+    return bool(content_type) and content_type.startswith(TEXT_CONTENT_TYPES)
+
+
+def split_pages(text: str, page_chars: int) -> List[str]:
+    """把文字切成不超過 page_chars 的分頁，盡量在換行處切開"""
+    pages = []
+    while len(text) > page_chars:
+        cut = text.rfind("\n", 0, page_chars)
+        if cut <= page_chars // 2:
+            cut = page_chars
+        pages.append(text[:cut])
+        text = text[cut:].lstrip("\n")
+    if text:
+        pages.append(text)
+    return pages
+
+
+def fits_in_pages(size: int, content_type: Optional[str], page_chars: int, max_pages: int) -> bool:
+    """依大小判斷內容是否可能以分頁嵌入訊息送出（下載後仍需依實際字數確認）"""
+    return is_text(content_type) and size <= page_chars * max_pages * MAX_BYTES_PER_CHAR
+
+
+async def download_blob(http_client: httpx.AsyncClient, url: str, headers: Dict[str, str],
+                        timeout: float = 60.0) -> tempfile.SpooledTemporaryFile:
+    """串流下載內容到暫存檔（小內容保留在記憶體），回傳已移到開頭的檔案物件"""
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    try:
+        async with http_client.stream("GET", url, headers=headers, timeout=timeout) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes():
+                spool.write(chunk)
+    except Exception:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
@@ -0,0 +1,76 @@
+"""
+扇出發送模組
+把一則通知並行發送到多個訂閱目的地（頻道或使用者私訊），每個目的地各自以令牌桶限流，
+並限制同時進行的發送數量；沒有權限或目的地不存在等無法重試的錯誤與暫時性錯誤分開回報
+"""
+
+import asyncio
+from typing import Awaitable, Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+import discord
+import structlog
+
+from ..shared.ratelimit import TokenBucketLimiter
+
+
+# 重試也不會成功的錯誤（機器人沒有權限、頻道或使用者不存在、使用者關閉私訊）
+PERMANENT_ERRORS = (discord.Forbidden, discord.NotFound)
+
+DeliverySend = Callable[[], Awaitable[Optional[str]]]
+
+
+class DeliveryResult(NamedTuple):
+    """單一目的地的發送結果"""
+    key: str
+    message_id: Optional[str] = None
+    error: Optional[str] = None
+    permanent: bool = False
+    
+    @property
+    def delivered(self) -> bool:
+        return self.error is None
+    
+    def to_dict(self) -> dict:
+        return {"destination": self.key, "message_id": self.message_id, "error": self.error, "permanent": self.permanent}
+
+
+class FanoutSender:
+    """扇出發送器
+    
+    先等待目的地的令牌（同一頻道連續收到多則通知時平均分散），再取得並行名額發送，
+    等待令牌時不佔用名額，其他目的地不受影響。
+    """
+    
+    def __init__(self, rate_per_second: float = 1.0, burst: int = 5, concurrency: int = 10):
+        self.limiter = TokenBucketLimiter(rate_per_second, burst)
+        self.concurrency = concurrency
+        self.logger = structlog.get_logger(__name__)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+    
+    async def wait_turn(self, key: str):
+        """等待目的地可以再發送一則訊息"""
+        while True:
+            delay = self.limiter.acquire(key)
+            if delay is None:
+                return
+            await asyncio.sleep(delay)
+    
+    async def send_one(self, key: str, send: DeliverySend) -> DeliveryResult:
+        """發送到單一目的地，錯誤轉為發送結果而不拋出"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        
+        await self.wait_turn(key)
+        async with self._semaphore:
+            try:
+                return DeliveryResult(key, message_id=await send())
+            except PERMANENT_ERRORS as e:
+                self.logger.warning("目的地無法發送，略過", destination=key, error=str(e))
+                return DeliveryResult(key, error=str(e), permanent=True)
+            except Exception as e:
+                self.logger.error("發送到目的地失敗", destination=key, error=str(e))
+                return DeliveryResult(key, error=str(e))
+    
+    async def send_all(self, deliveries: Sequence[Tuple[str, DeliverySend]]) -> List[DeliveryResult]:
+        """並行發送到所有目的地，結果順序與輸入相同"""
+        return list(await asyncio.gather(*(self.send_one(key, send) for key, send in deliveries)))
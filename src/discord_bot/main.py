@@ -5,21 +5,48 @@ Discord Bot 主程式
 
 import asyncio
 import json
+import signal
+import time
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List
 import discord
+from discord import app_commands
 from discord.ext import commands, tasks
 import httpx
 import structlog
+import uvicorn
 
 from ..shared.config import settings, setup_logging, validate_settings, discord_config
 from ..shared.models import NotificationType, Priority
+from ..shared.polling import AdaptiveInterval
+from .attachments import download_blob, fits_in_pages, split_pages
+from .fanout import DeliveryResult, FanoutSender
+from .questions import build_answer_view, build_question_view, find_choice_label, parse_question_custom_id
+from .receipts import RECEIPT_DELIVERED, RECEIPT_READ, ReceiptBatcher
+from .rendering import (
+    DIGEST_MAX_FIELDS, build_digest_embed, build_notification_embed, build_page_embed, build_projects_embed,
+    build_search_embed, build_status_embed
+)
+from ..shared.tracing import (
+    SpanKind, TracingMiddleware, current_traceparent, inject_headers, parse_traceparent,
+    setup_tracing, shutdown_tracing, start_span
+)
 
-# 設置日誌
-logger = setup_logging()
+# 日誌在啟動時設置，匯入模組時不建立檔案或處理器
+logger = structlog.get_logger()
 
-class NotificationBot(commands.Bot):
-    """通知機器人類別"""
+# 記住最近送達的通知數量（MCP Server 重送同一通知時不重複發送）
+DELIVERY_DEDUP_SIZE = 10000
+
+class NotificationBot(commands.AutoShardedBot):
+    """通知機器人類別
+    
+    使用 AutoShardedBot：單一程序時自動依 Discord 建議分片；
+    多程序部署時以 DISCORD_SHARD_COUNT / DISCORD_SHARD_IDS 指定本程序負責的分片，
+    MCP Server 透過 /health 回報的分片資訊將通知路由到對應程序。
+    分片設定在啟動前由 apply_shard_settings() 套用，建立實例時不讀取設定。
+    """
     
     def __init__(self):
         super().__init__(
@@ -30,7 +57,57 @@ class NotificationBot(commands.Bot):
         
         self.logger = structlog.get_logger(__name__)
         self.http_client = httpx.AsyncClient()
-        self.pending_responses = {}  # 儲存等待回覆的通知
+        self.pending_responses = {}  # 訊息 ID -> (通知 ID, traceparent)，儲存等待回覆的通知
+        self.digest_messages = {}  # 摘要識別鍵 -> (訊息, 摘要項目)，用於就地編輯
+        self.delivered_notifications: "OrderedDict[str, Optional[str]]" = OrderedDict()  # 通知 ID（扇出時為 通知 ID:目的地）-> 訊息 ID
+        self.message_notifications: "OrderedDict[str, List[str]]" = OrderedDict()  # 訊息 ID -> 通知 ID（已讀回執用）
+        self.receipts: Optional[ReceiptBatcher] = None  # 啟動時依設定建立
+        self.health_interval = AdaptiveInterval(15, 600)  # 啟動時依設定覆寫
+        self.fanout = FanoutSender()  # 啟動時依設定覆寫
+        self.mcp_healthy: Optional[bool] = None
+        self.last_mcp_contact = 0.0  # 最近一次與 MCP Server 成功往來的時間（monotonic）
+    
+    def mark_mcp_contact(self):
+        """記錄與 MCP Server 成功往來（收到通知或請求成功），期間不需要另外探測"""
+        self.last_mcp_contact = time.monotonic()
+    
+    def remember_delivery(self, notification_id: str, message_id: Optional[str], delivery_key: Optional[str] = None):
+        """記錄已送達的通知（扇出時每個目的地各記錄一次），超過上限時移除最舊的紀錄"""
+        delivery_key = delivery_key or notification_id
+        self.delivered_notifications[delivery_key] = message_id
+        self.delivered_notifications.move_to_end(delivery_key)
+        while len(self.delivered_notifications) > DELIVERY_DEDUP_SIZE:
+            self.delivered_notifications.popitem(last=False)
+        if message_id is not None:
+            self.remember_message(message_id, [notification_id])
+    
+    def remember_message(self, message_id: str, notification_ids: List[str]):
+        """記錄訊息包含的通知（摘要訊息包含多則通知），用於回報已讀"""
+        self.message_notifications[message_id] = notification_ids
+        self.message_notifications.move_to_end(message_id)
+        while len(self.message_notifications) > DELIVERY_DEDUP_SIZE:
+            self.message_notifications.popitem(last=False)
+    
+    def report_receipts(self, notification_ids: List[str], status: str):
+        """加入送達或已讀回執（由批次器合併後回報）"""
+        if self.receipts is None:
+            return
+        for notification_id in notification_ids:
+            self.receipts.add(notification_id, status)
+    
+    def report_read(self, message_id) -> bool:
+        """訊息是通知訊息時回報已讀"""
+        notification_ids = self.message_notifications.get(str(message_id))
+        if not notification_ids:
+            return False
+        self.report_receipts(notification_ids, RECEIPT_READ)
+        return True
+    
+    def apply_shard_settings(self):
+        """套用分片設定（分片在連線時才啟動，必須在 start() 之前呼叫）"""
+        shard_kwargs = discord_config.shard_kwargs
+        self.shard_count = shard_kwargs.get("shard_count")
+        self.shard_ids = shard_kwargs.get("shard_ids")
     
     async def setup_hook(self):
         """設置機器人"""
@@ -43,12 +120,12 @@ class NotificationBot(commands.Bot):
             self.check_mcp_server.start()
             
         except Exception as e:
-            self.logger.error(f"機器人設置失敗: {e}")
+            self.logger.error("機器人設置失敗", error=str(e))
             raise
     
     async def on_ready(self):
         """機器人就緒事件"""
-        self.logger.info(f"Discord Bot 已登入: {self.user} (ID: {self.user.id})")
+        self.logger.info("Discord Bot 已登入", user=str(self.user), user_id=self.user.id)
         
         # 設置機器人狀態
         activity = discord.Activity(
@@ -63,27 +140,190 @@ class NotificationBot(commands.Bot):
         if message.author == self.user:
             return
         
-        # 檢查是否為回覆待處理的通知
+        # 檢查是否為回覆待處理的通知（回覆其他通知訊息視為已讀）
         if message.reference and message.reference.message_id:
+            if str(message.reference.message_id) not in self.pending_responses:
+                self.report_read(message.reference.message_id)
             await self.handle_notification_reply(message)
         
         # 處理命令
         await self.process_commands(message)
     
+    async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent):
+        """使用者在通知訊息加上表情符號時回報已讀（使用 raw 事件，訊息不在快取中也能收到）"""
+        if self.user is not None and payload.user_id == self.user.id:
+            return
+        self.report_read(payload.message_id)
+    
+    async def on_interaction(self, interaction: discord.Interaction):
+        """處理問題選項的點擊；點擊通知訊息上的其他元件時回報已讀"""
+        if interaction.type != discord.InteractionType.component or interaction.message is None:
+            return
+        
+        custom_id = interaction.data.get("custom_id")
+        question = parse_question_custom_id(custom_id, interaction.data.get("values"))
+        if question is not None:
+            await self.handle_question_answer(interaction, custom_id, *question)
+        else:
+            self.report_read(interaction.message.id)
+    
+    async def handle_question_answer(self, interaction: discord.Interaction, custom_id: str,
+                                     notification_id: str, index: int):
+        """處理問題選項回覆：先停用選項回應互動，再轉發給 MCP Server"""
+        message = interaction.message
+        choice = find_choice_label(message, custom_id, index)
+        if choice is None:
+            await interaction.response.send_message("❌ 找不到此選項", ephemeral=True)
+            return
+        
+        await interaction.response.edit_message(view=build_answer_view(message, custom_id))
+        
+        _, traceparent = self.pending_responses.get(str(message.id), (notification_id, None))
+        with start_span("discord.reply", parent=parse_traceparent(traceparent), attributes={
+            "notification.id": notification_id,
+            "discord.interaction": "component"
+        }):
+            sent = await self.send_response_to_mcp(
+                notification_id=notification_id,
+                response_text=choice,
+                user_id=str(interaction.user.id)
+            )
+        
+        if sent:
+            self.pending_responses.pop(str(message.id), None)
+            await interaction.followup.send(f"✅ 已回覆：{choice}", ephemeral=True)
+        else:
+            # 恢復選項讓使用者重試
+            await interaction.edit_original_response(view=build_answer_view(message, None))
+            await interaction.followup.send("❌ 回覆傳送失敗，請稍後再試", ephemeral=True)
+    
+    async def send_receipts_to_mcp(self, receipts: List[Dict[str, Any]]) -> bool:
+        """批次回報送達與已讀回執"""
+        headers = {
+            "Authorization": f"Bearer {settings.mcp_server_api_key}",
+            "Content-Type": "application/json"
+        }
+        
+        with start_span("mcp_server.receipts", kind=SpanKind.CLIENT, attributes={"receipts.count": len(receipts)}) as span:
+            response = await self.http_client.post(
+                f"http://{settings.mcp_server_host}:{settings.mcp_server_port}/api/v1/receipts",
+                json={"receipts": receipts},
+                headers=inject_headers(headers),
+                timeout=10.0
+            )
+            span.set_attribute("http.status_code", response.status_code)
+        
+        if response.status_code != 200 or not response.json().get("success"):
+            self.logger.error("MCP Server 回應錯誤", status_code=response.status_code)
+            return False
+        self.mark_mcp_contact()
+        self.logger.info("回執回報成功", count=len(receipts), sampled=True)
+        return True
+    
+    async def send_notification_message(self, target: discord.abc.Messageable, notification_data: Dict[str, Any],
+                                        embed: discord.Embed, view: Optional[discord.ui.View],
+                                        delivery_key: Optional[str] = None) -> str:
+        """發送通知訊息到頻道或使用者私訊，記錄送達並送出大型內容，回傳訊息 ID"""
+        notification_id = notification_data["notification_id"]
+        with start_span("discord.channel.send", attributes={
+            "notification.id": notification_id,
+            "discord.channel_id": target.id
+        }):
+            message = await target.send(embed=embed, view=view)
+            message_id = str(message.id)
+            self.remember_delivery(notification_id, message_id, delivery_key)
+            self.report_receipts([notification_id], RECEIPT_DELIVERED)
+            
+            # 如果是問題類型，記錄為待回覆
+            if notification_data["type"] == "question":
+                self.pending_responses[message_id] = (notification_id, current_traceparent())
+                await message.add_reaction("💬")
+            
+            if notification_data.get("attachment"):
+                await self.deliver_attachment(message, notification_data["attachment"])
+        return message_id
+    
+    async def resolve_destination(self, destination: Dict[str, Any]) -> discord.abc.Messageable:
+        """取得訂閱目的地（不在快取中時透過 REST API 取得，其他分片負責的頻道也能發送）"""
+        destination_id = int(destination["id"])
+        if destination.get("type") == "user":
+            return self.get_user(destination_id) or await self.fetch_user(destination_id)
+        return self.get_channel(destination_id) or await self.fetch_channel(destination_id)
+    
+    async def deliver_fanout(self, notification_data: Dict[str, Any], embed: discord.Embed,
+                             view: Optional[discord.ui.View]) -> List[DeliveryResult]:
+        """並行發送到所有訂閱目的地（重送時略過已送達的目的地）"""
+        notification_id = notification_data["notification_id"]
+        results: List[DeliveryResult] = []
+        deliveries = []
+        for destination in notification_data["destinations"]:
+            key = f"{destination.get('type', 'channel')}:{destination['id']}"
+            delivery_key = f"{notification_id}:{key}"
+            if delivery_key in self.delivered_notifications:
+                results.append(DeliveryResult(key, message_id=self.delivered_notifications[delivery_key]))
+                continue
+            
+            async def send(destination=destination, delivery_key=delivery_key) -> str:
+                target = await self.resolve_destination(destination)
+                return await self.send_notification_message(target, notification_data, embed, view, delivery_key)
+            
+            deliveries.append((key, send))
+        
+        results.extend(await self.fanout.send_all(deliveries))
+        return results
+    
+    async def deliver_attachment(self, message: discord.Message, attachment: Dict[str, Any]) -> bool:
+        """在通知訊息下方送出大型內容：文字不長時分頁為嵌入訊息，否則為檔案附件
+        
+        附件送出失敗只記錄錯誤，不影響已送達的通知。
+        """
+        filename = attachment.get("filename") or "content.txt"
+        size = attachment.get("size", 0)
+        headers = {"Authorization": f"Bearer {settings.mcp_server_api_key}"}
+        try:
+            with start_span("mcp_server.blob", kind=SpanKind.CLIENT, attributes={"blob.size": size}):
+                spool = await download_blob(
+                    self.http_client,
+                    f"http://{settings.mcp_server_host}:{settings.mcp_server_port}/api/v1/blobs/{attachment['blob_id']}",
+                    inject_headers(headers)
+                )
+            try:
+                page_chars = settings.attachment_page_chars
+                if fits_in_pages(size, attachment.get("content_type"), page_chars, settings.attachment_max_pages):
+                    pages = split_pages(spool.read().decode("utf-8", errors="replace"), page_chars)
+                    if len(pages) <= settings.attachment_max_pages:
+                        for index, page in enumerate(pages, 1):
+                            await message.reply(embed=build_page_embed(filename, page, index, len(pages)),
+                                                mention_author=False)
+                        return True
+                    spool.seek(0)
+                
+                await message.reply(file=discord.File(spool, filename=filename), mention_author=False)
+                return True
+            finally:
+                spool.close()
+        
+        except Exception as e:
+            self.logger.error("送出附件失敗", blob_id=attachment.get("blob_id"), error=str(e))
+            return False
+    
     async def handle_notification_reply(self, message):
         """處理通知回覆"""
         try:
             original_message_id = str(message.reference.message_id)
             
             if original_message_id in self.pending_responses:
-                notification_id = self.pending_responses[original_message_id]
+                notification_id, traceparent = self.pending_responses[original_message_id]
                 
-                # 發送回覆到 MCP Server
-                await self.send_response_to_mcp(
-                    notification_id=notification_id,
-                    response_text=message.content,
-                    user_id=str(message.author.id)
-                )
+                # 發送回覆到 MCP Server（接續通知的追蹤）
+                with start_span("discord.reply", parent=parse_traceparent(traceparent), attributes={
+                    "notification.id": notification_id
+                }):
+                    await self.send_response_to_mcp(
+                        notification_id=notification_id,
+                        response_text=message.content,
+                        user_id=str(message.author.id)
+                    )
                 
                 # 移除已處理的通知
                 del self.pending_responses[original_message_id]
@@ -93,11 +333,11 @@ class NotificationBot(commands.Bot):
                 await message.reply("✅ 回覆已傳送給 AI 助手！", delete_after=5)
                 
         except Exception as e:
-            self.logger.error(f"處理通知回覆失敗: {e}")
+            self.logger.error("處理通知回覆失敗", error=str(e))
             await message.add_reaction("❌")
     
-    async def send_response_to_mcp(self, notification_id: str, response_text: str, user_id: str):
-        """發送回覆到 MCP Server"""
+    async def send_response_to_mcp(self, notification_id: str, response_text: str, user_id: str) -> bool:
+        """發送回覆到 MCP Server，回傳是否成功"""
         try:
             payload = {
                 "notification_id": notification_id,
@@ -111,35 +351,82 @@ class NotificationBot(commands.Bot):
                 "Content-Type": "application/json"
             }
             
-            response = await self.http_client.post(
-                f"http://{settings.mcp_server_host}:{settings.mcp_server_port}/api/v1/responses",
-                json=payload,
-                headers=headers,
-                timeout=30.0
-            )
+            with start_span("mcp_server.response", kind=SpanKind.CLIENT) as span:
+                response = await self.http_client.post(
+                    f"http://{settings.mcp_server_host}:{settings.mcp_server_port}/api/v1/responses",
+                    json=payload,
+                    headers=inject_headers(headers),
+                    timeout=30.0
+                )
+                span.set_attribute("http.status_code", response.status_code)
             
-            if response.status_code == 200:
-                self.logger.info(f"回覆發送成功: {notification_id}")
-            else:
-                self.logger.error(f"MCP Server 回應錯誤: {response.status_code}")
+            if response.status_code == 200 and response.json().get("success"):
+                self.mark_mcp_contact()
+                self.logger.info("回覆發送成功", notification_id=notification_id)
+                return True
+            
+            self.logger.error("MCP Server 回應錯誤", status_code=response.status_code)
+            return False
                 
         except Exception as e:
-            self.logger.error(f"發送回覆到 MCP Server 失敗: {e}")
+            self.logger.error("發送回覆到 MCP Server 失敗", notification_id=notification_id, error=str(e))
+            return False
     
-    @tasks.loop(minutes=1)
-    async def check_mcp_server(self):
-        """定期檢查 MCP Server 狀態"""
+    async def probe_mcp_server(self) -> bool:
+        """呼叫 MCP Server 的存活檢查（不查詢資料庫），回傳是否正常"""
         try:
             response = await self.http_client.get(
-                f"http://{settings.mcp_server_host}:{settings.mcp_server_port}/health",
+                f"http://{settings.mcp_server_host}:{settings.mcp_server_port}/livez",
                 timeout=10.0
             )
-            
-            if response.status_code != 200:
-                self.logger.warning("MCP Server 健康檢查失敗")
-                
+            return response.status_code == 200
         except Exception as e:
-            self.logger.error(f"MCP Server 連接檢查失敗: {e}")
+            self.logger.debug("MCP Server 連接檢查失敗", error=str(e))
+            return False
+    
+    @tasks.loop(seconds=15)
+    async def check_mcp_server(self):
+        """定期檢查 MCP Server 狀態
+        
+        正常時逐步拉長探測間隔，失敗時回到最短間隔以盡快確認恢復；
+        最近有成功往來時視為正常，不另外探測。
+        """
+        if time.monotonic() - self.last_mcp_contact < self.health_interval.current:
+            healthy = True
+        else:
+            healthy = await self.probe_mcp_server()
+            if healthy:
+                self.mark_mcp_contact()
+        
+        if healthy != self.mcp_healthy:
+            if healthy:
+                self.logger.info("MCP Server 連線正常")
+            else:
+                self.logger.warning("MCP Server 健康檢查失敗")
+            self.mcp_healthy = healthy
+        
+        interval = self.health_interval.backoff() if healthy else self.health_interval.reset()
+        self.check_mcp_server.change_interval(seconds=interval)
+    
+    def get_notification_channel(self, guild_id: Optional[str] = None) -> Optional[discord.TextChannel]:
+        """取得通知發送頻道"""
+        # 指定伺服器時只在該伺服器中尋找（由 MCP Server 路由到負責的分片）
+        guilds = self.guilds
+        if guild_id:
+            guild = self.get_guild(int(guild_id))
+            if guild is None:
+                self.logger.warning("本分片程序不負責此伺服器", guild_id=guild_id)
+                return None
+            guilds = [guild]
+        
+        # 發送到用戶（這裡需要設定目標用戶 ID）
+        # 暫時發送到第一個可用的頻道
+        for guild in guilds:
+            for channel in guild.text_channels:
+                if channel.permissions_for(guild.me).send_messages:
+                    return channel
+            break
+        return None
     
     async def close(self):
         """關閉機器人"""
@@ -164,37 +451,7 @@ async def status_command(interaction: discord.Interaction):
         if response.status_code == 200:
             health_data = response.json()
             
-            embed = discord.Embed(
-                title="🤖 系統狀態",
-                color=discord.Color.green(),
-                timestamp=datetime.utcnow()
-            )
-            
-            embed.add_field(
-                name="MCP Server",
-                value=f"✅ {health_data.get('mcp_server_status', 'unknown')}",
-                inline=True
-            )
-            
-            embed.add_field(
-                name="資料庫",
-                value=f"{'✅' if health_data.get('database_status') == 'healthy' else '❌'} {health_data.get('database_status', 'unknown')}",
-                inline=True
-            )
-            
-            embed.add_field(
-                name="待處理通知",
-                value=f"📬 {health_data.get('pending_notifications', 0)} 則",
-                inline=True
-            )
-            
-            embed.add_field(
-                name="活躍專案",
-                value=f"📊 {health_data.get('active_projects', 0)} 個",
-                inline=True
-            )
-            
-            embed.set_footer(text="DC 機器人推播通知器")
+            embed = build_status_embed(health_data)
             
             await interaction.response.send_message(embed=embed)
             
@@ -202,7 +459,7 @@ async def status_command(interaction: discord.Interaction):
             await interaction.response.send_message("❌ 無法連接到 MCP Server", ephemeral=True)
             
     except Exception as e:
-        bot.logger.error(f"狀態命令失敗: {e}")
+        bot.logger.error("狀態命令失敗", error=str(e))
         await interaction.response.send_message("❌ 獲取狀態失敗", ephemeral=True)
 
 
@@ -231,6 +488,7 @@ async def help_command(interaction: discord.Interaction):
         value=(
             "`/status` - 查看系統狀態\n"
             "`/projects` - 列出活躍專案\n"
+            "`/search` - 搜尋通知與回覆\n"
             "`/settings` - 通知設定\n"
             "`/help` - 顯示此幫助"
         ),
@@ -275,26 +533,7 @@ async def projects_command(interaction: discord.Interaction):
                 await interaction.response.send_message("📋 目前沒有活躍的專案", ephemeral=True)
                 return
             
-            embed = discord.Embed(
-                title="📊 活躍專案",
-                color=discord.Color.orange(),
-                timestamp=datetime.utcnow()
-            )
-            
-            for project in projects[:10]:  # 最多顯示 10 個專案
-                progress_bar = "▓" * (project.get("progress", 0) // 10) + "░" * (10 - (project.get("progress", 0) // 10))
-                
-                embed.add_field(
-                    name=f"🎯 {project.get('name', 'Unknown')}",
-                    value=(
-                        f"**進度**: {project.get('progress', 0)}% {progress_bar}\n"
-                        f"**目前任務**: {project.get('current_task', '無') or '無'}\n"
-                        f"**狀態**: {project.get('status', '未知')}"
-                    ),
-                    inline=False
-                )
-            
-            embed.set_footer(text=f"總共 {len(projects)} 個專案")
+            embed = build_projects_embed(projects)
             
             await interaction.response.send_message(embed=embed)
             
@@ -302,15 +541,53 @@ async def projects_command(interaction: discord.Interaction):
             await interaction.response.send_message("❌ 無法獲取專案列表", ephemeral=True)
             
     except Exception as e:
-        bot.logger.error(f"專案命令失敗: {e}")
+        bot.logger.error("專案命令失敗", error=str(e))
         await interaction.response.send_message("❌ 獲取專案失敗", ephemeral=True)
 
 
+# 搜尋結果每頁顯示的筆數
+SEARCH_PAGE_SIZE = 10
+
+
+@bot.tree.command(name="search", description="搜尋通知與回覆")
+@app_commands.describe(query="搜尋關鍵字（以空白分隔多個關鍵字）", page="頁數")
+async def search_command(interaction: discord.Interaction, query: str, page: app_commands.Range[int, 1, 50] = 1):
+    """搜尋命令"""
+    try:
+        headers = {
+            "Authorization": f"Bearer {settings.mcp_server_api_key}"
+        }
+        
+        response = await bot.http_client.get(
+            f"http://{settings.mcp_server_host}:{settings.mcp_server_port}/api/v1/notifications/search",
+            params={"q": query, "limit": SEARCH_PAGE_SIZE, "offset": (page - 1) * SEARCH_PAGE_SIZE},
+            headers=headers,
+            timeout=10.0
+        )
+        
+        data = response.json() if response.status_code == 200 else {}
+        if not data.get("success"):
+            await interaction.response.send_message("❌ 搜尋失敗", ephemeral=True)
+            return
+        
+        results = data.get("data", {}).get("results", [])
+        if not results:
+            await interaction.response.send_message(f"🔍 找不到符合「{query}」的通知", ephemeral=True)
+            return
+        
+        await interaction.response.send_message(embed=build_search_embed(query, results, page), ephemeral=True)
+    
+    except Exception as e:
+        bot.logger.error("搜尋命令失敗", error=str(e))
+        await interaction.response.send_message("❌ 搜尋失敗", ephemeral=True)
+
+
 # Web API 端點（用於接收 MCP Server 的通知）
 from fastapi import FastAPI, HTTPException, Depends, Header
 from fastapi.security import HTTPBearer
 
 api_app = FastAPI(title="Discord Bot API")
+api_app.add_middleware(TracingMiddleware)
 security = HTTPBearer()
 
 
@@ -322,6 +599,7 @@ def verify_webhook_secret(authorization: str = Header(None)):
     token = authorization.replace("Bearer ", "")
     if token != settings.webhook_secret:
         raise HTTPException(status_code=401, detail="無效的 Webhook 密鑰")
+    bot.mark_mcp_contact()
     
     return token
 
@@ -339,59 +617,104 @@ async def receive_notification(
         content = notification_data["content"]
         priority = notification_data["priority"]
         
-        # 建立 Discord 嵌入訊息
-        color_map = {
-            "low": discord.Color.green(),
-            "medium": discord.Color.orange(),
-            "high": discord.Color.red(),
-            "urgent": discord.Color.dark_red()
-        }
+        # 建立 Discord 嵌入訊息（扇出到多個目的地時共用）
+        embed = build_notification_embed(notification_id, notification_type, title, content, priority)
         
-        type_emoji = {
-            "milestone": "🎯",
-            "question": "❓",
-            "alert": "⚠️",
-            "status": "📊",
-            "error": "❌"
-        }
+        # 問題通知可附帶預設選項（按鈕或下拉選單）
+        view = build_question_view(notification_id, notification_data.get("choices")) if notification_type == "question" else None
         
-        embed = discord.Embed(
-            title=f"{type_emoji.get(notification_type, '📢')} {title}",
-            description=content,
-            color=color_map.get(priority, discord.Color.blue()),
-            timestamp=datetime.utcnow()
-        )
-        
-        embed.add_field(
-            name="優先級",
-            value=f"{'🔴' if priority == 'urgent' else '🟡' if priority == 'high' else '🟢'} {priority.upper()}",
-            inline=True
-        )
+        if notification_data.get("destinations"):
+            results = await bot.deliver_fanout(notification_data, embed, view)
+            retry = [result for result in results if not result.delivered and not result.permanent]
+            if retry:
+                # 部分目的地暫時失敗，MCP Server 稍後重送整則通知，已送達的目的地會被略過
+                raise HTTPException(status_code=502, detail=f"{len(retry)} 個目的地發送失敗")
+            return {
+                "success": True,
+                "message": "通知發送成功",
+                "duplicate": False,
+                "message_id": next((result.message_id for result in results if result.message_id), None),
+                "deliveries": [result.to_dict() for result in results]
+            }
         
-        embed.set_footer(text=f"通知 ID: {notification_id[:8]}...")
+        # MCP Server 在確認送達前當機會重送同一通知，已送達時直接回覆確認
+        if notification_id in bot.delivered_notifications:
+            bot.logger.info("略過重複派送的通知", notification_id=notification_id)
+            return {
+                "success": True,
+                "message": "通知已送達",
+                "duplicate": True,
+                "message_id": bot.delivered_notifications[notification_id]
+            }
         
-        # 發送到用戶（這裡需要設定目標用戶 ID）
-        # 暫時發送到第一個可用的頻道
-        for guild in bot.guilds:
-            for channel in guild.text_channels:
-                if channel.permissions_for(guild.me).send_messages:
-                    message = await channel.send(embed=embed)
-                    
-                    # 如果是問題類型，記錄為待回覆
-                    if notification_type == "question":
-                        bot.pending_responses[str(message.id)] = notification_id
-                        await message.add_reaction("💬")
-                    
-                    break
-            break
+        channel = bot.get_notification_channel(notification_data.get("guild_id"))
+        if channel is None and notification_data.get("guild_id"):
+            # 讓 MCP Server 重新整理分片對照表後重試
+            raise HTTPException(status_code=409, detail="本分片程序不負責此伺服器")
+        message_id = None
+        if channel is not None:
+            await bot.fanout.wait_turn(f"channel:{channel.id}")
+            message_id = await bot.send_notification_message(channel, notification_data, embed, view)
         
-        return {"success": True, "message": "通知發送成功"}
+        return {"success": True, "message": "通知發送成功", "duplicate": False, "message_id": message_id}
         
+    except HTTPException:
+        raise
     except Exception as e:
-        bot.logger.error(f"處理通知失敗: {e}")
+        bot.logger.error("處理通知失敗", error=str(e))
         raise HTTPException(status_code=500, detail="處理通知失敗")
 
 
+@api_app.post("/api/notifications/digest")
+async def receive_digest(
+    digest_data: Dict[str, Any],
+    token: str = Depends(verify_webhook_secret)
+):
+    """接收來自 MCP Server 的摘要通知"""
+    try:
+        digest_key = digest_data["digest_key"]
+        items = digest_data["items"]
+        edit_in_place = digest_data.get("edit_in_place", False)
+        
+        if not items:
+            return {"success": True, "message": "摘要為空"}
+        
+        # 就地編輯既有的摘要訊息
+        if edit_in_place and digest_key in bot.digest_messages:
+            message, previous_items = bot.digest_messages[digest_key]
+            merged_items = (previous_items + items)[-DIGEST_MAX_FIELDS:]
+            try:
+                await message.edit(embed=build_digest_embed(digest_data.get("project_id"), merged_items))
+                bot.digest_messages[digest_key] = (message, merged_items)
+                bot.remember_message(str(message.id), [item["notification_id"] for item in merged_items])
+                bot.report_receipts([item["notification_id"] for item in items], RECEIPT_DELIVERED)
+                return {"success": True, "message": "摘要更新成功"}
+            except discord.NotFound:
+                # 原訊息已被刪除，改為發送新訊息
+                del bot.digest_messages[digest_key]
+        
+        channel = bot.get_notification_channel(digest_data.get("guild_id"))
+        if channel is None and digest_data.get("guild_id"):
+            raise HTTPException(status_code=409, detail="本分片程序不負責此伺服器")
+        if channel is not None:
+            with start_span("discord.channel.send", attributes={"digest.key": digest_key, "digest.size": len(items)}):
+                message = await channel.send(embed=build_digest_embed(digest_data.get("project_id"), items))
+            notification_ids = [item["notification_id"] for item in items]
+            bot.remember_message(str(message.id), notification_ids)
+            bot.report_receipts(notification_ids, RECEIPT_DELIVERED)
+            
+            if edit_in_place:
+                bot.digest_messages[digest_key] = (message, items[-DIGEST_MAX_FIELDS:])
+        
+        return {"success": True, "message": "摘要發送成功"}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        bot.logger.error("處理摘要失敗", error=str(e))
+        raise HTTPException(status_code=500, detail="處理摘要失敗")
+
+
 @api_app.get("/health")
 async def health_check():
     """健康檢查端點"""
@@ -399,24 +722,96 @@ async def health_check():
         "status": "healthy",
         "bot_ready": bot.is_ready(),
         "guilds": len(bot.guilds),
+        "shard_ids": sorted(bot.shards.keys()) if bot.shard_ids is None else sorted(bot.shard_ids),
+        "shard_count": bot.shard_count,
         "timestamp": datetime.utcnow().isoformat()
     }
 
 
+class EmbeddedAPIServer(uvicorn.Server):
+    """嵌入機器人事件迴圈的 API 伺服器（關閉訊號由 start_bot 統一處理）"""
+    
+    def install_signal_handlers(self) -> None:
+        pass
+
+
 async def start_bot():
-    """啟動機器人"""
+    """啟動機器人
+    
+    在同一個事件迴圈中執行 Discord Gateway 連線與接收通知的 API 伺服器，
+    API 端點直接使用機器人的連線與快取送出訊息，不需要跨執行緒傳遞。
+    收到 SIGINT/SIGTERM 或任一方結束時，先停止 API 伺服器（等待進行中的請求完成），
+    再關閉 Gateway 連線。
+    """
+    setup_logging()
+    setup_tracing("discord-bot")
     try:
         # 驗證設定
-        validate_settings()
-        
-        # 啟動機器人
-        await bot.start(settings.discord_bot_token)
-        
+        validate_settings("discord_bot")
     except Exception as e:
-        logger.error(f"Discord Bot 啟動失敗: {e}")
+        logger.error("Discord Bot 啟動失敗", error=str(e))
         raise
+    bot.apply_shard_settings()
+    bot.health_interval = AdaptiveInterval(settings.health_check_interval, settings.health_check_max_interval)
+    bot.fanout = FanoutSender(
+        rate_per_second=settings.fanout_destination_rate_per_second,
+        burst=settings.fanout_destination_burst,
+        concurrency=settings.fanout_concurrency
+    )
+    bot.receipts = ReceiptBatcher(
+        bot.send_receipts_to_mcp,
+        flush_seconds=settings.receipt_flush_seconds,
+        max_batch=settings.receipt_max_batch
+    )
+    
+    server = EmbeddedAPIServer(uvicorn.Config(api_app, **discord_config.api_server_kwargs))
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    installed_signals = []
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+            installed_signals.append(sig)
+        except (NotImplementedError, RuntimeError):
+            # Windows 或非主執行緒不支援，改由 KeyboardInterrupt 結束
+            pass
+    
+    bot_task = asyncio.create_task(bot.start(settings.discord_bot_token), name="discord-gateway")
+    api_task = asyncio.create_task(server.serve(), name="discord-bot-api")
+    stop_task = asyncio.create_task(stop_event.wait(), name="shutdown-signal")
+    
+    try:
+        await asyncio.wait({bot_task, api_task, stop_task}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        logger.info("正在關閉 Discord Bot...")
+        server.should_exit = True
+        await asyncio.gather(api_task, return_exceptions=True)
+        await bot.receipts.close()
+        if not bot.is_closed():
+            await bot.close()
+        await asyncio.gather(bot_task, return_exceptions=True)
+        stop_task.cancel()
+        for sig in installed_signals:
+            loop.remove_signal_handler(sig)
+        shutdown_tracing()
+    
+    for task in (bot_task, api_task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Discord Bot 異常結束", task=task.get_name(), error=str(task.exception()))
+            raise task.exception()
+
+
+def main():
+    """程式進入點（有安裝 uvloop 時使用 uvloop 事件迴圈）"""
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
+    
+    asyncio.run(start_bot())
 
 
 if __name__ == "__main__":
-    # 運行機器人
-    asyncio.run(start_bot()) 
\ No newline at end of file
+    # 運行機器人與 API 伺服器
+    main()
@@ -0,0 +1,95 @@
+"""
+問題選項模組
+為問題通知建立按鈕或下拉選單，元件的 custom_id 包含通知 ID 與選項索引，
+由 on_interaction 直接解析處理，不需要在記憶體中保存 View，機器人重新啟動後舊訊息的按鈕仍然有效
+"""
+
+from typing import Any, List, Optional, Tuple
+
+import discord
+
+
+QUESTION_CUSTOM_ID_PREFIX = "mcpq"
+
+# 選項不超過此數量時使用按鈕（一列最多 5 個），否則使用下拉選單（最多 25 個選項）
+MAX_BUTTON_CHOICES = 5
+MAX_SELECT_CHOICES = 25
+MAX_LABEL_LENGTH = 80
+
+
+def normalize_choices(choices: Any) -> List[str]:
+    """整理 metadata 中的選項（忽略空白選項與超過上限的部分）"""
+    if not isinstance(choices, list):
+        return []
+    labels = [str(choice).strip()[:MAX_LABEL_LENGTH] for choice in choices if str(choice).strip()]
+    return labels[:MAX_SELECT_CHOICES]
+
+
+def build_question_view(notification_id: str, choices: Any) -> Optional[discord.ui.View]:
+    """建立問題選項元件，沒有選項時回傳 None
+    
+    回傳的 View 已停止監聽，送出訊息時只序列化元件而不登記到 View 快取，點擊事件由 on_interaction 處理。
+    """
+    labels = normalize_choices(choices)
+    if not labels:
+        return None
+    
+    view = discord.ui.View(timeout=None)
+    if len(labels) <= MAX_BUTTON_CHOICES:
+        for index, label in enumerate(labels):
+            view.add_item(discord.ui.Button(
+                label=label,
+                style=discord.ButtonStyle.primary,
+                custom_id=f"{QUESTION_CUSTOM_ID_PREFIX}:{notification_id}:{index}"
+            ))
+    else:
+        view.add_item(discord.ui.Select(
+            custom_id=f"{QUESTION_CUSTOM_ID_PREFIX}:{notification_id}",
+            placeholder="選擇回覆",
+            options=[discord.SelectOption(label=label, value=str(index)) for index, label in enumerate(labels)]
+        ))
+    view.stop()
+    return view
+
+
+def parse_question_custom_id(custom_id: Optional[str], values: Optional[List[str]] = None) -> Optional[Tuple[str, int]]:
+    """解析問題元件的 (通知 ID, 選項索引)，不是問題元件時回傳 None"""
+    if not custom_id or not custom_id.startswith(QUESTION_CUSTOM_ID_PREFIX + ":"):
+        return None
+    
+    parts = custom_id.split(":")
+    try:
+        if len(parts) == 3:
+            return parts[1], int(parts[2])
+        if len(parts) == 2 and values:
+            return parts[1], int(values[0])
+    except ValueError:
+        pass
+    return None
+
+
+def find_choice_label(message: discord.Message, custom_id: str, index: int) -> Optional[str]:
+    """從訊息元件取得選項文字（重新啟動後也能取得，不依賴記憶體狀態）"""
+    for row in message.components:
+        for component in getattr(row, "children", [row]):
+            if getattr(component, "custom_id", None) != custom_id:
+                continue
+            if isinstance(component, discord.components.SelectMenu):
+                for option in component.options:
+                    if option.value == str(index):
+                        return option.label
+            else:
+                return component.label
+    return None
+
+
+def build_answer_view(message: discord.Message, chosen_custom_id: Optional[str]) -> discord.ui.View:
+    """依訊息元件重建選項：指定已選的選項時全部停用並把選中的按鈕標為綠色，否則恢復為可選擇"""
+    view = discord.ui.View.from_message(message, timeout=None)
+    for item in view.children:
+        item.disabled = chosen_custom_id is not None
+        if isinstance(item, discord.ui.Button):
+            chosen = chosen_custom_id is not None and item.custom_id == chosen_custom_id
+            item.style = discord.ButtonStyle.success if chosen else discord.ButtonStyle.primary
+    view.stop()
+    return view
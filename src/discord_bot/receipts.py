@@ -0,0 +1,112 @@
+"""
+送達與已讀回執模組
+收集 Discord 事件產生的回執，去重後延遲合併成批次回報給 MCP Server
+"""
+
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import structlog
+
+
+RECEIPT_DELIVERED = "delivered"
+RECEIPT_READ = "read"
+
+ReceiptSender = Callable[[List[Dict[str, Any]]], Awaitable[bool]]
+
+
+class ReceiptBatcher:
+    """回執批次器
+    
+    第一筆回執進來後等待 flush_seconds 再一起送出（期間的回執合併到同一批），
+    累積到 max_batch 筆時立即送出；同一通知的同一種回執只回報一次（例如多次加上表情符號）。
+    送出失敗時放回佇列，下一輪重試。
+    """
+    
+    def __init__(self, send: ReceiptSender, flush_seconds: float = 2.0, max_batch: int = 100,
+                 max_pending: int = 10000, remember: int = 10000):
+        self.send = send
+        self.flush_seconds = flush_seconds
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.remember = remember
+        self.dropped = 0
+        self.logger = structlog.get_logger(__name__)
+        self._pending: "OrderedDict[Tuple[str, str], None]" = OrderedDict()
+        self._reported: "OrderedDict[Tuple[str, str], None]" = OrderedDict()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushing: Optional[asyncio.Task] = None
+    
+    def __len__(self) -> int:
+        return len(self._pending)
+    
+    def add(self, notification_id: str, status: str) -> bool:
+        """加入回執，已回報或已在佇列中時回傳 False"""
+        key = (notification_id, status)
+        if key in self._pending or key in self._reported:
+            return False
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return False
+        
+        self._pending[key] = None
+        if len(self._pending) >= self.max_batch:
+            self._start_flush()
+        else:
+            self._schedule(self.flush_seconds)
+        return True
+    
+    def _schedule(self, delay: float):
+        if self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(delay, self._start_flush)
+    
+    def _start_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._flushing is None or self._flushing.done():
+            self._flushing = asyncio.create_task(self.flush())
+    
+    async def flush(self) -> int:
+        """送出佇列中的回執，回傳成功回報的筆數"""
+        reported = 0
+        while self._pending:
+            batch = list(self._pending)[:self.max_batch]
+            for key in batch:
+                del self._pending[key]
+            
+            # 送達先於已讀，MCP Server 依序轉移狀態
+            batch.sort(key=lambda key: key[1] != RECEIPT_DELIVERED)
+            try:
+                sent = await self.send([
+                    {"notification_id": notification_id, "status": status}
+                    for notification_id, status in batch
+                ])
+            except Exception as e:
+                self.logger.error("回執送出失敗", count=len(batch), error=str(e))
+                sent = False
+            
+            if not sent:
+                # 放回佇列開頭，稍後重試
+                for key in reversed(batch):
+                    self._pending[key] = None
+                    self._pending.move_to_end(key, last=False)
+                self._schedule(self.flush_seconds)
+                break
+            
+            reported += len(batch)
+            for key in batch:
+                self._reported[key] = None
+            while len(self._reported) > self.remember:
+                self._reported.popitem(last=False)
+        return reported
+    
+    async def close(self):
+        """關閉前送出剩餘的回執"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._flushing is not None:
+            await asyncio.gather(self._flushing, return_exceptions=True)
+        await self.flush()
@@ -0,0 +1,270 @@
+"""
+嵌入訊息渲染模組
+以模組層級預先計算的對照表與字典樣板建立 Discord 嵌入訊息，
+摘要、專案與狀態等會重複出現的內容另外以 LRU 快取渲染結果
+"""
+
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+import discord
+
+
+# 優先級顏色（預先轉為整數，建立嵌入訊息時不需要再建立 Colour 物件）
+PRIORITY_COLORS: Dict[str, int] = {
+    "low": discord.Color.green().value,
+    "medium": discord.Color.orange().value,
+    "high": discord.Color.red().value,
+    "urgent": discord.Color.dark_red().value
+}
+DEFAULT_COLOR = discord.Color.blue().value
+DIGEST_COLOR = discord.Color.green().value
+PROJECTS_COLOR = discord.Color.orange().value
+STATUS_COLOR = discord.Color.green().value
+
+TYPE_EMOJI: Dict[str, str] = {
+    "milestone": "🎯",
+    "question": "❓",
+    "alert": "⚠️",
+    "status": "📊",
+    "error": "❌"
+}
+DEFAULT_EMOJI = "📢"
+
+PRIORITY_BADGES: Dict[str, str] = {
+    priority: f"{'🔴' if priority == 'urgent' else '🟡' if priority == 'high' else '🟢'} {priority.upper()}"
+    for priority in PRIORITY_COLORS
+}
+
+# 進度條（每 10% 一格）
+PROGRESS_BAR_WIDTH = 10
+PROGRESS_BARS = tuple("▓" * filled + "░" * (PROGRESS_BAR_WIDTH - filled) for filled in range(PROGRESS_BAR_WIDTH + 1))
+
+SEARCH_MATCH_LABELS = {
+    "notification": "通知",
+    "response": "回覆"
+}
+
+# Discord 嵌入訊息最多 25 個欄位
+DIGEST_MAX_FIELDS = 25
+MAX_PROJECT_FIELDS = 10
+
+# Discord 嵌入訊息長度上限
+TITLE_LIMIT = 256
+FIELD_NAME_LIMIT = 256
+FIELD_VALUE_LIMIT = 1024
+# 標題、描述、欄位與頁尾合計上限為 6000 字，保留餘量給 Discord 以 UTF-16 計算的表情符號
+EMBED_TOTAL_LIMIT = 6000 - 100
+
+
+def truncate(text: str, limit: int) -> str:
+    """截斷文字並加上省略號"""
+    return text if len(text) <= limit else text[:max(limit - 1, 0)] + "…"
+
+
+def progress_bar(progress: Any) -> str:
+    """取得進度條文字（超出 0-100 時截斷）"""
+    try:
+        filled = int(progress or 0) // 10
+    except (TypeError, ValueError):
+        filled = 0
+    return PROGRESS_BARS[min(max(filled, 0), PROGRESS_BAR_WIDTH)]
+
+
+class EmbedCache:
+    """已渲染嵌入訊息的 LRU 快取
+    
+    快取的是嵌入訊息的字典樣板（不含時間戳記），取出時複製欄位再以 Embed.from_dict 建立新的嵌入訊息，
+    呼叫端修改回傳的嵌入訊息不會影響快取內容。
+    """
+    
+    def __init__(self, max_size: int = 256):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Dict[str, Any]]" = OrderedDict()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def render(self, key: Hashable, build: Callable[[], Dict[str, Any]],
+               timestamp: Optional[datetime] = None) -> discord.Embed:
+        """取得快取的樣板，沒有時呼叫 build 建立"""
+        template = self._entries.get(key)
+        if template is None:
+            self.misses += 1
+            template = build()
+            self._entries[key] = template
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+        return to_embed(template, timestamp)
+
+
+def to_embed(template: Dict[str, Any], timestamp: Optional[datetime] = None) -> discord.Embed:
+    """由字典樣板建立嵌入訊息（Embed.from_dict 直接引用傳入的欄位清單，先複製欄位）"""
+    if "fields" in template:
+        template = {**template, "fields": [dict(field) for field in template["fields"]]}
+    embed = discord.Embed.from_dict(template)
+    embed.timestamp = timestamp or datetime.utcnow()
+    return embed
+
+
+embed_cache = EmbedCache()
+
+
+def build_notification_embed(notification_id: str, notification_type: str, title: str, content: str,
+                             priority: str) -> discord.Embed:
+    """建立單則通知的嵌入訊息（每則通知內容不同，不使用快取）"""
+    return to_embed({
+        "title": f"{TYPE_EMOJI.get(notification_type, DEFAULT_EMOJI)} {title}"[:TITLE_LIMIT],
+        "description": content,
+        "color": PRIORITY_COLORS.get(priority, DEFAULT_COLOR),
+        "fields": [{
+            "name": "優先級",
+            "value": PRIORITY_BADGES.get(priority) or f"🟢 {str(priority).upper()}",
+            "inline": True
+        }],
+        "footer": {"text": f"通知 ID: {notification_id[:8]}..."}
+    })
+
+
+def build_digest_embed(project_id: Optional[str], items: List[Dict[str, Any]]) -> discord.Embed:
+    """建立摘要嵌入訊息（每則通知一個欄位；派送器重送同一批摘要時重複使用渲染結果）
+    
+    通知建立後內容不會改變，快取鍵只取顯示中的通知 ID，不需要逐一比對標題與內容。
+    """
+    key = ("digest", project_id, len(items), tuple(item.get("notification_id") for item in items[-DIGEST_MAX_FIELDS:]))
+    
+    def build() -> Dict[str, Any]:
+        description = f"專案: {project_id}" if project_id else ""
+        hidden = len(items) - DIGEST_MAX_FIELDS
+        if hidden > 0:
+            description = f"{description}\n（已省略較早的 {hidden} 則更新）".strip()
+        
+        template = {
+            "title": f"📊 進度摘要 ({len(items)} 則更新)",
+            "color": DIGEST_COLOR,
+            "fields": [],
+            "footer": {"text": f"摘要 | 最新通知 ID: {items[-1]['notification_id'][:8]}..."}
+        }
+        if description:
+            template["description"] = description
+        
+        # 累計整則嵌入訊息的長度：先截斷欄位名稱，再由最短的內容開始平均分配剩餘額度，
+        # 較短的通知用不完的額度留給較長的通知，總長度不會超過 Discord 的上限
+        shown = items[-DIGEST_MAX_FIELDS:]
+        remaining = EMBED_TOTAL_LIMIT - len(template["title"]) - len(description) - len(template["footer"]["text"])
+        name_limit = min(FIELD_NAME_LIMIT, remaining // len(shown) // 4)
+        names = [truncate(f"{TYPE_EMOJI.get(item.get('type'), DEFAULT_EMOJI)} {item.get('title', '')}", name_limit)
+                 for item in shown]
+        remaining -= sum(len(name) for name in names)
+        
+        contents = [item.get("content", "") or "-" for item in shown]
+        limits = [0] * len(shown)
+        order = sorted(range(len(shown)), key=lambda index: len(contents[index]))
+        for position, index in enumerate(order):
+            limits[index] = min(len(contents[index]), FIELD_VALUE_LIMIT, remaining // (len(order) - position))
+            remaining -= limits[index]
+        
+        template["fields"] = [
+            {"name": name, "value": truncate(content, limit), "inline": False}
+            for name, content, limit in zip(names, contents, limits)
+        ]
+        return template
+    
+    return embed_cache.render(key, build)
+
+
+def build_projects_embed(projects: List[Dict[str, Any]]) -> discord.Embed:
+    """建立活躍專案列表嵌入訊息（最多顯示 10 個專案）"""
+    shown = projects[:MAX_PROJECT_FIELDS]
+    key = ("projects", len(projects), tuple(
+        (project.get("name"), project.get("progress"), project.get("current_task"), project.get("status"))
+        for project in shown
+    ))
+    
+    def build() -> Dict[str, Any]:
+        return {
+            "title": "📊 活躍專案",
+            "color": PROJECTS_COLOR,
+            "fields": [
+                {
+                    "name": f"🎯 {project.get('name', 'Unknown')}"[:FIELD_NAME_LIMIT],
+                    "value": (
+                        f"**進度**: {project.get('progress', 0)}% {progress_bar(project.get('progress', 0))}\n"
+                        f"**目前任務**: {project.get('current_task', '無') or '無'}\n"
+                        f"**狀態**: {project.get('status', '未知')}"
+                    )[:FIELD_VALUE_LIMIT],
+                    "inline": False
+                }
+                for project in shown
+            ],
+            "footer": {"text": f"總共 {len(projects)} 個專案"}
+        }
+    
+    return embed_cache.render(key, build)
+
+
+def build_status_embed(health_data: Dict[str, Any]) -> discord.Embed:
+    """建立系統狀態嵌入訊息（狀態沒有變化時重複使用快取）"""
+    mcp_status = health_data.get("mcp_server_status", "unknown")
+    database_status = health_data.get("database_status", "unknown")
+    pending = health_data.get("pending_notifications", 0)
+    active_projects = health_data.get("active_projects", 0)
+    
+    def build() -> Dict[str, Any]:
+        return {
+            "title": "🤖 系統狀態",
+            "color": STATUS_COLOR,
+            "fields": [
+                {"name": "MCP Server", "value": f"✅ {mcp_status}", "inline": True},
+                {
+                    "name": "資料庫",
+                    "value": f"{'✅' if database_status == 'healthy' else '❌'} {database_status}",
+                    "inline": True
+                },
+                {"name": "待處理通知", "value": f"📬 {pending} 則", "inline": True},
+                {"name": "活躍專案", "value": f"📊 {active_projects} 個", "inline": True}
+            ],
+            "footer": {"text": "DC 機器人推播通知器"}
+        }
+    
+    return embed_cache.render(("status", mcp_status, database_status, pending, active_projects), build)
+
+
+def build_page_embed(filename: str, page: str, index: int, total: int) -> discord.Embed:
+    """建立附件分頁嵌入訊息（以程式碼區塊顯示，保留日誌與 diff 的格式）"""
+    # 內容中的 ``` 會提早結束程式碼區塊，插入零寬空白避開
+    escaped = page.replace("```", "`\u200b``")
+    return to_embed({
+        "title": f"📄 {filename}"[:TITLE_LIMIT],
+        "description": f"```\n{escaped}\n```",
+        "color": DEFAULT_COLOR,
+        "footer": {"text": f"第 {index} / {total} 頁"}
+    })
+
+
+def build_search_embed(query: str, results: List[Dict[str, Any]], page: int) -> discord.Embed:
+    """建立搜尋結果嵌入訊息"""
+    return to_embed({
+        "title": f"🔍 搜尋「{query}」"[:TITLE_LIMIT],
+        "color": DEFAULT_COLOR,
+        "fields": [
+            {
+                "name": f"{result.get('title', '')}"[:FIELD_NAME_LIMIT] or "-",
+                "value": (
+                    f"{result.get('content', '')[:200]}\n"
+                    f"**符合**: {SEARCH_MATCH_LABELS.get(result.get('matched'), '通知')} | "
+                    f"**狀態**: {result.get('status', '未知')} | "
+                    f"**日期**: {(result.get('created_at') or '')[:10] or '-'} | `{result.get('id', '')[:8]}`"
+                )[:FIELD_VALUE_LIMIT],
+                "inline": False
+            }
+            for result in results
+        ],
+        "footer": {"text": f"第 {page} 頁 | 本頁 {len(results)} 筆"}
+    })
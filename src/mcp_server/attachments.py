@@ -0,0 +1,51 @@
+"""
+通知附件模組
+超過通知內容上限的內容存到內容定址儲存，通知本身只保留預覽與 metadata 中的附件參照
+"""
+
+from typing import Any, Dict, Optional, Tuple
+
+from ..shared.blobs import BlobStore, is_blob_id
+
+
+# 與 Notification.content 的長度上限一致
+INLINE_CONTENT_LIMIT = 2000
+# 內容轉存為附件時保留在通知中的預覽長度
+PREVIEW_CHARS = 1000
+
+DEFAULT_FILENAME = "content.txt"
+DEFAULT_CONTENT_TYPE = "text/plain; charset=utf-8"
+MAX_FILENAME_LENGTH = 100
+
+
+def spill_content(content: str, store: BlobStore) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """內容超過通知上限時存到內容定址儲存，回傳 (通知內容, 附件參照)"""
+    if len(content) <= INLINE_CONTENT_LIMIT:
+        return content, None
+    
+    info = store.put(content.encode("utf-8"))
+    preview = content[:PREVIEW_CHARS].rstrip() + "\n…（完整內容見附件）"
+    return preview, {
+        "blob_id": info.blob_id,
+        "size": info.size,
+        "filename": DEFAULT_FILENAME,
+        "content_type": DEFAULT_CONTENT_TYPE
+    }
+
+
+def resolve_attachment(attachment: Any, store: BlobStore) -> Dict[str, Any]:
+    """驗證呼叫端提供的附件參照（需先以 PUT /api/v1/blobs 上傳），補上實際大小"""
+    if not isinstance(attachment, dict) or not is_blob_id(attachment.get("blob_id", "")):
+        raise ValueError("attachment 需要有效的 blob_id")
+    
+    size = store.size(attachment["blob_id"])
+    if size is None:
+        raise ValueError(f"附件內容不存在: {attachment['blob_id']}")
+    
+    filename = str(attachment.get("filename") or DEFAULT_FILENAME).replace("/", "_").replace("\\", "_")
+    return {
+        "blob_id": attachment["blob_id"],
+        "size": size,
+        "filename": filename[:MAX_FILENAME_LENGTH],
+        "content_type": str(attachment.get("content_type") or DEFAULT_CONTENT_TYPE)
+    }
@@ -0,0 +1,278 @@
+"""
+API 金鑰驗證模組
+支援全域管理金鑰、資料庫中以雜湊儲存的租戶/專案金鑰，以及以 JWT_SECRET_KEY 簽署的短期 JWT；
+驗證結果快取在記憶體 LRU 中，一般請求不需要查詢資料庫
+"""
+
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+import structlog
+from jose import JWTError, jwt
+
+
+API_KEY_PREFIX = "mcp_"
+# 快取中代表「無效憑證」的值（負向快取，避免以無效金鑰反覆查詢資料庫）
+_INVALID = object()
+
+
+def generate_api_key() -> str:
+    """產生新的 API 金鑰"""
+    return API_KEY_PREFIX + secrets.token_urlsafe(32)
+
+
+def hash_api_key(api_key: str) -> str:
+    """API 金鑰的 SHA-256 雜湊值（金鑰本身為高熵亂數，不需要加鹽或慢速雜湊）"""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+class Principal:
+    """通過驗證的呼叫者"""
+    
+    __slots__ = ("key_id", "name", "project_id", "is_admin", "rate_limit_per_minute", "daily_quota")
+    
+    def __init__(self, key_id: str, name: str, project_id: Optional[str] = None, is_admin: bool = False,
+                 rate_limit_per_minute: Optional[int] = None, daily_quota: Optional[int] = None):
+        self.key_id = key_id
+        self.name = name
+        self.project_id = project_id
+        self.is_admin = is_admin
+        self.rate_limit_per_minute = rate_limit_per_minute
+        self.daily_quota = daily_quota
+    
+    def can_access_project(self, project_id: Optional[str]) -> bool:
+        """是否可存取指定專案（未綁定專案的金鑰可存取所有專案）"""
+        return self.project_id is None or project_id == self.project_id
+    
+    def claims(self) -> Dict[str, Any]:
+        """簽發 JWT 時使用的聲明"""
+        return {
+            "sub": self.key_id,
+            "name": self.name,
+            "project_id": self.project_id,
+            "admin": self.is_admin,
+            "rpm": self.rate_limit_per_minute,
+            "quota": self.daily_quota
+        }
+    
+    @classmethod
+    def from_claims(cls, claims: Dict[str, Any]) -> "Principal":
+        return cls(
+            key_id=claims["sub"],
+            name=claims.get("name") or claims["sub"],
+            project_id=claims.get("project_id"),
+            is_admin=bool(claims.get("admin")),
+            rate_limit_per_minute=claims.get("rpm"),
+            daily_quota=claims.get("quota")
+        )
+
+
+ADMIN_PRINCIPAL = Principal("admin", "admin", is_admin=True)
+
+
+class CredentialCache:
+    """有容量上限與存活時間的 LRU 快取（憑證雜湊或金鑰 ID -> 驗證結果）
+    
+    事件迴圈與執行緒池會同時存取，所有操作都在鎖內進行。
+    """
+    
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get(self, key: str, now: Optional[float] = None) -> Any:
+        """查詢快取，沒有或已過期時回傳 None"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+    
+    def put(self, key: str, value: Any, ttl_seconds: Optional[float] = None, now: Optional[float] = None):
+        """寫入快取"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._entries[key] = (value, now + (self.ttl_seconds if ttl_seconds is None else ttl_seconds))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def discard(self, key: str):
+        """移除快取項目"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class UsageLimiter:
+    """每把金鑰的每分鐘請求上限與每日配額
+    
+    以固定時間窗計數（每日配額以 UTC 日期計算），計數保存在各副本的記憶體中，
+    多副本部署時實際上限為設定值乘以副本數。檢查與計數在同一個鎖內完成，並發請求不會超過上限。
+    """
+    
+    def __init__(self):
+        self._minute: Dict[str, Tuple[int, int]] = {}
+        self._daily: Dict[str, Tuple[int, int]] = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _count(counters: Dict[str, Tuple[int, int]], key: str, window: int) -> int:
+        current_window, count = counters.get(key, (window, 0))
+        return count if current_window == window else 0
+    
+    def check(self, principal: Principal, now: Optional[float] = None) -> Optional[float]:
+        """記錄一次請求；超過限制時不計數並回傳需要等待的秒數"""
+        if principal.rate_limit_per_minute is None and principal.daily_quota is None:
+            return None
+        
+        now = time.time() if now is None else now
+        minute = int(now // 60)
+        day = int(now // 86400)
+        with self._lock:
+            minute_count = self._count(self._minute, principal.key_id, minute)
+            daily_count = self._count(self._daily, principal.key_id, day)
+            
+            if principal.daily_quota is not None and daily_count >= principal.daily_quota:
+                return (day + 1) * 86400 - now
+            if principal.rate_limit_per_minute is not None and minute_count >= principal.rate_limit_per_minute:
+                return (minute + 1) * 60 - now
+            
+            self._minute[principal.key_id] = (minute, minute_count + 1)
+            self._daily[principal.key_id] = (day, daily_count + 1)
+            return None
+
+
+class Authenticator:
+    """憑證驗證器
+    
+    依序比對全域管理金鑰、JWT 與資料庫中的 API 金鑰。快取以憑證的雜湊值為鍵，
+    命中時不需要查詢資料庫；撤銷金鑰時清除本副本的快取，其他副本在存活時間後失效。
+    JWT 另外檢查簽發它的金鑰是否已撤銷（金鑰狀態同樣快取），撤銷金鑰後換發的 JWT 也隨之失效。
+    """
+    
+    def __init__(self, api_key_repo, admin_api_key: str, jwt_secret_key: str, jwt_algorithm: str = "HS256",
+                 cache_ttl_seconds: float = 60.0, cache_size: int = 10000):
+        self.api_key_repo = api_key_repo
+        self.admin_api_key = admin_api_key
+        self.jwt_secret_key = jwt_secret_key
+        self.jwt_algorithm = jwt_algorithm
+        self.cache = CredentialCache(max_size=cache_size, ttl_seconds=cache_ttl_seconds)
+        self.key_status = CredentialCache(max_size=cache_size, ttl_seconds=cache_ttl_seconds)  # 金鑰 ID -> 是否有效
+        self.limiter = UsageLimiter()
+        self.logger = structlog.get_logger(__name__)
+    
+    def cached(self, credential: str) -> Tuple[bool, Optional[Principal]]:
+        """查詢快取，回傳 (是否命中, 呼叫者)；命中但憑證無效時呼叫者為 None"""
+        if hmac.compare_digest(credential.encode("utf-8"), self.admin_api_key.encode("utf-8")):
+            return True, ADMIN_PRINCIPAL
+        
+        entry = self.cache.get(hash_api_key(credential))
+        if entry is None:
+            return False, None
+        if entry is _INVALID or self.key_status.get(entry.key_id) is False:
+            return True, None
+        return True, entry
+    
+    def authenticate(self, credential: str) -> Optional[Principal]:
+        """驗證憑證（可能查詢資料庫，應在執行緒池中呼叫），結果寫入快取"""
+        hit, principal = self.cached(credential)
+        if hit:
+            return principal
+        
+        key_hash = hash_api_key(credential)
+        ttl_seconds = None
+        if credential.count(".") == 2:
+            principal, expires_at = self._verify_jwt(credential)
+            if principal is not None:
+                # 快取不可比 JWT 本身活得更久
+                ttl_seconds = min(self.cache.ttl_seconds, expires_at - time.time())
+        else:
+            principal = self._verify_api_key(key_hash)
+        
+        self.cache.put(key_hash, principal or _INVALID, ttl_seconds=ttl_seconds)
+        return principal
+    
+    def _verify_jwt(self, token: str) -> Tuple[Optional[Principal], float]:
+        try:
+            claims = jwt.decode(token, self.jwt_secret_key, algorithms=[self.jwt_algorithm])
+            principal = Principal.from_claims(claims)
+            expires_at = float(claims["exp"])
+        except (JWTError, KeyError, TypeError, ValueError) as e:
+            self.logger.info("JWT 驗證失敗", error=str(e))
+            return None, 0.0
+        if principal.key_id != ADMIN_PRINCIPAL.key_id and not self._key_is_active(principal.key_id):
+            self.logger.info("JWT 的簽發金鑰已撤銷", api_key_id=principal.key_id)
+            return None, 0.0
+        return principal, expires_at
+    
+    def _key_is_active(self, key_id: str) -> bool:
+        active = self.key_status.get(key_id)
+        if active is None:
+            api_key = self.api_key_repo.get_api_key(key_id)
+            active = api_key is not None and api_key.revoked_at is None
+            self.key_status.put(key_id, active)
+        return active
+    
+    def _verify_api_key(self, key_hash: str) -> Optional[Principal]:
+        api_key = self.api_key_repo.get_api_key_by_hash(key_hash)
+        if api_key is None or api_key.revoked_at is not None:
+            return None
+        return Principal(
+            key_id=api_key.id,
+            name=api_key.name,
+            project_id=api_key.project_id,
+            is_admin=api_key.is_admin,
+            rate_limit_per_minute=api_key.rate_limit_per_minute,
+            daily_quota=api_key.daily_quota
+        )
+    
+    def issue_token(self, principal: Principal, expires_minutes: int,
+                    now: Optional[datetime] = None) -> Tuple[str, datetime]:
+        """以呼叫者的權限簽發 JWT，回傳 (權杖, 到期時間)"""
+        expires_at = (now or datetime.utcnow()) + timedelta(minutes=expires_minutes)
+        claims = principal.claims()
+        claims["exp"] = expires_at
+        return jwt.encode(claims, self.jwt_secret_key, algorithm=self.jwt_algorithm), expires_at
+    
+    def invalidate(self, key_hash: str, key_id: Optional[str] = None):
+        """清除金鑰的快取驗證結果；提供金鑰 ID 時標記為已撤銷，由該金鑰換發的 JWT 立即失效"""
+        self.cache.discard(key_hash)
+        if key_id is not None:
+            self.key_status.put(key_id, False)
+
+
+_authenticator: Optional[Authenticator] = None
+
+
+def get_authenticator() -> Authenticator:
+    """獲取憑證驗證器"""
+    global _authenticator
+    if _authenticator is None:
+        from ..shared.config import settings
+        from ..shared.database import get_api_key_repo
+        _authenticator = Authenticator(
+            get_api_key_repo(),
+            admin_api_key=settings.mcp_server_api_key,
+            jwt_secret_key=settings.jwt_secret_key,
+            jwt_algorithm=settings.jwt_algorithm,
+            cache_ttl_seconds=settings.api_key_cache_ttl_seconds,
+            cache_size=settings.api_key_cache_size
+        )
+    return _authenticator
@@ -0,0 +1,122 @@
+"""
+通知去重模組
+以 Idempotency-Key 或內容雜湊辨識重複建立的通知
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from ..shared.models import Notification, enum_value
+
+
+def content_hash(notification: Notification) -> str:
+    """計算 (project_id, type, title, content) 的雜湊值（有附件時加上附件內容識別碼）"""
+    digest = hashlib.sha256()
+    parts = [notification.project_id or "", enum_value(notification.type), notification.title, notification.content]
+    attachment = notification.metadata.get("attachment")
+    if attachment:
+        # 大型內容只保留預覽，預覽相同但完整內容不同時不應視為重複
+        parts.append(attachment["blob_id"])
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()
+
+
+class DedupCache:
+    """有容量上限與存活時間的 LRU 快取（去重鍵 -> 通知 ID）"""
+    
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get(self, key: str, now: Optional[float] = None) -> Optional[str]:
+        """查詢去重鍵對應的通知 ID"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        
+        now = time.monotonic() if now is None else now
+        notification_id, expires_at = entry
+        if expires_at <= now:
+            del self._entries[key]
+            return None
+        
+        self._entries.move_to_end(key)
+        return notification_id
+    
+    def put(self, key: str, notification_id: str, ttl_seconds: Optional[float] = None,
+            now: Optional[float] = None):
+        """記錄去重鍵"""
+        now = time.monotonic() if now is None else now
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._entries[key] = (notification_id, now + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+class DedupKeys:
+    """單則通知的去重鍵"""
+    
+    __slots__ = ("reason", "cache_key", "db_key", "ttl_seconds")
+    
+    def __init__(self, reason: str, cache_key: str, db_key: str, ttl_seconds: float):
+        self.reason = reason
+        self.cache_key = cache_key
+        self.db_key = db_key
+        self.ttl_seconds = ttl_seconds
+
+
+class NotificationDeduplicator:
+    """通知去重器
+    
+    有 Idempotency-Key 時以其為準；否則以內容雜湊在時間窗內去重。
+    記憶體快取處理絕大多數重試，資料庫唯一索引則保證快取失效或多進程時仍不會重複寫入：
+    內容雜湊的資料庫鍵附帶時間窗編號，使同一時間窗內的相同內容只能寫入一次。
+    """
+    
+    def __init__(self, window_seconds: int, cache_size: int, idempotency_ttl_seconds: int):
+        self.window_seconds = window_seconds
+        self.idempotency_ttl_seconds = idempotency_ttl_seconds
+        self.cache = DedupCache(cache_size, window_seconds)
+    
+    def keys_for(self, notification: Notification, idempotency_key: Optional[str] = None,
+                 now: Optional[float] = None, scope: Optional[str] = None) -> Optional[DedupKeys]:
+        """產生通知的去重鍵，不需去重時回傳 None
+        
+        Idempotency-Key 由呼叫者自訂，以 scope（呼叫者的金鑰）區隔，
+        不同租戶使用相同的鍵時各自建立通知，也不會取得彼此的通知 ID。
+        """
+        if idempotency_key:
+            key = f"idem:{scope}:{idempotency_key}" if scope else f"idem:{idempotency_key}"
+            return DedupKeys("idempotency_key", key, key, self.idempotency_ttl_seconds)
+        
+        if self.window_seconds <= 0:
+            return None
+        
+        now = time.time() if now is None else now
+        cache_key = f"hash:{content_hash(notification)}"
+        return DedupKeys(
+            "content_hash",
+            cache_key,
+            f"{cache_key}:{int(now // self.window_seconds)}",
+            self.window_seconds
+        )
+    
+    def lookup(self, keys: Optional[DedupKeys]) -> Optional[str]:
+        """查詢快取中是否已有相同通知"""
+        if keys is None:
+            return None
+        return self.cache.get(keys.cache_key)
+    
+    def remember(self, keys: Optional[DedupKeys], notification_id: str):
+        """記錄已建立的通知"""
+        if keys is not None:
+            self.cache.put(keys.cache_key, notification_id, keys.ttl_seconds)
@@ -0,0 +1,102 @@
+"""
+通知摘要模組
+將同一專案短時間內的大量低優先級狀態通知合併為單一摘要
+"""
+
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from ..shared.models import Notification, NotificationType, PRIORITY_RANK, enum_value
+
+
+# 可合併為摘要的通知類型
+DIGEST_TYPES = frozenset({NotificationType.STATUS.value, NotificationType.MILESTONE.value})
+
+
+class DigestBatch:
+    """單一專案的摘要批次"""
+    
+    def __init__(self, project_id: Optional[str], opened_at: float, guild_id: Optional[str] = None):
+        self.project_id = project_id
+        self.guild_id = guild_id
+        self.opened_at = opened_at
+        self.notifications: List[Notification] = []
+    
+    @property
+    def digest_key(self) -> str:
+        """摘要識別鍵（用於 Discord 端就地編輯）"""
+        key = self.project_id or "_global"
+        return f"{self.guild_id}:{key}" if self.guild_id else key
+
+
+class NotificationDigest:
+    """通知摘要緩衝區"""
+    
+    def __init__(self, window_seconds: float, max_items: int, max_priority: str = "medium"):
+        self.window_seconds = window_seconds
+        self.max_items = max_items
+        self.max_priority_rank = PRIORITY_RANK.get(max_priority.lower(), PRIORITY_RANK["medium"])
+        self._batches: Dict[Tuple[Optional[str], Optional[str]], DigestBatch] = {}
+        self._buffered_ids: Set[str] = set()
+    
+    def __contains__(self, notification_id: str) -> bool:
+        return notification_id in self._buffered_ids
+    
+    def __len__(self) -> int:
+        return len(self._buffered_ids)
+    
+    def buffered_ids(self) -> List[str]:
+        """緩衝區中所有通知的 ID"""
+        return list(self._buffered_ids)
+    
+    def accepts(self, notification: Notification) -> bool:
+        """判斷通知是否可合併為摘要"""
+        if enum_value(notification.type) not in DIGEST_TYPES:
+            return False
+        return PRIORITY_RANK.get(enum_value(notification.priority), 0) <= self.max_priority_rank
+    
+    def add(self, notification: Notification, now: Optional[float] = None) -> bool:
+        """加入通知，已在緩衝區中則回傳 False"""
+        if notification.id in self._buffered_ids:
+            return False
+        
+        now = time.monotonic() if now is None else now
+        # 依目標伺服器與專案分組，不同分片的通知不會被合併
+        guild_id = notification.metadata.get("guild_id")
+        key = (guild_id, notification.project_id)
+        batch = self._batches.get(key)
+        if batch is None:
+            batch = DigestBatch(notification.project_id, now, guild_id)
+            self._batches[key] = batch
+        
+        batch.notifications.append(notification)
+        self._buffered_ids.add(notification.id)
+        return True
+    
+    def pop_due(self, now: Optional[float] = None) -> List[DigestBatch]:
+        """取出已到期或已滿的摘要批次"""
+        now = time.monotonic() if now is None else now
+        due_keys = [
+            key for key, batch in self._batches.items()
+            if now - batch.opened_at >= self.window_seconds
+            or len(batch.notifications) >= self.max_items
+        ]
+        return [self._pop(key) for key in due_keys]
+    
+    def pop_all(self) -> List[DigestBatch]:
+        """取出所有摘要批次（關閉時使用）"""
+        return [self._pop(key) for key in list(self._batches)]
+    
+    def seconds_until_due(self, now: Optional[float] = None) -> Optional[float]:
+        """距離下一個批次到期的秒數，沒有批次時回傳 None"""
+        if not self._batches:
+            return None
+        now = time.monotonic() if now is None else now
+        oldest = min(batch.opened_at for batch in self._batches.values())
+        return max(0.0, oldest + self.window_seconds - now)
+    
+    def _pop(self, key: Tuple[Optional[str], Optional[str]]) -> DigestBatch:
+        batch = self._batches.pop(key)
+        for notification in batch.notifications:
+            self._buffered_ids.discard(notification.id)
+        return batch
@@ -0,0 +1,85 @@
+"""
+通知扇出模組
+依專案與類型的訂閱把通知展開為多個 Discord 目的地（頻道或使用者私訊）；
+一個派送批次只查詢一次訂閱表，再依目的地所屬分片分組，每個機器人程序每則通知只收到一次請求
+"""
+
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import structlog
+
+from ..shared.models import Notification, enum_value
+
+
+class Destination(NamedTuple):
+    """通知目的地"""
+    kind: str                       # channel / user
+    id: str
+    guild_id: Optional[str] = None  # 頻道所屬伺服器（私訊為 None）
+    
+    @property
+    def key(self) -> str:
+        """目的地識別鍵（機器人以此去重與限流）"""
+        return f"{self.kind}:{self.id}"
+    
+    def to_payload(self) -> Dict[str, Any]:
+        return {"type": self.kind, "id": self.id, "guild_id": self.guild_id}
+
+
+def subscription_keys(project_id: Optional[str], notification_type: str) -> Tuple[Tuple[Optional[str], Optional[str]], ...]:
+    """通知可能符合的訂閱分組（精確、專案萬用、類型萬用、全部萬用）"""
+    return (
+        (project_id, notification_type),
+        (project_id, None),
+        (None, notification_type),
+        (None, None)
+    )
+
+
+class FanoutPlanner:
+    """扇出規劃器
+    
+    整批通知的 (專案, 類型) 合併成一次訂閱查詢，之後每則通知只在記憶體中合併相符的分組，
+    訂閱者數量不影響資料庫往返次數。沒有任何訂閱者的通知不在結果中，沿用預設頻道派送。
+    """
+    
+    def __init__(self, subscription_repo):
+        self.subscription_repo = subscription_repo
+        self.logger = structlog.get_logger(__name__)
+    
+    def plan(self, notifications: Iterable[Notification]) -> Dict[str, List[Destination]]:
+        """回傳 通知 ID -> 目的地清單（同一目的地只出現一次）"""
+        notifications = list(notifications)
+        if not notifications:
+            return {}
+        
+        grouped = self.subscription_repo.find_subscriptions({
+            (notification.project_id, enum_value(notification.type)) for notification in notifications
+        })
+        if not grouped:
+            return {}
+        
+        plans: Dict[str, List[Destination]] = {}
+        for notification in notifications:
+            destinations: Dict[str, Destination] = {}
+            for key in subscription_keys(notification.project_id, enum_value(notification.type)):
+                for subscription in grouped.get(key, ()):
+                    destination = Destination(
+                        enum_value(subscription.destination_type), subscription.destination_id, subscription.guild_id
+                    )
+                    destinations.setdefault(destination.key, destination)
+            if destinations:
+                plans[notification.id] = list(destinations.values())
+        
+        if plans:
+            self.logger.info("通知扇出", notifications=len(plans),
+                             deliveries=sum(len(destinations) for destinations in plans.values()), sampled=True)
+        return plans
+
+
+def group_by_route(destinations: Iterable[Destination], route: Callable[[Optional[str]], str]) -> Dict[str, List[Destination]]:
+    """依目的地所屬伺服器分組到負責的機器人程序（私訊不屬於任何伺服器，送往預設程序）"""
+    routes: Dict[str, List[Destination]] = {}
+    for destination in destinations:
+        routes.setdefault(route(destination.guild_id), []).append(destination)
+    return routes
@@ -0,0 +1,193 @@
+"""
+通知過濾模組
+依使用者偏好設定（通知類型、優先級、勿擾時段）在派送時過濾通知
+"""
+
+import time
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from typing import Any, Dict, Optional, Set, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import structlog
+
+from ..shared.models import (
+    Notification, NotificationType, Priority, UserPreferences, PRIORITY_RANK, enum_value
+)
+
+
+# 通知類型位元遮罩
+TYPE_BITS = {notification_type.value: 1 << index for index, notification_type in enumerate(NotificationType)}
+
+
+def parse_clock(value: str) -> int:
+    """將 HH:MM 轉換為當日分鐘數"""
+    hours, minutes = value.strip().split(":")
+    hours, minutes = int(hours), int(minutes)
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError(f"無效的時間格式: {value}")
+    return hours * 60 + minutes
+
+
+class CompiledPreferences:
+    """編譯後的使用者偏好規則"""
+    
+    __slots__ = ("user_id", "type_mask", "min_priority_rank", "quiet_start", "quiet_end", "tz")
+    
+    def __init__(self, user_id: str, type_mask: int, min_priority_rank: int,
+                 quiet_start: Optional[int], quiet_end: Optional[int], tz: ZoneInfo):
+        self.user_id = user_id
+        self.type_mask = type_mask
+        self.min_priority_rank = min_priority_rank
+        self.quiet_start = quiet_start
+        self.quiet_end = quiet_end
+        self.tz = tz
+    
+    @classmethod
+    def compile(cls, preferences: UserPreferences) -> "CompiledPreferences":
+        """將偏好設定編譯為位元遮罩與分鐘數"""
+        type_mask = 0
+        for notification_type in preferences.notification_types:
+            type_mask |= TYPE_BITS.get(enum_value(notification_type), 0)
+        
+        try:
+            quiet_start = parse_clock(preferences.quiet_hours_start)
+            quiet_end = parse_clock(preferences.quiet_hours_end)
+            if quiet_start == quiet_end:
+                quiet_start = quiet_end = None
+        except (ValueError, AttributeError):
+            quiet_start = quiet_end = None
+        
+        try:
+            tz = ZoneInfo(preferences.timezone or "UTC")
+        except (ZoneInfoNotFoundError, ValueError):
+            tz = ZoneInfo("UTC")
+        
+        return cls(
+            user_id=preferences.user_id,
+            type_mask=type_mask,
+            min_priority_rank=PRIORITY_RANK.get(enum_value(preferences.priority_filter), 0),
+            quiet_start=quiet_start,
+            quiet_end=quiet_end,
+            tz=tz
+        )
+    
+    def allows(self, type_bit: int, priority_rank: int) -> bool:
+        """判斷類型與優先級是否符合偏好"""
+        return bool(self.type_mask & type_bit) and priority_rank >= self.min_priority_rank
+    
+    def quiet_until(self, now: datetime) -> Optional[datetime]:
+        """若目前處於勿擾時段，回傳勿擾結束時間（UTC），否則回傳 None"""
+        if self.quiet_start is None:
+            return None
+        
+        local_now = now.replace(tzinfo=timezone.utc).astimezone(self.tz)
+        minute = local_now.hour * 60 + local_now.minute
+        
+        if self.quiet_start < self.quiet_end:
+            in_quiet = self.quiet_start <= minute < self.quiet_end
+        else:
+            in_quiet = minute >= self.quiet_start or minute < self.quiet_end
+        if not in_quiet:
+            return None
+        
+        end_date = local_now.date()
+        if minute >= self.quiet_end:
+            end_date += timedelta(days=1)
+        local_end = datetime(
+            end_date.year, end_date.month, end_date.day,
+            self.quiet_end // 60, self.quiet_end % 60, tzinfo=self.tz
+        )
+        return local_end.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+class FilterDecision(str, Enum):
+    """過濾結果"""
+    DELIVER = "deliver"     # 立即派送
+    DEFER = "defer"         # 延後到勿擾時段結束
+    DROP = "drop"           # 不符合任何使用者偏好
+
+
+class PreferenceFilter:
+    """通知過濾引擎
+    
+    偏好設定在第一次使用時整批載入並編譯，之後每則通知的判斷都只在記憶體中完成；
+    偏好更新時呼叫 invalidate() 讓下次判斷重新載入該使用者。
+    其他副本或程序更新的偏好不會呼叫本程序的 invalidate()，因此每隔 refresh_seconds
+    比對一次資料庫的偏好版本（筆數與最後更新時間），有變化時整批重新載入。
+    延後的通知由派送器寫回 deliver_at 並交給排程器，勿擾時段結束後再重新判斷。
+    """
+    
+    def __init__(self, preferences_repo, refresh_seconds: float = 30.0):
+        self.preferences_repo = preferences_repo
+        self.refresh_seconds = refresh_seconds
+        self.logger = structlog.get_logger(__name__)
+        self._rules: Optional[Dict[str, CompiledPreferences]] = None
+        self._stale_users: Set[str] = set()
+        self._version: Any = None
+        self._checked_at: Optional[float] = None
+    
+    def invalidate(self, user_id: Optional[str] = None):
+        """使快取的偏好規則失效"""
+        if user_id is None:
+            self._rules = None
+            self._stale_users.clear()
+        else:
+            self._stale_users.add(user_id)
+    
+    def refresh(self, now: Optional[float] = None) -> Dict[str, CompiledPreferences]:
+        """取得目前的規則；到了檢查間隔時先比對偏好版本（會查詢資料庫，派送器在執行緒池中先呼叫一次）"""
+        now = time.monotonic() if now is None else now
+        if self._rules is None or self._checked_at is None or now - self._checked_at >= self.refresh_seconds:
+            version = self.preferences_repo.get_preferences_version()
+            if self._rules is not None and version != self._version:
+                self.logger.info("偏好設定已在其他副本更新，重新載入規則")
+                self._rules = None
+            self._version = version
+            self._checked_at = now
+        return self._get_rules()
+    
+    def _get_rules(self) -> Dict[str, CompiledPreferences]:
+        if self._rules is None:
+            self._rules = {
+                preferences.user_id: CompiledPreferences.compile(preferences)
+                for preferences in self.preferences_repo.get_all_preferences()
+            }
+            self._stale_users.clear()
+            self.logger.info("偏好規則載入完成", users=len(self._rules))
+        
+        while self._stale_users:
+            user_id = self._stale_users.pop()
+            preferences = self.preferences_repo.get_preferences(user_id)
+            if preferences is None:
+                self._rules.pop(user_id, None)
+            else:
+                self._rules[user_id] = CompiledPreferences.compile(preferences)
+        
+        return self._rules
+    
+    def evaluate(self, notification: Notification, now: Optional[datetime] = None) -> Tuple[FilterDecision, Optional[datetime]]:
+        """判斷通知應立即派送、延後或丟棄"""
+        rules = self.refresh()
+        if not rules:
+            return FilterDecision.DELIVER, None
+        
+        now = now or datetime.utcnow()
+        type_bit = TYPE_BITS.get(enum_value(notification.type), 0)
+        priority_rank = PRIORITY_RANK.get(enum_value(notification.priority), 0)
+        # 緊急通知不受勿擾時段限制
+        bypass_quiet = priority_rank >= PRIORITY_RANK[Priority.URGENT.value]
+        
+        release_at = None
+        for rule in rules.values():
+            if not rule.allows(type_bit, priority_rank):
+                continue
+            quiet_until = None if bypass_quiet else rule.quiet_until(now)
+            if quiet_until is None:
+                return FilterDecision.DELIVER, None
+            if release_at is None or quiet_until < release_at:
+                release_at = quiet_until
+        
+        if release_at is None:
+            return FilterDecision.DROP, None
+        return FilterDecision.DEFER, release_at
@@ -0,0 +1,207 @@
+"""
+MCP JSON-RPC 協定模組
+實作 Model Context Protocol 的 JSON-RPC 2.0 訊息處理（initialize、ping、tools/list、tools/call），
+與傳輸方式無關：stdio 與 POST /mcp 共用同一個處理器，工具直接呼叫程序內的通知服務
+"""
+
+import asyncio
+import json
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+import structlog
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# 支援的協定版本（新到舊），客戶端要求的版本不在其中時回覆最新版本
+PROTOCOL_VERSIONS = ("2025-06-18", "2025-03-26", "2024-11-05")
+
+# JSON-RPC 錯誤代碼
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+Notify = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+def dumps(message: Any) -> bytes:
+    """序列化訊息（有安裝 orjson 時使用 orjson）"""
+    if orjson is not None:
+        return orjson.dumps(message, default=str)
+    return json.dumps(message, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def loads(data: Any) -> Any:
+    """解析訊息，格式錯誤時拋出 ValueError"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def error_response(request_id: Any, code: int, message: str) -> Dict[str, Any]:
+    return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+
+
+def has_requests(payload: Any) -> bool:
+    """訊息（或批次）中是否有需要回應的請求（通知與回應不需要）"""
+    messages = payload if isinstance(payload, list) else [payload]
+    return any(isinstance(message, dict) and "method" in message and "id" in message for message in messages)
+
+
+class JsonRpcError(Exception):
+    """協定層錯誤（回覆 JSON-RPC error）"""
+    
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class ToolError(Exception):
+    """工具執行失敗（回覆 isError 的工具結果，讓模型看到錯誤原因）"""
+
+
+class ToolContext:
+    """工具呼叫的上下文：呼叫者身分與進度串流"""
+    
+    __slots__ = ("principal", "progress_token", "notify", "progress")
+    
+    def __init__(self, principal: Any, progress_token: Any = None, notify: Optional[Notify] = None):
+        self.principal = principal
+        self.progress_token = progress_token
+        self.notify = notify
+        self.progress = 0
+    
+    async def report_progress(self, message: str):
+        """送出進度通知（客戶端沒有提供 progressToken 時略過）"""
+        if self.progress_token is None or self.notify is None:
+            return
+        self.progress += 1
+        await self.notify({
+            "jsonrpc": "2.0",
+            "method": "notifications/progress",
+            "params": {"progressToken": self.progress_token, "progress": self.progress, "message": message}
+        })
+
+
+ToolHandler = Callable[[Dict[str, Any], ToolContext], Awaitable[Dict[str, Any]]]
+
+
+class Tool(NamedTuple):
+    """MCP 工具定義"""
+    name: str
+    description: str
+    input_schema: Dict[str, Any]
+    handler: ToolHandler
+
+
+def tool_result(data: Dict[str, Any], is_error: bool = False) -> Dict[str, Any]:
+    """工具結果（文字內容供舊版客戶端使用，structuredContent 供新版客戶端直接解析）"""
+    return {
+        "content": [{"type": "text", "text": dumps(data).decode("utf-8")}],
+        "structuredContent": data,
+        "isError": is_error
+    }
+
+
+class MCPProtocol:
+    """MCP 訊息處理器
+    
+    tools/list 的回應在建立時預先組好；每次呼叫只做字典查詢與工具本身的工作，
+    不經過 HTTP、驗證或回應模型，工具呼叫的額外成本維持在微秒等級。
+    """
+    
+    def __init__(self, name: str, version: str, tools: List[Tool], instructions: Optional[str] = None):
+        self.name = name
+        self.version = version
+        self.instructions = instructions
+        self.tools: Dict[str, Tool] = {tool.name: tool for tool in tools}
+        self.logger = structlog.get_logger(__name__)
+        self._tools_list = {
+            "tools": [
+                {"name": tool.name, "description": tool.description, "inputSchema": tool.input_schema}
+                for tool in tools
+            ]
+        }
+    
+    async def handle_payload(self, payload: Any, principal: Any, notify: Optional[Notify] = None) -> Any:
+        """處理單一訊息或批次，沒有需要回覆的內容時回傳 None"""
+        if isinstance(payload, list):
+            if not payload:
+                return error_response(None, INVALID_REQUEST, "空的批次")
+            responses = await asyncio.gather(*(self.handle(message, principal, notify) for message in payload))
+            return [response for response in responses if response is not None] or None
+        return await self.handle(payload, principal, notify)
+    
+    async def handle(self, message: Any, principal: Any, notify: Optional[Notify] = None) -> Optional[Dict[str, Any]]:
+        """處理單一 JSON-RPC 訊息，通知（沒有 id）與客戶端送來的回應回傳 None"""
+        if not isinstance(message, dict) or message.get("jsonrpc") != "2.0":
+            return error_response(None, INVALID_REQUEST, "不是 JSON-RPC 2.0 訊息")
+        method = message.get("method")
+        if method is None:
+            return None  # 客戶端對伺服器請求的回應（本伺服器不發送請求）
+        
+        request_id = message.get("id")
+        is_notification = "id" not in message
+        try:
+            if not isinstance(method, str):
+                raise JsonRpcError(INVALID_REQUEST, "method 必須是字串")
+            params = message.get("params") or {}
+            if not isinstance(params, dict):
+                raise JsonRpcError(INVALID_PARAMS, "params 必須是物件")
+            result = await self.dispatch(method, params, principal, notify)
+        except JsonRpcError as e:
+            return None if is_notification else error_response(request_id, e.code, e.message)
+        except Exception as e:
+            self.logger.error("處理 MCP 請求失敗", method=method, error=str(e))
+            return None if is_notification else error_response(request_id, INTERNAL_ERROR, "伺服器內部錯誤")
+        
+        if is_notification:
+            return None
+        return {"jsonrpc": "2.0", "id": request_id, "result": result}
+    
+    async def dispatch(self, method: str, params: Dict[str, Any], principal: Any,
+                       notify: Optional[Notify]) -> Optional[Dict[str, Any]]:
+        if method == "tools/call":
+            return await self.call_tool(params, principal, notify)
+        if method == "tools/list":
+            return self._tools_list
+        if method == "ping":
+            return {}
+        if method == "initialize":
+            requested = params.get("protocolVersion")
+            result = {
+                "protocolVersion": requested if requested in PROTOCOL_VERSIONS else PROTOCOL_VERSIONS[0],
+                "capabilities": {"tools": {"listChanged": False}},
+                "serverInfo": {"name": self.name, "version": self.version}
+            }
+            if self.instructions:
+                result["instructions"] = self.instructions
+            return result
+        if method.startswith("notifications/"):
+            return None  # initialized、cancelled 等通知不需要處理
+        raise JsonRpcError(METHOD_NOT_FOUND, f"不支援的方法: {method}")
+    
+    async def call_tool(self, params: Dict[str, Any], principal: Any, notify: Optional[Notify]) -> Dict[str, Any]:
+        """呼叫工具；工具執行失敗以 isError 結果回覆，未知工具或參數格式錯誤回覆協定錯誤"""
+        tool = self.tools.get(params.get("name"))
+        if tool is None:
+            raise JsonRpcError(INVALID_PARAMS, f"未知的工具: {params.get('name')}")
+        arguments = params.get("arguments") or {}
+        if not isinstance(arguments, dict):
+            raise JsonRpcError(INVALID_PARAMS, "arguments 必須是物件")
+        
+        meta = params.get("_meta") or {}
+        context = ToolContext(principal, meta.get("progressToken"), notify)
+        try:
+            return tool_result(await tool.handler(arguments, context))
+        except ToolError as e:
+            return tool_result({"error": str(e)}, is_error=True)
+        except Exception as e:
+            self.logger.error("MCP 工具執行失敗", tool=tool.name, error=str(e))
+            return tool_result({"error": str(e)}, is_error=True)
@@ -5,24 +5,65 @@ MCP Server 主程式
 
 import asyncio
 import json
-from datetime import datetime
-from typing import Dict, Any, Optional, List
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends, Header
+import math
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Any, Optional, List
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends, Header, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-import uvicorn
 import structlog
 import httpx
 
+from ..shared.archive import NotificationArchiver, get_archive_store
+from ..shared.blobs import BlobTooLargeError, get_blob_store, is_blob_id
 from ..shared.config import settings, setup_logging, validate_settings
-from ..shared.database import initialize_database, get_notification_repo, get_project_repo
+from ..shared.database import (
+    initialize_database, get_db_manager, get_notification_repo, get_project_repo,
+    get_preferences_repo, get_api_key_repo, get_subscription_repo, get_lease_repo, get_blob_owner_repo,
+    DuplicateNotificationError
+)
+from ..shared.polling import AdaptiveInterval
+from ..shared.ratelimit import TokenBucketLimiter
+from ..shared.metrics import (
+    DISPATCH_BACKLOG, NOTIFICATIONS_CREATED, NOTIFICATIONS_DEDUPLICATED, NOTIFICATIONS_REJECTED,
+    NOTIFICATIONS_SHED, render_metrics
+)
+from ..shared.tracing import (
+    SpanKind, TracingMiddleware, extract_metadata, inject_headers, inject_metadata,
+    setup_tracing, shutdown_tracing, start_span
+)
 from ..shared.models import (
     Notification, NotificationType, Priority, NotificationStatus,
-    Project, WorkStatus, MCPResponse, SystemHealth
+    Project, WorkStatus, MCPResponse, SystemHealth, UserPreferences, NotificationResponse, ReceiptBatch, ApiKey,
+    Subscription, enum_value
 )
+from .auth import Principal, generate_api_key, get_authenticator, hash_api_key
+from .attachments import resolve_attachment, spill_content
+from .digest import NotificationDigest, DigestBatch
+from .filtering import PreferenceFilter, FilterDecision
+from .dedup import NotificationDeduplicator
+from .fanout import Destination, FanoutPlanner, group_by_route
+from . import jsonrpc
+from .jsonrpc import MCPProtocol
+from .scheduler import DeliveryScheduler
+from .routing import ShardRouter
+from .tools import build_tools
+from .pagination import decode_cursor, encode_cursor
+from .ratelimit import Backpressure
+from .replies import ReplyNotifier
 
-# 設置日誌
-logger = setup_logging()
+# 日誌在啟動事件中設置，匯入模組時不建立檔案或處理器
+logger = structlog.get_logger()
+
+# 不會再收到回覆的狀態（wait_for_reply 立即回傳）
+UNREPLIABLE_STATUSES = frozenset({
+    NotificationStatus.FAILED.value, NotificationStatus.FILTERED.value, NotificationStatus.EXPIRED.value
+})
+
+# 封存工作的租約名稱（多個副本時只有一個副本執行封存）
+ARCHIVE_LEASE = "archiver"
 
 # FastAPI 應用程式
 app = FastAPI(
@@ -31,24 +72,65 @@ app = FastAPI(
     version="1.0.0"
 )
 
+class SettingsCORSMiddleware(CORSMiddleware):
+    """CORS 中介層（允許來源在建立中介層堆疊時才從設定讀取，而非匯入模組時）"""
+    
+    def __init__(self, app):
+        super().__init__(
+            app,
+            allow_origins=settings.get_cors_origins(),
+            allow_credentials=True,
+            allow_methods=["*"],
+            allow_headers=["*"],
+        )
+
+
 # CORS 設定
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=settings.get_cors_origins(),
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+app.add_middleware(SettingsCORSMiddleware)
+app.add_middleware(TracingMiddleware)
 
 # 安全設定
 security = HTTPBearer()
 
 
-def verify_api_key(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """驗證 API 金鑰"""
-    if credentials.credentials != settings.mcp_server_api_key:
+async def verify_api_key(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Principal:
+    """驗證 API 金鑰或 JWT，並檢查該金鑰的請求頻率與每日配額（驗證結果快取命中時不查詢資料庫）"""
+    authenticator = get_authenticator()
+    hit, principal = authenticator.cached(credentials.credentials)
+    if not hit:
+        principal = await run_in_threadpool(authenticator.authenticate, credentials.credentials)
+    if principal is None:
         raise HTTPException(status_code=401, detail="無效的 API 金鑰")
-    return credentials.credentials
+    
+    retry_after = authenticator.limiter.check(principal)
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=429,
+            detail="超過 API 金鑰的請求頻率或每日配額",
+            headers={"Retry-After": str(math.ceil(retry_after))}
+        )
+    return principal
+
+
+async def require_admin(principal: Principal = Depends(verify_api_key)) -> Principal:
+    """限管理員金鑰"""
+    if not principal.is_admin:
+        raise HTTPException(status_code=403, detail="需要管理員權限")
+    return principal
+
+
+async def can_access_blob(blob_id: str, principal: Principal) -> bool:
+    """未綁定專案的金鑰可存取所有內容；專案金鑰只能存取自己專案上傳或通知引用的內容"""
+    if principal.project_id is None:
+        return True
+    return await run_in_threadpool(get_blob_owner_repo().is_owner, blob_id, principal.project_id)
+
+
+async def require_unscoped(principal: Principal = Depends(verify_api_key)) -> Principal:
+    """限未綁定專案的金鑰（機器人回報回覆、回執與使用者偏好設定）"""
+    if principal.project_id is not None:
+        raise HTTPException(status_code=403, detail="專案金鑰無權存取此端點")
+    return principal
 
 
 class NotificationService:
@@ -59,10 +141,247 @@ class NotificationService:
         self.project_repo = get_project_repo()
         self.logger = structlog.get_logger(__name__)
         self.http_client = httpx.AsyncClient()
+        self.digest = NotificationDigest(
+            window_seconds=settings.digest_window_seconds,
+            max_items=settings.digest_max_items,
+            max_priority=settings.digest_max_priority
+        ) if settings.digest_enabled else None
+        self.preference_filter = PreferenceFilter(get_preferences_repo(), settings.preferences_refresh_seconds)
+        self.fanout = FanoutPlanner(get_subscription_repo())
+        self.deduplicator = NotificationDeduplicator(
+            window_seconds=settings.dedup_window_seconds,
+            cache_size=settings.dedup_cache_size,
+            idempotency_ttl_seconds=settings.idempotency_key_ttl_seconds
+        )
+        self.scheduler = DeliveryScheduler()
+        self.last_lease_reap = 0.0
+        self.shard_router = ShardRouter(settings.get_bot_api_urls())
+        self.last_shard_refresh = None
+        self.wakeup = asyncio.Event()  # 有新的到期排程或立即通知時喚醒派送器
+        # 有工作時縮短輪詢間隔，閒置時逐步拉長（本副本建立的通知會直接喚醒派送器）
+        self.poll_interval = AdaptiveInterval(settings.dispatch_poll_min_seconds, settings.dispatch_poll_max_seconds)
+        self.ingress_limiter = TokenBucketLimiter(settings.ingress_rate_per_second, settings.ingress_burst)
+        self.backpressure = Backpressure(
+            shed_threshold=settings.backpressure_shed_threshold,
+            reject_threshold=settings.backpressure_reject_threshold
+        )
+        self.reply_notifier = ReplyNotifier()  # 本副本收到回覆時喚醒 wait_for_reply
+    
+    async def submit_notification(self, notification_data: Dict[str, Any], principal: Principal,
+                                  idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+        """建立通知（REST 端點與 MCP 工具共用）：限流、轉存大型內容、去重後寫入並喚醒派送器
+        
+        請求無效、被限流或積壓過高時拋出 HTTPException。
+        """
+        if idempotency_key is not None and not 0 < len(idempotency_key) <= 200:
+            raise HTTPException(status_code=400, detail="Idempotency-Key 長度需為 1-200 字元")
+        
+        # 專案金鑰只能建立自己專案的通知，未指定專案時預設為金鑰的專案
+        project_id = notification_data.get("project_id") or principal.project_id
+        if not principal.can_access_project(project_id):
+            raise HTTPException(status_code=403, detail="API 金鑰無權存取此專案")
+        
+        # 每個金鑰與專案各自限流，單一失控的代理程式不會擠掉其他人的通知
+        retry_after = self.ingress_limiter.acquire((principal.key_id, project_id))
+        if retry_after is not None:
+            NOTIFICATIONS_REJECTED.labels(reason="rate_limited").inc()
+            raise HTTPException(
+                status_code=429,
+                detail="建立通知的速率過高",
+                headers={"Retry-After": str(math.ceil(retry_after))}
+            )
+        
+        # 超過通知上限的內容轉存為附件，或引用已上傳的附件；資料表只記錄參照
+        metadata = dict(notification_data.get("metadata") or {})
+        content, attachment = await run_in_threadpool(spill_content, notification_data["content"], get_blob_store())
+        if attachment is None and notification_data.get("attachment") is not None:
+            try:
+                attachment = await run_in_threadpool(
+                    resolve_attachment, notification_data["attachment"], get_blob_store()
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            # 其他專案的內容視同不存在（內容定址，不能讓呼叫端藉由雜湊值取得別人的內容）
+            if not await can_access_blob(attachment["blob_id"], principal):
+                raise HTTPException(status_code=400, detail=f"附件內容不存在: {attachment['blob_id']}")
+        if attachment is not None:
+            metadata["attachment"] = attachment
+            # 通知所屬專案的金鑰可下載附件
+            if project_id is not None:
+                await run_in_threadpool(get_blob_owner_repo().add_owner, attachment["blob_id"], project_id)
+        
+        # 驗證和建立通知物件
+        notification = Notification(
+            type=NotificationType(notification_data.get("type", "milestone")),
+            title=notification_data["title"],
+            content=content,
+            priority=Priority(notification_data.get("priority", "medium")),
+            project_id=project_id,
+            deliver_at=notification_data.get("deliver_at"),
+            expires_at=notification_data.get("expires_at"),
+            metadata=metadata
+        )
+        # 保存追蹤上下文，派送與回覆時接續同一條追蹤
+        inject_metadata(notification.metadata)
+        
+        # 支援相對時間，例如 30 分鐘後提醒
+        now = datetime.utcnow()
+        if notification_data.get("delay_seconds") is not None:
+            notification.deliver_at = now + timedelta(seconds=float(notification_data["delay_seconds"]))
+        if notification_data.get("ttl_seconds") is not None:
+            notification.expires_at = now + timedelta(seconds=float(notification_data["ttl_seconds"]))
+        
+        # 先查記憶體快取，重試請求通常不需要碰資料庫
+        deduplicator = self.deduplicator
+        dedup_keys = deduplicator.keys_for(notification, idempotency_key, scope=principal.key_id or project_id)
+        existing_id = deduplicator.lookup(dedup_keys)
+        
+        if existing_id is None:
+            if not self.backpressure.admit(notification.priority):
+                NOTIFICATIONS_REJECTED.labels(reason="backpressure").inc()
+                raise HTTPException(
+                    status_code=503,
+                    detail="派送積壓過高，暫不接受此優先級的通知",
+                    headers={"Retry-After": str(settings.backpressure_retry_after_seconds)}
+                )
+            
+            try:
+                # 儲存通知到資料庫（在執行緒池等待寫入執行緒，並行請求可合併提交）
+                with start_span("notification.store") as span:
+                    notification_id = await run_in_threadpool(
+                        get_notification_repo().create_notification,
+                        notification,
+                        dedup_key=dedup_keys.db_key if dedup_keys else None
+                    )
+                    span.set_attribute("notification.id", notification_id)
+                deduplicator.remember(dedup_keys, notification_id)
+                self.backpressure.record_admitted()
+                NOTIFICATIONS_CREATED.labels(type=notification.type).inc()
+                
+                if notification.deliver_at is not None and notification.deliver_at > now:
+                    self.schedule_notification(notification_id, notification.deliver_at)
+                else:
+                    self.wakeup.set()
+                
+                logger.info("通知建立成功", notification_id=notification_id, sampled=True)
+                
+                return {
+                    "notification_id": notification_id,
+                    "message": "通知建立成功，正在處理發送"
+                }
+            except DuplicateNotificationError as e:
+                existing_id = e.notification_id
+                deduplicator.remember(dedup_keys, existing_id)
+                NOTIFICATIONS_DEDUPLICATED.labels(reason=dedup_keys.reason, source="database").inc()
+        else:
+            NOTIFICATIONS_DEDUPLICATED.labels(reason=dedup_keys.reason, source="cache").inc()
+        
+        logger.info("重複通知已忽略", notification_id=existing_id, reason=dedup_keys.reason, sampled=True)
+        
+        return {
+            "notification_id": existing_id,
+            "duplicate": True,
+            "message": "重複的通知，已忽略"
+        }
+    
+    async def update_work_status(self, status_data: WorkStatus, principal: Principal) -> Dict[str, Any]:
+        """更新工作狀態（REST 端點與 MCP 工具共用）"""
+        if not principal.can_access_project(status_data.project_id):
+            raise HTTPException(status_code=403, detail="API 金鑰無權存取此專案")
+        
+        updated = await run_in_threadpool(self.project_repo.update_work_status, status_data)
+        if not updated:
+            raise HTTPException(status_code=404, detail="專案不存在")
+        
+        logger.info("工作狀態更新", project_id=status_data.project_id, progress=status_data.progress, sampled=True)
+        return {"message": "工作狀態更新成功"}
+    
+    async def wait_for_reply(self, notification_id: str, principal: Principal, timeout: float,
+                             on_status: Optional[Callable[[str], Awaitable[None]]] = None) -> Dict[str, Any]:
+        """等待通知的回覆，逾時或通知已無法回覆時回傳目前狀態
+        
+        本副本收到回覆時立即喚醒，否則每 REPLY_POLL_SECONDS 查詢一次資料庫（回覆可能由其他副本接收）；
+        狀態改變（已發送、已送達、已讀）時呼叫 on_status，讓呼叫端串流進度。
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        last_status = None
+        while True:
+            notification = await run_in_threadpool(self.notification_repo.get_notification, notification_id)
+            # 其他專案的通知視同不存在
+            if notification is None or not principal.can_access_project(notification.project_id):
+                raise HTTPException(status_code=404, detail="通知不存在")
+            
+            status = enum_value(notification.status)
+            result = {"notification_id": notification_id, "status": status, "replied": False, "timed_out": False}
+            if status == NotificationStatus.REPLIED.value:
+                response = await run_in_threadpool(self.notification_repo.get_latest_response, notification_id)
+                result["replied"] = True
+                if response is not None:
+                    result.update(
+                        response_text=response.response_text,
+                        user_id=response.user_id,
+                        responded_at=response.responded_at.isoformat()
+                    )
+                return result
+            if status in UNREPLIABLE_STATUSES:
+                return result
+            
+            if on_status is not None and status != last_status:
+                await on_status(status)
+            last_status = status
+            
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                result["timed_out"] = True
+                return result
+            await self.reply_notifier.wait(notification_id, min(remaining, settings.reply_poll_seconds))
+    
+    def target_guild(self, notification: Notification) -> Optional[str]:
+        """通知的目標 Discord 伺服器（metadata 指定優先，否則使用預設伺服器）"""
+        return notification.metadata.get("guild_id") or settings.discord_guild_id
+    
+    async def refresh_shard_map(self, force: bool = False):
+        """定期向機器人程序更新分片對照表（只有單一機器人程序時不需要）"""
+        if len(self.shard_router.bot_api_urls) < 2:
+            return
+        now = asyncio.get_running_loop().time()
+        if (not force and self.last_shard_refresh is not None
+                and now - self.last_shard_refresh < settings.shard_map_refresh_seconds):
+            return
+        self.last_shard_refresh = now
+        await self.shard_router.refresh(self.http_client)
+    
+    async def post_notification(self, bot_url: str, payload: Dict[str, Any]) -> httpx.Response:
+        """將通知送到指定的機器人程序"""
+        headers = {
+            "Authorization": f"Bearer {settings.webhook_secret}",
+            "Content-Type": "application/json"
+        }
+        with start_span("discord_bot.deliver", kind=SpanKind.CLIENT, attributes={
+            "notification.id": payload["notification_id"],
+            "discord.guild_id": payload.get("guild_id"),
+            "notification.destinations": len(payload.get("destinations") or ()),
+            "http.url": bot_url
+        }) as span:
+            response = await self.http_client.post(
+                f"{bot_url}/api/notifications",
+                json=payload,
+                headers=inject_headers(headers),
+                timeout=30.0
+            )
+            span.set_attribute("http.status_code", response.status_code)
+        return response
     
-    async def send_notification_to_discord(self, notification: Notification) -> bool:
-        """發送通知到 Discord Bot"""
+    async def send_notification_to_discord(self, notification: Notification,
+                                           destinations: Optional[List[Destination]] = None) -> bool:
+        """發送通知到 Discord Bot（依目標伺服器路由到負責的分片程序）
+        
+        有訂閱目的地時依目的地所屬分片分組，同時送到各個機器人程序，由機器人並行發送並依目的地限流；
+        部分目的地失敗時整則通知稍後重送，機器人依目的地去重，已送達的目的地不會重複發送。
+        """
         try:
+            guild_id = self.target_guild(notification)
             payload = {
                 "notification_id": notification.id,
                 "type": notification.type,
@@ -70,78 +389,287 @@ class NotificationService:
                 "content": notification.content,
                 "priority": notification.priority,
                 "project_id": notification.project_id,
+                "guild_id": guild_id,
                 "created_at": notification.created_at.isoformat()
             }
+            if notification.type == NotificationType.QUESTION and notification.metadata.get("choices"):
+                # 預設選項，由機器人顯示為按鈕或下拉選單
+                payload["choices"] = notification.metadata["choices"]
+            if notification.metadata.get("attachment"):
+                # 大型內容由機器人從 /api/v1/blobs 下載後以分頁或檔案附件送出
+                payload["attachment"] = notification.metadata["attachment"]
+            
+            if destinations:
+                routes = group_by_route(destinations, self.shard_router.route)
+                responses = await asyncio.gather(*(
+                    self.post_notification(bot_url, {
+                        **payload,
+                        "destinations": [destination.to_payload() for destination in route_destinations]
+                    })
+                    for bot_url, route_destinations in routes.items()
+                ))
+            else:
+                responses = [await self.post_notification(self.shard_router.route(guild_id), payload)]
+            
+            failed = [response for response in responses if response.status_code != 200]
+            if not failed:
+                # 更新通知狀態為已發送，同一交易移除外寄匣資料列（送達確認）
+                await run_in_threadpool(self.notification_repo.transition_status, notification.id, NotificationStatus.SENT)
+                self.logger.info("通知發送成功", notification_id=notification.id,
+                                 destinations=len(destinations or ()), sampled=True)
+                return True
+            else:
+                if any(response.status_code == 409 for response in failed):
+                    # 分片對照表過期，下次處理前重新整理
+                    self.last_shard_refresh = None
+                self.logger.error("Discord Bot 回應錯誤", status_code=failed[0].status_code, body=failed[0].text)
+                return False
+                
+        except Exception as e:
+            self.logger.error("發送通知到 Discord 失敗", notification_id=notification.id, error=str(e))
+            # 更新通知狀態為失敗
+            await run_in_threadpool(self.notification_repo.transition_status, notification.id, NotificationStatus.FAILED)
+            return False
+    
+    async def send_digest_to_discord(self, batch: DigestBatch) -> bool:
+        """發送摘要通知到 Discord Bot"""
+        notification_ids = [notification.id for notification in batch.notifications]
+        try:
+            guild_id = batch.guild_id or settings.discord_guild_id
+            payload = {
+                "digest_key": batch.digest_key,
+                "project_id": batch.project_id,
+                "guild_id": guild_id,
+                "edit_in_place": settings.digest_edit_in_place,
+                "items": [
+                    {
+                        "notification_id": notification.id,
+                        "type": notification.type,
+                        "title": notification.title,
+                        "content": notification.content,
+                        "priority": notification.priority,
+                        "created_at": notification.created_at.isoformat()
+                    }
+                    for notification in batch.notifications
+                ]
+            }
             
             headers = {
                 "Authorization": f"Bearer {settings.webhook_secret}",
                 "Content-Type": "application/json"
             }
             
-            response = await self.http_client.post(
-                f"{settings.discord_bot_api_url}/api/notifications",
-                json=payload,
-                headers=headers,
-                timeout=30.0
-            )
+            with start_span("discord_bot.deliver_digest", kind=SpanKind.CLIENT, attributes={
+                "digest.key": batch.digest_key,
+                "digest.size": len(notification_ids)
+            }) as span:
+                response = await self.http_client.post(
+                    f"{self.shard_router.route(guild_id)}/api/notifications/digest",
+                    json=payload,
+                    headers=inject_headers(headers),
+                    timeout=30.0
+                )
+                span.set_attribute("http.status_code", response.status_code)
             
             if response.status_code == 200:
-                # 更新通知狀態為已發送
-                self.notification_repo.update_notification_status(
-                    notification.id, 
-                    NotificationStatus.SENT,
-                    "sent_at"
-                )
-                self.logger.info(f"通知發送成功: {notification.id}")
+                await run_in_threadpool(self.notification_repo.transition_statuses, notification_ids, NotificationStatus.SENT)
+                self.logger.info("摘要發送成功", digest_key=batch.digest_key, count=len(notification_ids))
                 return True
             else:
-                self.logger.error(f"Discord Bot 回應錯誤: {response.status_code} - {response.text}")
+                if response.status_code == 409:
+                    # 分片對照表過期，下次處理前重新整理
+                    self.last_shard_refresh = None
+                self.logger.error("Discord Bot 回應錯誤", status_code=response.status_code, body=response.text)
                 return False
                 
         except Exception as e:
-            self.logger.error(f"發送通知到 Discord 失敗: {e}")
-            # 更新通知狀態為失敗
-            self.notification_repo.update_notification_status(
-                notification.id, 
-                NotificationStatus.FAILED
-            )
+            self.logger.error("發送摘要到 Discord 失敗", digest_key=batch.digest_key, error=str(e))
+            await run_in_threadpool(self.notification_repo.transition_statuses, notification_ids, NotificationStatus.FAILED)
+            return False
+    
+    async def flush_digests(self, force: bool = False):
+        """發送已到期的摘要批次"""
+        if self.digest is None:
+            return
+        
+        batches = self.digest.pop_all() if force else self.digest.pop_due()
+        for batch in batches:
+            await self.send_digest_to_discord(batch)
+            await asyncio.sleep(1)
+    
+    def next_poll_delay(self, default: float) -> float:
+        """計算下次輪詢前的等待秒數（摘要或排程到期時提早喚醒）"""
+        delays = [default, self.scheduler.seconds_until_next()]
+        if self.digest is not None:
+            delays.append(self.digest.seconds_until_due())
+        return min(delay for delay in delays if delay is not None)
+    
+    def schedule_notification(self, notification_id: str, deliver_at: datetime):
+        """排程通知並喚醒派送器重新計算等待時間"""
+        self.scheduler.schedule(notification_id, deliver_at)
+        self.wakeup.set()
+    
+    async def wait_for_work(self, timeout: float):
+        """等待下一次輪詢、排程到期或被喚醒"""
+        try:
+            await asyncio.wait_for(self.wakeup.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        self.wakeup.clear()
+    
+    async def apply_preferences(self, notification: Notification) -> bool:
+        """依使用者偏好判斷通知是否可立即派送"""
+        decision, release_at = self.preference_filter.evaluate(notification)
+        
+        if decision == FilterDecision.DROP:
+            await run_in_threadpool(self.notification_repo.transition_status, notification.id, NotificationStatus.FILTERED)
+            return False
+        
+        if decision == FilterDecision.DEFER:
+            # 寫回排程時間，重新啟動後也會延後到勿擾時段結束
+            await run_in_threadpool(self.notification_repo.reschedule_notification, notification.id, release_at)
+            self.scheduler.schedule(notification.id, release_at)
+            self.logger.info("通知延後至勿擾時段結束", notification_id=notification.id, release_at=release_at)
             return False
+        
+        return True
+    
+    async def maintain_leases(self, now: datetime):
+        """延長摘要緩衝中通知的租約，並定期回收其他副本遺留的過期租約"""
+        if self.digest is not None and len(self.digest):
+            await run_in_threadpool(
+                self.notification_repo.extend_leases,
+                settings.replica_id,
+                self.digest.buffered_ids(),
+                settings.claim_lease_seconds,
+                now
+            )
+        
+        monotonic_now = asyncio.get_running_loop().time()
+        if monotonic_now - self.last_lease_reap >= settings.claim_lease_seconds:
+            await run_in_threadpool(self.notification_repo.reap_expired_leases, now)
+            self.last_lease_reap = monotonic_now
+    
+    async def dispatch_notification(self, notification: Notification, now: datetime,
+                                    destinations: Optional[List[Destination]] = None) -> str:
+        """派送單則通知，回傳處理結果（destinations 為訂閱展開的目的地）"""
+        if notification.expires_at is not None and notification.expires_at <= now:
+            await run_in_threadpool(self.notification_repo.transition_status, notification.id, NotificationStatus.EXPIRED, now)
+            return "expired"
+        
+        if self.backpressure.should_shed(notification.priority):
+            # 積壓過高時丟棄低優先級通知，讓派送器先處理較重要的通知
+            await run_in_threadpool(self.notification_repo.transition_status, notification.id, NotificationStatus.FILTERED, now)
+            NOTIFICATIONS_SHED.inc()
+            return "shed"
+        
+        if not await self.apply_preferences(notification):
+            return "filtered"
+        
+        # 有訂閱者的通知逐則送到各目的地，不併入預設頻道的摘要
+        if self.digest is not None and not destinations:
+            if self.digest.accepts(notification):
+                self.digest.add(notification)
+                return "digest"
+        
+        sent = await self.send_notification_to_discord(notification, destinations)
+        return "sent" if sent else "failed"
     
-    async def process_pending_notifications(self):
-        """處理待發送的通知"""
+    async def process_pending_notifications(self) -> int:
+        """處理待發送的通知，回傳本輪認領的通知數量"""
         try:
-            pending_notifications = self.notification_repo.get_pending_notifications()
+            now = datetime.utcnow()
+            self.scheduler.pop_due(now)
+            await self.maintain_leases(now)
+            
+            backlog = await run_in_threadpool(self.notification_repo.count_dispatch_backlog, now)
+            self.backpressure.update(backlog)
+            DISPATCH_BACKLOG.set(backlog)
+            await self.refresh_shard_map()
+            
+            # 以租約認領，多個副本共用資料庫時不會重複發送
+            pending_notifications = await run_in_threadpool(
+                self.notification_repo.claim_pending_notifications,
+                settings.replica_id,
+                settings.claim_lease_seconds,
+                settings.claim_batch_size,
+                now
+            )
+            # 整批通知只查詢一次訂閱表，展開為各自的目的地
+            fanout_plans = await run_in_threadpool(self.fanout.plan, pending_notifications)
+            if pending_notifications:
+                # 在執行緒池中檢查偏好是否被其他副本更新，逐則判斷時只在記憶體中完成
+                await run_in_threadpool(self.preference_filter.refresh)
             
             for notification in pending_notifications:
-                await self.send_notification_to_discord(notification)
-                # 加入小延遲避免頻率限制
-                await asyncio.sleep(1)
+                # 已在摘要緩衝區中，等待批次發送
+                if self.digest is not None and notification.id in self.digest:
+                    continue
+                
+                # 接續建立通知時的追蹤，記錄從建立到派送的等待時間
+                with start_span("notification.dispatch", parent=extract_metadata(notification.metadata), attributes={
+                    "notification.id": notification.id,
+                    "notification.type": notification.type,
+                    "notification.queued_ms": int((now - notification.created_at).total_seconds() * 1000)
+                }) as span:
+                    outcome = await self.dispatch_notification(notification, now, fanout_plans.get(notification.id))
+                    span.set_attribute("notification.outcome", outcome)
+            
+            await self.flush_digests()
+            return len(pending_notifications)
                 
         except Exception as e:
-            self.logger.error(f"處理待發送通知失敗: {e}")
+            self.logger.error("處理待發送通知失敗", error=str(e))
+            return 0
+
+
+# 通知服務實例（第一次使用時建立）
+_notification_service: Optional[NotificationService] = None
+
 
+def get_notification_service() -> NotificationService:
+    """獲取通知服務"""
+    global _notification_service
+    if _notification_service is None:
+        _notification_service = NotificationService()
+    return _notification_service
 
-# 通知服務實例
-notification_service = NotificationService()
+
+# MCP 協定處理器（stdio 與 POST /mcp 共用，工具直接呼叫通知服務）
+mcp_protocol = MCPProtocol(
+    name="discord-notifier",
+    version=app.version,
+    tools=build_tools(get_notification_service),
+    instructions="以 send_notification 發送 Discord 通知，問題通知再以 wait_for_reply 等待使用者回覆。"
+)
 
 
 @app.on_event("startup")
 async def startup_event():
     """應用程式啟動事件"""
+    setup_logging()
+    setup_tracing("mcp-server")
     try:
         # 驗證設定
-        validate_settings()
+        validate_settings("mcp_server")
         
         # 初始化資料庫
         initialize_database()
+        get_db_manager().start_writer()
+        notification_service = get_notification_service()
+        
+        # 以資料庫中的排程重建計時器
+        notification_service.scheduler.rebuild(get_notification_repo().get_scheduled_notifications())
         
         # 啟動背景任務處理通知
         asyncio.create_task(notification_processor())
+        if settings.archive_enabled:
+            asyncio.create_task(archive_processor())
         
-        logger.info("MCP Server 啟動成功")
+        logger.info("MCP Server 啟動成功", replica_id=settings.replica_id)
         
     except Exception as e:
-        logger.error(f"MCP Server 啟動失敗: {e}")
+        logger.error("MCP Server 啟動失敗", error=str(e))
         raise
 
 
@@ -149,87 +677,337 @@ async def startup_event():
 async def shutdown_event():
     """應用程式關閉事件"""
     try:
+        notification_service = get_notification_service()
+        await notification_service.flush_digests(force=True)
         await notification_service.http_client.aclose()
+        get_notification_repo().release_claims(settings.replica_id)
+        if settings.archive_enabled:
+            get_lease_repo().release(ARCHIVE_LEASE, settings.replica_id)
+        get_db_manager().stop_writer()
+        shutdown_tracing()
         logger.info("MCP Server 關閉完成")
     except Exception as e:
-        logger.error(f"MCP Server 關閉失敗: {e}")
+        logger.error("MCP Server 關閉失敗", error=str(e))
 
 
 async def notification_processor():
     """通知處理背景任務"""
+    notification_service = get_notification_service()
     while True:
         try:
-            await notification_service.process_pending_notifications()
-            await asyncio.sleep(10)  # 每 10 秒檢查一次
+            claimed = await notification_service.process_pending_notifications()
+            # 有工作時很快再檢查一次，閒置時逐步拉長間隔；摘要或排程到期、建立新通知時提早處理
+            poll_interval = notification_service.poll_interval
+            delay = poll_interval.reset() if claimed else poll_interval.backoff()
+            await notification_service.wait_for_work(notification_service.next_poll_delay(delay))
         except Exception as e:
-            logger.error(f"通知處理器錯誤: {e}")
+            logger.error("通知處理器錯誤", error=str(e))
             await asyncio.sleep(30)  # 發生錯誤時等待更長時間
 
 
+async def archive_processor():
+    """通知封存背景任務（定期把超過保留天數的已結束通知移出主資料表）
+    
+    封存分割檔寫在 ARCHIVE_DIR，多個副本時必須是所有副本共用的儲存空間，
+    其他副本才能讀取封存的通知。
+    """
+    archiver = NotificationArchiver(
+        get_notification_repo(),
+        get_archive_store(),
+        retention_days=settings.archive_retention_days,
+        chunk_size=settings.archive_chunk_size
+    )
+    # 多個副本時只由持有租約的副本封存，避免同時搬移相同的資料列；
+    # 租約長於執行間隔，持有者正常運作時會持續續約，停止後由其他副本接手
+    lease_seconds = settings.archive_interval_seconds * 2
+    while True:
+        try:
+            if await run_in_threadpool(
+                get_lease_repo().try_acquire, ARCHIVE_LEASE, settings.replica_id, lease_seconds
+            ):
+                await run_in_threadpool(archiver.run_once)
+        except Exception as e:
+            logger.error("通知封存失敗", error=str(e))
+        await asyncio.sleep(settings.archive_interval_seconds)
+
+
+@app.get("/livez")
+async def liveness_check():
+    """存活檢查端點（不查詢資料庫或其他服務，供頻繁探測使用）"""
+    return {"status": "alive", "timestamp": datetime.utcnow().isoformat()}
+
+
+async def probe_bot(bot_url: str) -> bool:
+    """檢查單一機器人程序是否正常"""
+    try:
+        response = await get_notification_service().http_client.get(f"{bot_url}/health", timeout=5.0)
+        return response.status_code == 200
+    except Exception:
+        return False
+
+
 @app.get("/health")
 async def health_check():
-    """健康檢查端點"""
+    """就緒檢查端點（檢查資料庫與 Discord Bot，成本較高）"""
     try:
         # 檢查資料庫
         db_status = "healthy" if get_notification_repo().db_manager.health_check() else "unhealthy"
         
-        # 檢查 Discord Bot 連接（簡單測試）
-        discord_status = "unknown"
-        try:
-            response = await notification_service.http_client.get(
-                f"{settings.discord_bot_api_url}/health",
-                timeout=5.0
-            )
-            discord_status = "healthy" if response.status_code == 200 else "unhealthy"
-        except:
+        # 同時檢查每個機器人程序（分片），部分程序異常時回報 degraded
+        bot_urls = settings.get_bot_api_urls()
+        healthy = await asyncio.gather(*(probe_bot(bot_url) for bot_url in bot_urls))
+        if all(healthy):
+            discord_status = "healthy"
+        elif any(healthy):
+            discord_status = "degraded"
+            logger.warning("部分機器人程序異常", unhealthy=[url for url, ok in zip(bot_urls, healthy) if not ok])
+        else:
             discord_status = "unhealthy"
         
         return SystemHealth(
             mcp_server_status="healthy",
             discord_bot_status=discord_status,
             database_status=db_status,
-            pending_notifications=len(get_notification_repo().get_pending_notifications()),
-            active_projects=len(get_project_repo().get_active_projects())
+            pending_notifications=get_notification_repo().count_dispatch_backlog(),
+            active_projects=get_project_repo().count_active_projects()
         )
         
     except Exception as e:
-        logger.error(f"健康檢查失敗: {e}")
+        logger.error("健康檢查失敗", error=str(e))
         raise HTTPException(status_code=500, detail="健康檢查失敗")
 
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus 監控指標"""
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
+
+
 @app.post("/api/v1/notifications")
 async def create_notification(
     notification_data: Dict[str, Any],
     background_tasks: BackgroundTasks,
-    api_key: str = Depends(verify_api_key)
+    principal: Principal = Depends(verify_api_key),
+    idempotency_key: Optional[str] = Header(None)
 ):
-    """建立通知"""
+    """建立通知（支援 Idempotency-Key 標頭與內容去重）"""
     try:
-        # 驗證和建立通知物件
-        notification = Notification(
-            type=NotificationType(notification_data.get("type", "milestone")),
-            title=notification_data["title"],
-            content=notification_data["content"],
-            priority=Priority(notification_data.get("priority", "medium")),
-            project_id=notification_data.get("project_id"),
-            metadata=notification_data.get("metadata", {})
+        data = await get_notification_service().submit_notification(notification_data, principal, idempotency_key)
+        
+        return MCPResponse(
+            success=True,
+            data=data
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("建立通知失敗", error=str(e))
+        return MCPResponse(
+            success=False,
+            error=str(e)
+        )
+
+
+@app.post("/mcp")
+async def mcp_endpoint(
+    request: Request,
+    principal: Principal = Depends(verify_api_key)
+):
+    """MCP streamable HTTP 傳輸（JSON-RPC）
+    
+    只有通知或回應時回覆 202；客戶端接受 text/event-stream 時以 SSE 串流工具進度，最後送出結果，
+    否則直接回覆 JSON。
+    """
+    try:
+        payload = jsonrpc.loads(await request.body())
+    except ValueError:
+        return Response(
+            content=jsonrpc.dumps(jsonrpc.error_response(None, jsonrpc.PARSE_ERROR, "無法解析 JSON")),
+            media_type="application/json",
+            status_code=400
         )
+    
+    if not jsonrpc.has_requests(payload):
+        await mcp_protocol.handle_payload(payload, principal)
+        return Response(status_code=202)
+    
+    if "text/event-stream" not in request.headers.get("accept", ""):
+        result = await mcp_protocol.handle_payload(payload, principal)
+        return Response(content=jsonrpc.dumps(result), media_type="application/json")
+    
+    events: asyncio.Queue = asyncio.Queue()
+    
+    async def handle():
+        try:
+            await events.put(await mcp_protocol.handle_payload(payload, principal, events.put))
+        finally:
+            await events.put(None)
+    
+    async def stream():
+        task = asyncio.create_task(handle())
+        try:
+            while True:
+                message = await events.get()
+                if message is None:
+                    break
+                yield b"event: message\ndata: " + jsonrpc.dumps(message) + b"\n\n"
+        finally:
+            # 客戶端中斷連線時取消仍在等待的工具（例如 wait_for_reply）
+            task.cancel()
+    
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.put("/api/v1/blobs")
+async def upload_blob(
+    request: Request,
+    principal: Principal = Depends(verify_api_key)
+):
+    """上傳大型內容（請求本體串流寫入內容定址儲存，相同內容只儲存一次），回傳可用於 attachment 的 blob_id"""
+    store = get_blob_store()
+    content_length = request.headers.get("content-length")
+    if content_length is not None and content_length.isdigit() and int(content_length) > store.max_bytes:
+        raise HTTPException(status_code=413, detail=f"內容超過 {store.max_bytes} bytes 上限")
+    
+    writer = await run_in_threadpool(store.writer)
+    try:
+        async for chunk in request.stream():
+            if chunk:
+                await run_in_threadpool(writer.write, chunk)
+        info = await run_in_threadpool(writer.commit)
+        if principal.project_id is not None:
+            await run_in_threadpool(get_blob_owner_repo().add_owner, info.blob_id, principal.project_id)
+        logger.info("內容上傳完成", blob_id=info.blob_id, size=info.size, sampled=True)
+        
+        return MCPResponse(
+            success=True,
+            data={"blob_id": info.blob_id, "size": info.size}
+        )
+    
+    except BlobTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        writer.abort()
+        logger.error("上傳內容失敗", error=str(e))
+        return MCPResponse(
+            success=False,
+            error=str(e)
+        )
+
+
+@app.get("/api/v1/blobs/{blob_id}")
+async def download_blob(
+    blob_id: str,
+    principal: Principal = Depends(verify_api_key)
+):
+    """下載內容（逐塊串流讀取，不整份載入記憶體；內容不會變動，可長期快取）
+    
+    專案金鑰只能下載自己專案的內容，其他內容一律回傳 404，不透露內容是否存在。
+    """
+    store = get_blob_store()
+    size = store.size(blob_id) if is_blob_id(blob_id) else None
+    if size is None or not await can_access_blob(blob_id, principal):
+        raise HTTPException(status_code=404, detail="內容不存在")
+    
+    return StreamingResponse(
+        store.iter_chunks(blob_id),
+        media_type="application/octet-stream",
+        headers={
+            "Content-Length": str(size),
+            "ETag": f'"{blob_id}"',
+            "Cache-Control": "private, max-age=31536000, immutable"
+        }
+    )
+
+
+@app.get("/api/v1/notifications")
+async def list_notifications(
+    project_id: Optional[str] = None,
+    status: Optional[NotificationStatus] = None,
+    type: Optional[NotificationType] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    format: str = Query("json", regex="^(json|ndjson)$"),
+    principal: Principal = Depends(verify_api_key)
+):
+    """列出通知（由新到舊，以 next_cursor 取得下一頁；format=ndjson 時串流匯出所有符合的通知）"""
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    project_id = project_id or principal.project_id
+    if not principal.can_access_project(project_id):
+        raise HTTPException(status_code=403, detail="API 金鑰無權存取此專案")
+    
+    try:
+        filters = {
+            "project_id": project_id,
+            "status": status,
+            "type": type,
+            "created_after": created_after,
+            "created_before": created_before,
+            "after": after
+        }
+        repo = get_notification_repo()
         
-        # 儲存通知到資料庫
-        notification_id = get_notification_repo().create_notification(notification)
+        if format == "ndjson":
+            lines = (notification.json() + "\n" for notification in repo.iter_notifications(**filters))
+            return StreamingResponse(lines, media_type="application/x-ndjson")
         
-        logger.info(f"通知建立成功: {notification_id}")
+        notifications = await run_in_threadpool(repo.list_notifications, limit, **filters)
         
         return MCPResponse(
             success=True,
             data={
-                "notification_id": notification_id,
-                "message": "通知建立成功，正在處理發送"
+                "notifications": [notification.dict() for notification in notifications],
+                "count": len(notifications),
+                "next_cursor": encode_cursor(notifications[-1]) if len(notifications) == limit else None
             }
         )
         
     except Exception as e:
-        logger.error(f"建立通知失敗: {e}")
+        logger.error("列出通知失敗", error=str(e))
+        return MCPResponse(
+            success=False,
+            error=str(e)
+        )
+
+
+@app.get("/api/v1/notifications/search")
+async def search_notifications(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    principal: Principal = Depends(verify_api_key)
+):
+    """全文搜尋通知與回覆"""
+    try:
+        # 專案金鑰只搜尋自己專案的通知（在索引查詢中過濾，分頁不受其他專案影響）
+        results = await run_in_threadpool(
+            get_notification_repo().search_notifications, q, limit, offset, principal.project_id
+        )
+        
+        return MCPResponse(
+            success=True,
+            data={
+                "query": q,
+                "results": [
+                    {**notification.dict(), "matched": hit.kind, "score": hit.score}
+                    for notification, hit in results
+                ],
+                "count": len(results),
+                "limit": limit,
+                "offset": offset
+            }
+        )
+        
+    except Exception as e:
+        logger.error("搜尋通知失敗", query=q, error=str(e))
         return MCPResponse(
             success=False,
             error=str(e)
@@ -239,13 +1017,14 @@ async def create_notification(
 @app.get("/api/v1/notifications/{notification_id}")
 async def get_notification(
     notification_id: str,
-    api_key: str = Depends(verify_api_key)
+    principal: Principal = Depends(verify_api_key)
 ):
     """獲取通知詳情"""
     try:
         notification = get_notification_repo().get_notification(notification_id)
         
-        if not notification:
+        # 其他專案的通知視同不存在，不透露通知 ID 是否有效
+        if not notification or not principal.can_access_project(notification.project_id):
             raise HTTPException(status_code=404, detail="通知不存在")
         
         return MCPResponse(
@@ -256,7 +1035,7 @@ async def get_notification(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"獲取通知失敗: {e}")
+        logger.error("獲取通知失敗", notification_id=notification_id, error=str(e))
         return MCPResponse(
             success=False,
             error=str(e)
@@ -266,7 +1045,7 @@ async def get_notification(
 @app.post("/api/v1/responses")
 async def receive_response(
     response_data: Dict[str, Any],
-    api_key: str = Depends(verify_api_key)
+    principal: Principal = Depends(require_unscoped)
 ):
     """接收來自 Discord 的回覆"""
     try:
@@ -274,15 +1053,19 @@ async def receive_response(
         response_text = response_data["response_text"]
         user_id = response_data["user_id"]
         
-        # 更新通知狀態為已回覆
-        success = get_notification_repo().update_notification_status(
-            notification_id, 
-            NotificationStatus.REPLIED,
-            "replied_at"
+        # 儲存回覆（加入搜尋索引）並更新通知狀態為已回覆
+        success = await run_in_threadpool(
+            get_notification_repo().record_response,
+            NotificationResponse(
+                notification_id=notification_id,
+                response_text=response_text[:1000],  # 回覆資料表欄位長度上限
+                user_id=user_id
+            )
         )
         
         if success:
-            logger.info(f"收到回覆: {notification_id} - {response_text[:50]}...")
+            logger.info("收到回覆", notification_id=notification_id, preview=response_text[:50])
+            get_notification_service().reply_notifier.notify(notification_id)
             
             return MCPResponse(
                 success=True,
@@ -295,7 +1078,43 @@ async def receive_response(
             raise HTTPException(status_code=404, detail="通知不存在")
             
     except Exception as e:
-        logger.error(f"接收回覆失敗: {e}")
+        logger.error("接收回覆失敗", error=str(e))
+        return MCPResponse(
+            success=False,
+            error=str(e)
+        )
+
+
+@app.post("/api/v1/receipts")
+async def receive_receipts(
+    batch: ReceiptBatch,
+    principal: Principal = Depends(require_unscoped)
+):
+    """接收來自 Discord 的送達與已讀回執（批次）"""
+    try:
+        notification_ids = {NotificationStatus.DELIVERED: [], NotificationStatus.READ: []}
+        for receipt in batch.receipts:
+            notification_ids[receipt.status].append(receipt.notification_id)
+        
+        # 每種狀態一次條件式批次更新；送達先於已讀，不允許的轉移（例如已回覆再標為已讀）直接略過
+        updated = {}
+        for status, ids in notification_ids.items():
+            updated[status.value] = await run_in_threadpool(
+                get_notification_repo().transition_statuses, ids, status
+            )
+        
+        logger.info("收到回執", received=len(batch.receipts), updated=updated, sampled=True)
+        
+        return MCPResponse(
+            success=True,
+            data={
+                "received": len(batch.receipts),
+                "updated": updated
+            }
+        )
+    
+    except Exception as e:
+        logger.error("接收回執失敗", error=str(e))
         return MCPResponse(
             success=False,
             error=str(e)
@@ -305,30 +1124,71 @@ async def receive_response(
 @app.put("/api/v1/work-status")
 async def update_work_status(
     status_data: WorkStatus,
-    api_key: str = Depends(verify_api_key)
+    principal: Principal = Depends(verify_api_key)
 ):
     """更新工作狀態"""
     try:
-        # 更新專案資訊
-        project = get_project_repo().get_project(status_data.project_id)
-        
-        if project:
-            project.current_task = status_data.current_task
-            project.progress = status_data.progress
-            project.estimated_completion = status_data.estimated_completion
-            project.updated_at = datetime.utcnow()
-            project.metadata.update(status_data.details)
-            
-            # 這裡應該有更新專案的方法，暫時省略實作
-            logger.info(f"工作狀態更新: {status_data.project_id} - {status_data.progress}%")
+        data = await get_notification_service().update_work_status(status_data, principal)
+        
+        return MCPResponse(
+            success=True,
+            data=data
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("更新工作狀態失敗", error=str(e))
+        return MCPResponse(
+            success=False,
+            error=str(e)
+        )
+
+
+@app.put("/api/v1/preferences")
+async def update_preferences(
+    preferences: UserPreferences,
+    principal: Principal = Depends(require_unscoped)
+):
+    """更新使用者通知偏好"""
+    try:
+        saved = await run_in_threadpool(get_preferences_repo().upsert_preferences, preferences)
+        get_notification_service().preference_filter.invalidate(saved.user_id)
         
         return MCPResponse(
             success=True,
-            data={"message": "工作狀態更新成功"}
+            data=saved.dict()
+        )
+    
+    except Exception as e:
+        logger.error("更新偏好設定失敗", error=str(e))
+        return MCPResponse(
+            success=False,
+            error=str(e)
         )
+
+
+@app.get("/api/v1/preferences/{user_id}")
+async def get_preferences(
+    user_id: str,
+    principal: Principal = Depends(require_unscoped)
+):
+    """獲取使用者通知偏好"""
+    try:
+        preferences = await run_in_threadpool(get_preferences_repo().get_preferences, user_id)
+        
+        if not preferences:
+            raise HTTPException(status_code=404, detail="偏好設定不存在")
         
+        return MCPResponse(
+            success=True,
+            data=preferences.dict()
+        )
+    
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"更新工作狀態失敗: {e}")
+        logger.error("獲取偏好設定失敗", user_id=user_id, error=str(e))
         return MCPResponse(
             success=False,
             error=str(e)
@@ -336,10 +1196,13 @@ async def update_work_status(
 
 
 @app.get("/api/v1/projects")
-async def list_projects(api_key: str = Depends(verify_api_key)):
+async def list_projects(principal: Principal = Depends(verify_api_key)):
     """列出活躍專案"""
     try:
-        projects = get_project_repo().get_active_projects()
+        projects = [
+            project for project in get_project_repo().get_active_projects()
+            if principal.can_access_project(project.id)
+        ]
         
         return MCPResponse(
             success=True,
@@ -350,7 +1213,211 @@ async def list_projects(api_key: str = Depends(verify_api_key)):
         )
         
     except Exception as e:
-        logger.error(f"獲取專案列表失敗: {e}")
+        logger.error("獲取專案列表失敗", error=str(e))
+        return MCPResponse(
+            success=False,
+            error=str(e)
+        )
+
+
+@app.post("/api/v1/subscriptions")
+async def create_subscription(
+    subscription_data: Dict[str, Any],
+    principal: Principal = Depends(verify_api_key)
+):
+    """訂閱專案通知到頻道或使用者私訊（專案或類型未指定時訂閱全部，專案金鑰預設為自己的專案）"""
+    try:
+        project_id = subscription_data.get("project_id") or principal.project_id
+        if not principal.can_access_project(project_id):
+            raise HTTPException(status_code=403, detail="API 金鑰無權存取此專案")
+        
+        try:
+            subscription = Subscription(
+                project_id=project_id,
+                notification_type=subscription_data.get("notification_type"),
+                destination_type=subscription_data.get("destination_type"),
+                destination_id=str(subscription_data.get("destination_id") or ""),
+                guild_id=subscription_data.get("guild_id")
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        created = await run_in_threadpool(get_subscription_repo().create_subscription, subscription)
+        
+        return MCPResponse(
+            success=True,
+            data=created.dict()
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("建立訂閱失敗", error=str(e))
+        return MCPResponse(
+            success=False,
+            error=str(e)
+        )
+
+
+@app.get("/api/v1/subscriptions")
+async def list_subscriptions(
+    project_id: Optional[str] = None,
+    principal: Principal = Depends(verify_api_key)
+):
+    """列出訂閱（專案金鑰只能看到自己專案的訂閱）"""
+    try:
+        if principal.project_id is not None:
+            if not principal.can_access_project(project_id or principal.project_id):
+                raise HTTPException(status_code=403, detail="API 金鑰無權存取此專案")
+            project_id = principal.project_id
+        
+        subscriptions = await run_in_threadpool(get_subscription_repo().list_subscriptions, project_id)
+        
+        return MCPResponse(
+            success=True,
+            data={
+                "subscriptions": [subscription.dict() for subscription in subscriptions],
+                "count": len(subscriptions)
+            }
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("列出訂閱失敗", error=str(e))
+        return MCPResponse(
+            success=False,
+            error=str(e)
+        )
+
+
+@app.delete("/api/v1/subscriptions/{subscription_id}")
+async def delete_subscription(
+    subscription_id: str,
+    principal: Principal = Depends(verify_api_key)
+):
+    """取消訂閱"""
+    try:
+        repo = get_subscription_repo()
+        subscription = await run_in_threadpool(repo.get_subscription, subscription_id)
+        if subscription is None or not principal.can_access_project(subscription.project_id):
+            raise HTTPException(status_code=404, detail="訂閱不存在")
+        await run_in_threadpool(repo.delete_subscription, subscription_id)
+        
+        return MCPResponse(
+            success=True,
+            data={"subscription_id": subscription_id, "message": "訂閱已取消"}
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("取消訂閱失敗", subscription_id=subscription_id, error=str(e))
+        return MCPResponse(
+            success=False,
+            error=str(e)
+        )
+
+
+@app.post("/api/v1/api-keys")
+async def create_api_key(
+    key_data: Dict[str, Any],
+    principal: Principal = Depends(require_admin)
+):
+    """建立 API 金鑰（金鑰只在此回應中出現一次）"""
+    try:
+        raw_key = generate_api_key()
+        api_key = ApiKey(
+            name=key_data["name"],
+            key_prefix=raw_key[:12],
+            project_id=key_data.get("project_id"),
+            is_admin=bool(key_data.get("is_admin", False)),
+            rate_limit_per_minute=key_data.get("rate_limit_per_minute"),
+            daily_quota=key_data.get("daily_quota")
+        )
+        created = await run_in_threadpool(get_api_key_repo().create_api_key, api_key, hash_api_key(raw_key))
+        logger.info("API 金鑰建立", api_key_id=created.id, created_by=principal.key_id)
+        
+        return MCPResponse(
+            success=True,
+            data={**created.dict(), "api_key": raw_key}
+        )
+    
+    except Exception as e:
+        logger.error("建立 API 金鑰失敗", error=str(e))
+        return MCPResponse(
+            success=False,
+            error=str(e)
+        )
+
+
+@app.get("/api/v1/api-keys")
+async def list_api_keys(principal: Principal = Depends(require_admin)):
+    """列出 API 金鑰（不含金鑰本身）"""
+    try:
+        api_keys = await run_in_threadpool(get_api_key_repo().list_api_keys)
+        
+        return MCPResponse(
+            success=True,
+            data={
+                "api_keys": [api_key.dict() for api_key in api_keys],
+                "count": len(api_keys)
+            }
+        )
+    
+    except Exception as e:
+        logger.error("列出 API 金鑰失敗", error=str(e))
+        return MCPResponse(
+            success=False,
+            error=str(e)
+        )
+
+
+@app.delete("/api/v1/api-keys/{api_key_id}")
+async def revoke_api_key(
+    api_key_id: str,
+    principal: Principal = Depends(require_admin)
+):
+    """撤銷 API 金鑰（含由其換發的 JWT；本副本立即生效，其他副本在驗證快取到期後生效）"""
+    try:
+        key_hash = await run_in_threadpool(get_api_key_repo().revoke_api_key, api_key_id)
+        if key_hash is None:
+            raise HTTPException(status_code=404, detail="API 金鑰不存在")
+        get_authenticator().invalidate(key_hash, api_key_id)
+        logger.info("API 金鑰撤銷", api_key_id=api_key_id, revoked_by=principal.key_id)
+        
+        return MCPResponse(
+            success=True,
+            data={"api_key_id": api_key_id, "message": "API 金鑰已撤銷"}
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("撤銷 API 金鑰失敗", api_key_id=api_key_id, error=str(e))
+        return MCPResponse(
+            success=False,
+            error=str(e)
+        )
+
+
+@app.post("/api/v1/auth/token")
+async def issue_token(principal: Principal = Depends(verify_api_key)):
+    """以目前的金鑰換發短期 JWT（權限、專案與限制與原金鑰相同，驗證時不需要查詢資料庫）"""
+    try:
+        token, expires_at = get_authenticator().issue_token(principal, settings.jwt_expire_minutes)
+        
+        return MCPResponse(
+            success=True,
+            data={
+                "access_token": token,
+                "token_type": "bearer",
+                "expires_at": expires_at.isoformat()
+            }
+        )
+    
+    except Exception as e:
+        logger.error("簽發權杖失敗", error=str(e))
         return MCPResponse(
             success=False,
             error=str(e)
@@ -358,10 +1425,15 @@ async def list_projects(api_key: str = Depends(verify_api_key)):
 
 
 if __name__ == "__main__":
+    import uvicorn
+    
     uvicorn.run(
         "src.mcp_server.main:app",
         host=settings.mcp_server_host,
         port=settings.mcp_server_port,
         reload=True,
-        log_level=settings.log_level.lower()
+        backlog=settings.http_backlog,
+        timeout_keep_alive=settings.http_keep_alive_seconds,
+        log_level=settings.log_level.lower(),
+        log_config=None  # uvicorn 的日誌也走同一條非同步管線
     ) 
\ No newline at end of file
@@ -0,0 +1,27 @@
+"""
+通知列表分頁模組
+以 (created_at, id) 作為鍵集分頁游標，游標編碼為不透明的 URL 安全字串
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Tuple
+
+from ..shared.models import Notification
+
+
+def encode_cursor(notification: Notification) -> str:
+    """以最後一筆通知的 (created_at, id) 產生下一頁游標"""
+    raw = json.dumps([notification.created_at.isoformat(), notification.id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """解析游標，格式錯誤時拋出 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, notification_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), str(notification_id)
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"無效的分頁游標: {cursor}") from e
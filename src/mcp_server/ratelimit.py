@@ -0,0 +1,41 @@
+"""
+流量控制模組
+依派送積壓拒絕或丟棄低優先級通知（建立通知的速率限制使用 shared.ratelimit 的令牌桶）
+"""
+
+from ..shared.models import PRIORITY_RANK, Priority, enum_value
+
+
+class Backpressure:
+    """依派送積壓決定是否接受通知
+    
+    積壓由派送器每一輪從外寄匣計算（所有副本共用），期間接受的通知累加為估計值，
+    建立通知時不需要查詢資料庫。積壓超過 shed_threshold 時拒絕 low 優先級，
+    派送器也直接丟棄已在佇列中的 low 通知；超過 reject_threshold 時只接受 urgent。
+    """
+    
+    def __init__(self, shed_threshold: int, reject_threshold: int):
+        self.shed_threshold = shed_threshold
+        self.reject_threshold = reject_threshold
+        self.backlog = 0
+    
+    def update(self, backlog: int):
+        """更新派送積壓"""
+        self.backlog = backlog
+    
+    def record_admitted(self):
+        """記錄已接受一則通知（在下次更新前累加估計的積壓）"""
+        self.backlog += 1
+    
+    def admit(self, priority) -> bool:
+        """是否接受指定優先級的新通知"""
+        rank = PRIORITY_RANK.get(enum_value(priority), 0)
+        if self.backlog >= self.reject_threshold:
+            return rank >= PRIORITY_RANK[Priority.URGENT.value]
+        if self.backlog >= self.shed_threshold:
+            return rank > PRIORITY_RANK[Priority.LOW.value]
+        return True
+    
+    def should_shed(self, priority) -> bool:
+        """派送器是否應丟棄已在佇列中的通知"""
+        return self.backlog >= self.shed_threshold and enum_value(priority) == Priority.LOW.value
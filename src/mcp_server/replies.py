@@ -0,0 +1,45 @@
+"""
+回覆等待模組
+wait_for_reply 以事件等待本副本收到的回覆，並定期查詢資料庫（回覆可能由其他副本或程序接收）
+"""
+
+import asyncio
+from typing import Dict
+
+
+class ReplyNotifier:
+    """回覆通知器
+    
+    同一通知的所有等待者共用一個事件，本副本收到回覆時立即喚醒；
+    沒有等待者時 notify() 只是一次字典查詢。
+    """
+    
+    def __init__(self):
+        self._events: Dict[str, asyncio.Event] = {}
+        self._waiters: Dict[str, int] = {}
+    
+    def __len__(self) -> int:
+        return len(self._events)
+    
+    def notify(self, notification_id: str):
+        """通知已收到回覆"""
+        event = self._events.get(notification_id)
+        if event is not None:
+            event.set()
+    
+    async def wait(self, notification_id: str, timeout: float) -> bool:
+        """等待回覆通知，逾時回傳 False"""
+        event = self._events.get(notification_id)
+        if event is None:
+            event = self._events[notification_id] = asyncio.Event()
+        self._waiters[notification_id] = self._waiters.get(notification_id, 0) + 1
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._waiters[notification_id] -= 1
+            if not self._waiters[notification_id]:
+                del self._waiters[notification_id]
+                del self._events[notification_id]
@@ -0,0 +1,72 @@
+"""
+分片路由模組
+依 Discord 伺服器（guild）所屬分片，將通知路由到對應的機器人程序
+"""
+
+from typing import Dict, List, Optional
+
+import httpx
+import structlog
+
+
+def shard_for_guild(guild_id: int, shard_count: int) -> int:
+    """計算伺服器所屬的分片（Discord 官方公式）"""
+    return (guild_id >> 22) % shard_count
+
+
+class ShardRouter:
+    """機器人分片路由器
+    
+    每個機器人程序的 /health 會回報自己負責的 shard_ids 與總分片數，
+    路由器定期彙整成「分片 -> API 位址」對照表；尚未取得對照表或
+    通知沒有指定伺服器時，送往第一個機器人程序。
+    """
+    
+    def __init__(self, bot_api_urls: List[str]):
+        self.bot_api_urls = bot_api_urls
+        self.shard_count: Optional[int] = None
+        self.shard_map: Dict[int, str] = {}
+        self.logger = structlog.get_logger(__name__)
+    
+    @property
+    def default_url(self) -> str:
+        return self.bot_api_urls[0]
+    
+    def route(self, guild_id: Optional[str]) -> str:
+        """取得負責該伺服器的機器人 API 位址"""
+        if not guild_id or not self.shard_count or not self.shard_map:
+            return self.default_url
+        
+        try:
+            shard_id = shard_for_guild(int(guild_id), self.shard_count)
+        except (TypeError, ValueError):
+            return self.default_url
+        
+        return self.shard_map.get(shard_id, self.default_url)
+    
+    def update(self, url: str, health_data: dict):
+        """以機器人健康檢查回應更新分片對照表"""
+        shard_ids = health_data.get("shard_ids") or []
+        shard_count = health_data.get("shard_count")
+        if not shard_count:
+            return
+        
+        if self.shard_count != shard_count:
+            # 總分片數改變（重新分片），舊的對照表全部作廢
+            self.shard_count = shard_count
+            self.shard_map = {}
+        
+        for shard_id in shard_ids:
+            self.shard_map[int(shard_id)] = url
+    
+    async def refresh(self, http_client: httpx.AsyncClient):
+        """向所有機器人程序查詢分片資訊"""
+        for url in self.bot_api_urls:
+            try:
+                response = await http_client.get(f"{url}/health", timeout=5.0)
+                if response.status_code == 200:
+                    self.update(url, response.json())
+            except Exception as e:
+                self.logger.warning("取得機器人分片資訊失敗", url=url, error=str(e))
+        
+        self.logger.info("分片對照表更新", shards=len(self.shard_map), shard_count=self.shard_count or 0)
@@ -0,0 +1,62 @@
+"""
+排程派送模組
+以最小堆積管理延後派送的通知，於到期時喚醒派送器
+"""
+
+import heapq
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class DeliveryScheduler:
+    """延後派送計時器
+    
+    每則排程通知只在堆積中占一個項目，派送器依最早到期時間決定睡眠長度，
+    因此大量計時器也不需要反覆查詢資料表。取消或改期採延遲刪除：
+    堆積中過時的項目在彈出時比對 _deadlines 後略過。
+    """
+    
+    def __init__(self):
+        self._heap: List[Tuple[datetime, str]] = []
+        self._deadlines: Dict[str, datetime] = {}
+    
+    def __contains__(self, notification_id: str) -> bool:
+        return notification_id in self._deadlines
+    
+    def __len__(self) -> int:
+        return len(self._deadlines)
+    
+    def schedule(self, notification_id: str, deliver_at: datetime):
+        """排程（或改期）通知"""
+        self._deadlines[notification_id] = deliver_at
+        heapq.heappush(self._heap, (deliver_at, notification_id))
+    
+    def cancel(self, notification_id: str):
+        """取消排程"""
+        self._deadlines.pop(notification_id, None)
+    
+    def rebuild(self, entries: Iterable[Tuple[str, datetime]]):
+        """以資料庫中的排程重建計時器（啟動時使用）"""
+        self._deadlines = dict(entries)
+        self._heap = [(deliver_at, notification_id) for notification_id, deliver_at in self._deadlines.items()]
+        heapq.heapify(self._heap)
+    
+    def pop_due(self, now: Optional[datetime] = None) -> List[str]:
+        """取出已到期的通知 ID"""
+        now = now or datetime.utcnow()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            deliver_at, notification_id = heapq.heappop(self._heap)
+            if self._deadlines.get(notification_id) == deliver_at:
+                del self._deadlines[notification_id]
+                due.append(notification_id)
+        return due
+    
+    def seconds_until_next(self, now: Optional[datetime] = None) -> Optional[float]:
+        """距離下一個排程到期的秒數，沒有排程時回傳 None"""
+        while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return None
+        now = now or datetime.utcnow()
+        return max(0.0, (self._heap[0][0] - now).total_seconds())
@@ -0,0 +1,103 @@
+"""
+MCP stdio 傳輸
+以換行分隔的 JSON-RPC 訊息在 stdin/stdout 上與 Cursor/Claude 通信；
+同一程序內啟動通知服務（資料庫、派送器），工具呼叫不經過 HTTP，日誌只寫到 stderr 與檔案
+
+使用方式: python -m src.mcp_server.stdio
+"""
+
+import asyncio
+import sys
+from typing import Any, Callable, Set
+
+import structlog
+
+from . import jsonrpc
+from .auth import ADMIN_PRINCIPAL
+from .jsonrpc import MCPProtocol
+
+logger = structlog.get_logger()
+
+# 單行訊息上限（附件內容應先以 PUT /api/v1/blobs 上傳）
+MAX_LINE_BYTES = 16 * 1024 * 1024
+CLOSE_GRACE_SECONDS = 5.0
+
+
+async def run_session(protocol: MCPProtocol, reader: asyncio.StreamReader, write: Callable[[bytes], None],
+                      principal: Any = ADMIN_PRINCIPAL):
+    """處理訊息直到輸入結束
+    
+    每則請求各自在一個工作中處理，wait_for_reply 等待回覆時不會擋住其他呼叫；
+    回應與進度通知都在事件迴圈執行緒中整行寫出，不會交錯。
+    """
+    async def notify(message: dict):
+        write(jsonrpc.dumps(message) + b"\n")
+    
+    async def handle(line: bytes):
+        try:
+            payload = jsonrpc.loads(line)
+        except ValueError:
+            await notify(jsonrpc.error_response(None, jsonrpc.PARSE_ERROR, "無法解析 JSON"))
+            return
+        response = await protocol.handle_payload(payload, principal, notify)
+        if response is not None:
+            await notify(response)
+    
+    tasks: Set[asyncio.Task] = set()
+    try:
+        while True:
+            try:
+                line = await reader.readline()
+            except ValueError:
+                await notify(jsonrpc.error_response(None, jsonrpc.INVALID_REQUEST, "訊息超過大小上限"))
+                continue
+            if not line:
+                break
+            line = line.strip()
+            if not line:
+                continue
+            task = asyncio.create_task(handle(line))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        
+        # 輸入結束（客戶端關閉）後稍候進行中的請求，仍在等待回覆的工具直接取消
+        if tasks:
+            await asyncio.wait(set(tasks), timeout=CLOSE_GRACE_SECONDS)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def write_stdout(data: bytes):
+    sys.stdout.buffer.write(data)
+    sys.stdout.buffer.flush()
+
+
+async def serve_stdio():
+    """啟動通知服務並在 stdin/stdout 上處理 MCP 訊息（本機程序，以管理員身分呼叫工具）"""
+    from .main import mcp_protocol, shutdown_event, startup_event
+    
+    await startup_event()
+    try:
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=MAX_LINE_BYTES)
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+        logger.info("MCP stdio 傳輸就緒")
+        await run_session(mcp_protocol, reader, write_stdout)
+    finally:
+        await shutdown_event()
+
+
+def main():
+    """程式進入點（有安裝 uvloop 時使用 uvloop 事件迴圈）"""
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
+    
+    asyncio.run(serve_stdio())
+
+
+if __name__ == "__main__":
+    main()
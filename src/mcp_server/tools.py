@@ -0,0 +1,131 @@
+"""
+MCP 工具模組
+send_notification、wait_for_reply 與 update_work_status 直接呼叫程序內的通知服務（與 REST 端點共用同一套邏輯），
+服務層拋出的 HTTPException 與參數驗證錯誤轉為工具錯誤結果
+"""
+
+from functools import wraps
+from typing import Any, Callable, Dict, List
+
+from fastapi import HTTPException
+
+from ..shared.config import settings
+from ..shared.models import NotificationType, Priority, WorkStatus
+from .jsonrpc import Tool, ToolContext, ToolError, ToolHandler
+
+
+DEFAULT_REPLY_TIMEOUT_SECONDS = 300
+
+SEND_NOTIFICATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string", "minLength": 1, "maxLength": 200, "description": "通知標題"},
+        "content": {"type": "string", "minLength": 1, "description": "通知內容（過長時自動轉為附件）"},
+        "type": {"type": "string", "enum": [item.value for item in NotificationType], "default": "milestone"},
+        "priority": {"type": "string", "enum": [item.value for item in Priority], "default": "medium"},
+        "project_id": {"type": "string", "description": "專案 ID"},
+        "choices": {
+            "type": "array", "items": {"type": "string"}, "maxItems": 25,
+            "description": "問題通知的預設選項（顯示為按鈕或下拉選單）"
+        },
+        "delay_seconds": {"type": "number", "minimum": 0, "description": "延後派送的秒數"},
+        "ttl_seconds": {"type": "number", "exclusiveMinimum": 0, "description": "超過此秒數仍未送出時放棄"},
+        "idempotency_key": {"type": "string", "minLength": 1, "maxLength": 200, "description": "重試時避免重複建立"}
+    },
+    "required": ["title", "content"]
+}
+
+WAIT_FOR_REPLY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "notification_id": {"type": "string", "description": "send_notification 回傳的通知 ID"},
+        "timeout_seconds": {
+            "type": "number", "exclusiveMinimum": 0, "default": DEFAULT_REPLY_TIMEOUT_SECONDS,
+            "description": "最長等待秒數"
+        }
+    },
+    "required": ["notification_id"]
+}
+
+UPDATE_WORK_STATUS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "project_id": {"type": "string"},
+        "current_task": {"type": "string", "minLength": 1, "maxLength": 200},
+        "progress": {"type": "integer", "minimum": 0, "maximum": 100},
+        "estimated_completion": {"type": "string", "format": "date-time"},
+        "details": {"type": "object"}
+    },
+    "required": ["project_id", "current_task", "progress"]
+}
+
+SEND_NOTIFICATION_FIELDS = ("title", "content", "type", "priority", "project_id", "delay_seconds", "ttl_seconds")
+
+
+def tool_errors(handler: ToolHandler) -> ToolHandler:
+    """把服務層的 HTTPException 與參數錯誤轉為工具錯誤"""
+    @wraps(handler)
+    async def wrapper(arguments: Dict[str, Any], context: ToolContext) -> Dict[str, Any]:
+        try:
+            return await handler(arguments, context)
+        except HTTPException as e:
+            raise ToolError(f"{e.detail} ({e.status_code})")
+        except KeyError as e:
+            raise ToolError(f"缺少參數: {e.args[0]}")
+        except (TypeError, ValueError) as e:
+            raise ToolError(str(e))
+    return wrapper
+
+
+def build_tools(get_service: Callable[[], Any]) -> List[Tool]:
+    """建立 MCP 工具（get_service 回傳通知服務，第一次呼叫工具時才建立）"""
+    
+    @tool_errors
+    async def send_notification(arguments: Dict[str, Any], context: ToolContext) -> Dict[str, Any]:
+        notification_data = {field: arguments[field] for field in SEND_NOTIFICATION_FIELDS if field in arguments}
+        if arguments.get("choices"):
+            notification_data["metadata"] = {"choices": arguments["choices"]}
+        return await get_service().submit_notification(
+            notification_data, context.principal, arguments.get("idempotency_key")
+        )
+    
+    @tool_errors
+    async def wait_for_reply(arguments: Dict[str, Any], context: ToolContext) -> Dict[str, Any]:
+        timeout = float(arguments.get("timeout_seconds", DEFAULT_REPLY_TIMEOUT_SECONDS))
+        if timeout <= 0:
+            raise ToolError("timeout_seconds 必須大於 0")
+        
+        async def on_status(status: str):
+            await context.report_progress(f"通知狀態: {status}")
+        
+        return await get_service().wait_for_reply(
+            str(arguments["notification_id"]),
+            context.principal,
+            min(timeout, settings.reply_max_wait_seconds),
+            on_status
+        )
+    
+    @tool_errors
+    async def update_work_status(arguments: Dict[str, Any], context: ToolContext) -> Dict[str, Any]:
+        return await get_service().update_work_status(WorkStatus(**arguments), context.principal)
+    
+    return [
+        Tool(
+            "send_notification",
+            "發送通知到 Discord（里程碑、問題、警報、狀態或錯誤）。問題通知可附上選項，再以 wait_for_reply 等待回覆。",
+            SEND_NOTIFICATION_SCHEMA,
+            send_notification
+        ),
+        Tool(
+            "wait_for_reply",
+            "等待通知在 Discord 上的回覆；提供 progressToken 時串流送達與已讀等狀態變化，逾時回傳目前狀態。",
+            WAIT_FOR_REPLY_SCHEMA,
+            wait_for_reply
+        ),
+        Tool(
+            "update_work_status",
+            "更新專案目前的工作項目與進度（0-100）。",
+            UPDATE_WORK_STATUS_SCHEMA,
+            update_work_status
+        )
+    ]
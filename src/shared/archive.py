@@ -0,0 +1,170 @@
+"""
+通知封存模組
+將已結束的舊通知依建立月份搬移到壓縮的 SQLite 封存分割檔，讓主資料表與索引維持小而熱
+"""
+
+import sqlite3
+import threading
+import time
+import zlib
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import structlog
+
+from .models import Notification, NotificationStatus
+
+
+# 可封存的終止狀態
+TERMINAL_STATUSES = (
+    NotificationStatus.SENT,
+    NotificationStatus.DELIVERED,
+    NotificationStatus.READ,
+    NotificationStatus.REPLIED,
+    NotificationStatus.FAILED,
+    NotificationStatus.FILTERED,
+    NotificationStatus.EXPIRED,
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS notifications (
+    id TEXT PRIMARY KEY,
+    project_id TEXT,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    archived_at TEXT NOT NULL,
+    payload BLOB NOT NULL
+)
+"""
+
+
+def partition_for(created_at: datetime) -> str:
+    """通知所屬的封存分割名稱（依建立月份）"""
+    return f"notifications-{created_at:%Y-%m}"
+
+
+class ArchiveStore:
+    """封存分割檔存取
+    
+    每個月份一個 SQLite 檔案，通知內容以 zlib 壓縮的 JSON 儲存；
+    分割檔只會追加寫入，讀取時以唯讀模式開啟。
+    """
+    
+    def __init__(self, archive_dir: str, compression_level: int = 6):
+        self.archive_dir = Path(archive_dir)
+        self.compression_level = compression_level
+        self._lock = threading.Lock()
+    
+    def path_for(self, partition: str) -> Path:
+        return self.archive_dir / f"{partition}.sqlite3"
+    
+    def write(self, partition: str, notifications: Iterable[Notification], archived_at: datetime):
+        """寫入封存分割（重複寫入同一通知時覆蓋，搬移中斷後可安全重跑）"""
+        rows = [
+            (
+                notification.id,
+                notification.project_id,
+                notification.status,
+                notification.created_at.isoformat(),
+                archived_at.isoformat(),
+                zlib.compress(notification.json().encode("utf-8"), self.compression_level)
+            )
+            for notification in notifications
+        ]
+        
+        with self._lock:
+            self.archive_dir.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path_for(partition))
+            try:
+                connection.execute(_SCHEMA)
+                with connection:
+                    connection.executemany(
+                        "INSERT OR REPLACE INTO notifications VALUES (?, ?, ?, ?, ?, ?)", rows
+                    )
+            finally:
+                connection.close()
+    
+    def read(self, partition: str, notification_id: str) -> Optional[Notification]:
+        """從封存分割讀取通知"""
+        return self.read_many(partition, [notification_id]).get(notification_id)
+    
+    def read_many(self, partition: str, notification_ids: Iterable[str]) -> Dict[str, Notification]:
+        """以一次開檔與查詢讀取同一分割中的多則通知（ID -> 通知，不存在的 ID 不會出現）"""
+        notification_ids = list(notification_ids)
+        path = self.path_for(partition)
+        if not notification_ids or not path.exists():
+            return {}
+        
+        connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            rows = connection.execute(
+                f"SELECT id, payload FROM notifications WHERE id IN ({', '.join('?' * len(notification_ids))})",
+                notification_ids
+            ).fetchall()
+        finally:
+            connection.close()
+        
+        return {notification_id: Notification.parse_raw(zlib.decompress(payload)) for notification_id, payload in rows}
+
+
+class NotificationArchiver:
+    """通知封存工作
+    
+    每次取出一小批超過保留天數的終止狀態通知，先寫入封存分割，
+    再在單一短交易中寫入封存索引並刪除主資料表的資料列，避免長時間持有寫入鎖。
+    """
+    
+    def __init__(self, notification_repo, archive_store: ArchiveStore, retention_days: int,
+                 chunk_size: int = 500, chunk_pause_seconds: float = 0.05):
+        self.notification_repo = notification_repo
+        self.archive_store = archive_store
+        self.retention_days = retention_days
+        self.chunk_size = chunk_size
+        self.chunk_pause_seconds = chunk_pause_seconds
+        self.logger = structlog.get_logger(__name__)
+    
+    def run_once(self, now: Optional[datetime] = None) -> int:
+        """封存所有到期的通知，回傳封存筆數"""
+        now = now or datetime.utcnow()
+        cutoff = now - timedelta(days=self.retention_days)
+        archived = 0
+        
+        while True:
+            notifications = self.notification_repo.get_archivable_notifications(cutoff, self.chunk_size)
+            if not notifications:
+                break
+            
+            partitions: Dict[str, List[Notification]] = defaultdict(list)
+            for notification in notifications:
+                partitions[partition_for(notification.created_at)].append(notification)
+            for partition, items in partitions.items():
+                self.archive_store.write(partition, items, now)
+            
+            archived += self.notification_repo.remove_archived_notifications({
+                notification.id: partition
+                for partition, items in partitions.items()
+                for notification in items
+            }, now)
+            
+            if len(notifications) < self.chunk_size:
+                break
+            # 讓其他寫入有機會取得鎖
+            time.sleep(self.chunk_pause_seconds)
+        
+        if archived:
+            self.logger.info("通知封存完成", count=archived, cutoff=cutoff)
+        return archived
+
+
+_archive_store: Optional[ArchiveStore] = None
+
+
+def get_archive_store() -> ArchiveStore:
+    """獲取封存分割檔存取物件"""
+    global _archive_store
+    if _archive_store is None:
+        from .config import settings
+        _archive_store = ArchiveStore(settings.archive_dir)
+    return _archive_store
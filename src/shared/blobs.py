@@ -0,0 +1,135 @@
+"""
+內容定址儲存模組
+大型通知內容（日誌、diff 等）以 SHA-256 為名存成本地檔案，相同內容只儲存一份；
+通知資料表只在 metadata 中記錄參照，主資料表維持精簡
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import Iterator, NamedTuple, Optional
+
+
+_BLOB_ID_RE = re.compile(r"^[0-9a-f]{64}$")
+
+CHUNK_SIZE = 64 * 1024
+
+
+class BlobTooLargeError(Exception):
+    """內容超過大小上限"""
+
+
+class BlobInfo(NamedTuple):
+    """已儲存內容的識別碼與大小"""
+    blob_id: str
+    size: int
+
+
+def is_blob_id(value: str) -> bool:
+    """是否為有效的內容識別碼（SHA-256 十六進位字串）"""
+    return bool(_BLOB_ID_RE.match(value or ""))
+
+
+class BlobWriter:
+    """串流寫入
+    
+    資料邊寫入暫存檔邊計算雜湊，commit() 時才依雜湊值搬到最終位置；
+    相同內容已存在時直接丟棄暫存檔（去重）。任何時候記憶體中只保留目前這一塊資料。
+    """
+    
+    def __init__(self, store: "BlobStore", max_bytes: Optional[int] = None):
+        self.store = store
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._digest = hashlib.sha256()
+        store.tmp_dir.mkdir(parents=True, exist_ok=True)
+        fd, self._tmp_path = tempfile.mkstemp(dir=store.tmp_dir)
+        self._file = os.fdopen(fd, "wb")
+    
+    def write(self, chunk: bytes):
+        """寫入一塊資料，超過大小上限時丟棄並拋出 BlobTooLargeError"""
+        self.size += len(chunk)
+        if self.max_bytes is not None and self.size > self.max_bytes:
+            self.abort()
+            raise BlobTooLargeError(f"內容超過 {self.max_bytes} bytes 上限")
+        self._digest.update(chunk)
+        self._file.write(chunk)
+    
+    def commit(self) -> BlobInfo:
+        """完成寫入，回傳內容識別碼"""
+        self._file.close()
+        blob_id = self._digest.hexdigest()
+        path = self.store.path_for(blob_id)
+        if path.exists():
+            os.unlink(self._tmp_path)
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # 同一檔案系統內的原子搬移，並行寫入相同內容時結果一致
+            os.replace(self._tmp_path, path)
+        return BlobInfo(blob_id, self.size)
+    
+    def abort(self):
+        """放棄寫入並刪除暫存檔"""
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.unlink(self._tmp_path)
+
+
+class BlobStore:
+    """本地內容定址儲存（以雜湊值前兩層分目錄，避免單一目錄檔案過多）"""
+    
+    def __init__(self, blob_dir: str, max_bytes: Optional[int] = None):
+        self.blob_dir = Path(blob_dir)
+        self.tmp_dir = self.blob_dir / "tmp"
+        self.max_bytes = max_bytes
+    
+    def path_for(self, blob_id: str) -> Path:
+        if not is_blob_id(blob_id):
+            raise ValueError(f"無效的內容識別碼: {blob_id}")
+        return self.blob_dir / blob_id[:2] / blob_id[2:4] / blob_id
+    
+    def writer(self) -> BlobWriter:
+        """建立串流寫入"""
+        return BlobWriter(self, self.max_bytes)
+    
+    def put(self, data: bytes) -> BlobInfo:
+        """儲存一段內容（內容已在記憶體中時使用）"""
+        writer = self.writer()
+        try:
+            for start in range(0, len(data), CHUNK_SIZE):
+                writer.write(data[start:start + CHUNK_SIZE])
+        except Exception:
+            writer.abort()
+            raise
+        return writer.commit()
+    
+    def size(self, blob_id: str) -> Optional[int]:
+        """內容大小，不存在時回傳 None"""
+        try:
+            return self.path_for(blob_id).stat().st_size
+        except (FileNotFoundError, ValueError):
+            return None
+    
+    def iter_chunks(self, blob_id: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """逐塊讀取內容"""
+        with open(self.path_for(blob_id), "rb") as blob_file:
+            while True:
+                chunk = blob_file.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+
+_blob_store: Optional[BlobStore] = None
+
+
+def get_blob_store() -> BlobStore:
+    """獲取內容定址儲存"""
+    global _blob_store
+    if _blob_store is None:
+        from .config import settings
+        _blob_store = BlobStore(settings.blob_dir, settings.blob_max_bytes)
+    return _blob_store
@@ -4,16 +4,20 @@
 """
 
 import os
+import socket
+import threading
 from typing import List, Optional
-from pydantic import BaseSettings, Field
+from pydantic import BaseSettings, Field, ValidationError
 
 
 class Settings(BaseSettings):
     """系統設定類別"""
     
     # Discord Bot 設定
-    discord_bot_token: str = Field(..., env="DISCORD_BOT_TOKEN")
+    discord_bot_token: Optional[str] = Field(None, env="DISCORD_BOT_TOKEN")  # 僅 Discord Bot 需要
     discord_guild_id: Optional[str] = Field(None, env="DISCORD_GUILD_ID")
+    discord_shard_count: Optional[int] = Field(None, env="DISCORD_SHARD_COUNT")
+    discord_shard_ids: Optional[str] = Field(None, env="DISCORD_SHARD_IDS")  # 本程序負責的分片，例如 "0,1"
     
     # MCP Server 設定
     mcp_server_host: str = Field("localhost", env="MCP_SERVER_HOST")
@@ -22,22 +26,88 @@ class Settings(BaseSettings):
     
     # 資料庫設定
     database_url: str = Field("sqlite:///./mcp_notifications.db", env="DATABASE_URL")
+    sqlite_journal_mode: str = Field("WAL", env="SQLITE_JOURNAL_MODE")
+    sqlite_synchronous: str = Field("NORMAL", env="SQLITE_SYNCHRONOUS")
+    sqlite_mmap_size: int = Field(268435456, env="SQLITE_MMAP_SIZE")  # 256 MB
+    sqlite_cache_size: int = Field(-65536, env="SQLITE_CACHE_SIZE")  # 負值單位為 KB，即 64 MB
+    sqlite_busy_timeout_ms: int = Field(5000, env="SQLITE_BUSY_TIMEOUT_MS")
+    db_single_writer: bool = Field(True, env="DB_SINGLE_WRITER")
+    db_writer_batch_size: int = Field(256, env="DB_WRITER_BATCH_SIZE")
+    db_writer_linger_ms: int = Field(0, env="DB_WRITER_LINGER_MS")
+    
+    # 封存設定
+    archive_enabled: bool = Field(True, env="ARCHIVE_ENABLED")
+    archive_retention_days: int = Field(30, env="ARCHIVE_RETENTION_DAYS")
+    archive_dir: str = Field("./data/archive", env="ARCHIVE_DIR")  # 多個副本時必須是共用儲存空間
+    archive_chunk_size: int = Field(500, env="ARCHIVE_CHUNK_SIZE")
+    archive_interval_seconds: int = Field(3600, env="ARCHIVE_INTERVAL_SECONDS")
+    
+    # 大型內容設定（超過通知內容上限的部分存到內容定址儲存，以附件或分頁送出）
+    blob_dir: str = Field("./data/blobs", env="BLOB_DIR")
+    blob_max_bytes: int = Field(25 * 1024 * 1024, env="BLOB_MAX_BYTES")  # Discord 附件上限
+    attachment_page_chars: int = Field(4000, env="ATTACHMENT_PAGE_CHARS")  # 嵌入訊息描述上限為 4096 字元
+    attachment_max_pages: int = Field(3, env="ATTACHMENT_MAX_PAGES")  # 超過時改以檔案附件送出
+    
+    # 扇出設定（一則通知依訂閱送到多個頻道或使用者私訊）
+    fanout_destination_rate_per_second: float = Field(1.0, env="FANOUT_DESTINATION_RATE_PER_SECOND")  # 每個目的地的發送速率
+    fanout_destination_burst: int = Field(5, env="FANOUT_DESTINATION_BURST")  # Discord 每個頻道約每 5 秒 5 則訊息
+    fanout_concurrency: int = Field(10, env="FANOUT_CONCURRENCY")  # 機器人同時進行的發送數量
+    
+    # MCP 協定設定（stdio 與 POST /mcp 的 JSON-RPC 工具）
+    reply_poll_seconds: float = Field(2.0, env="REPLY_POLL_SECONDS")  # wait_for_reply 查詢資料庫的間隔
+    reply_max_wait_seconds: int = Field(3600, env="REPLY_MAX_WAIT_SECONDS")  # 單次 wait_for_reply 的最長等待時間
     
     # 通信設定
-    discord_bot_api_url: str = Field(..., env="DISCORD_BOT_API_URL")
+    discord_bot_api_url: Optional[str] = Field(None, env="DISCORD_BOT_API_URL")  # 僅 MCP Server 需要
+    discord_bot_api_urls: Optional[str] = Field(None, env="DISCORD_BOT_API_URLS")  # 多個分片程序，以逗號分隔
+    shard_map_refresh_seconds: int = Field(60, env="SHARD_MAP_REFRESH_SECONDS")
+    receipt_flush_seconds: float = Field(2.0, env="RECEIPT_FLUSH_SECONDS")  # 送達/已讀回執合併等待時間
+    receipt_max_batch: int = Field(100, env="RECEIPT_MAX_BATCH")
     webhook_secret: str = Field(..., env="WEBHOOK_SECRET")
     
+    # Discord Bot API 設定（與 Gateway 連線共用同一事件迴圈）
+    discord_bot_api_host: str = Field("0.0.0.0", env="DISCORD_BOT_API_HOST")
+    discord_bot_api_port: int = Field(8080, env="DISCORD_BOT_API_PORT")
+    http_backlog: int = Field(2048, env="HTTP_BACKLOG")
+    http_keep_alive_seconds: int = Field(30, env="HTTP_KEEP_ALIVE_SECONDS")  # 需大於客戶端連線池的閒置時間
+    
     # 日誌設定
     log_level: str = Field("INFO", env="LOG_LEVEL")
     log_file: str = Field("./logs/mcp_server.log", env="LOG_FILE")
+    log_max_bytes: int = Field(10 * 1024 * 1024, env="LOG_MAX_BYTES")
+    log_backup_count: int = Field(5, env="LOG_BACKUP_COUNT")
+    log_sample_rate: float = Field(0.1, env="LOG_SAMPLE_RATE")  # 高流量 INFO 事件保留比例，1 表示不取樣
+    
+    # 追蹤設定
+    tracing_exporter: str = Field("none", env="TRACING_EXPORTER")  # none / file / otlp
+    tracing_file: str = Field("./logs/traces.jsonl", env="TRACING_FILE")
+    otlp_endpoint: str = Field("http://localhost:4318", env="OTLP_ENDPOINT")
+    tracing_flush_seconds: float = Field(2.0, env="TRACING_FLUSH_SECONDS")
     
     # 通知設定
     default_notification_priority: str = Field("medium", env="DEFAULT_NOTIFICATION_PRIORITY")
     quiet_hours_start: str = Field("22:00", env="QUIET_HOURS_START")
     quiet_hours_end: str = Field("08:00", env="QUIET_HOURS_END")
+    preferences_refresh_seconds: float = Field(30.0, env="PREFERENCES_REFRESH_SECONDS")  # 檢查其他副本是否更新偏好的間隔
+    
+    # 摘要設定
+    digest_enabled: bool = Field(True, env="DIGEST_ENABLED")
+    digest_window_seconds: int = Field(30, env="DIGEST_WINDOW_SECONDS")
+    digest_max_items: int = Field(20, env="DIGEST_MAX_ITEMS")
+    digest_max_priority: str = Field("medium", env="DIGEST_MAX_PRIORITY")
+    digest_edit_in_place: bool = Field(False, env="DIGEST_EDIT_IN_PLACE")
+    
+    # 去重設定
+    dedup_window_seconds: int = Field(300, env="DEDUP_WINDOW_SECONDS")
+    dedup_cache_size: int = Field(10000, env="DEDUP_CACHE_SIZE")
+    idempotency_key_ttl_seconds: int = Field(86400, env="IDEMPOTENCY_KEY_TTL_SECONDS")
     
     # 安全設定
     jwt_secret_key: str = Field(..., env="JWT_SECRET_KEY")
+    jwt_algorithm: str = Field("HS256", env="JWT_ALGORITHM")
+    jwt_expire_minutes: int = Field(60, env="JWT_EXPIRE_MINUTES")
+    api_key_cache_ttl_seconds: float = Field(60.0, env="API_KEY_CACHE_TTL_SECONDS")
+    api_key_cache_size: int = Field(10000, env="API_KEY_CACHE_SIZE")
     cors_allowed_origins: List[str] = Field(
         ["http://localhost:3000"],
         env="CORS_ALLOWED_ORIGINS"
@@ -46,13 +116,49 @@ class Settings(BaseSettings):
     # 系統設定
     max_notification_retry: int = Field(3, env="MAX_NOTIFICATION_RETRY")
     notification_timeout: int = Field(30, env="NOTIFICATION_TIMEOUT")
-    health_check_interval: int = Field(60, env="HEALTH_CHECK_INTERVAL")
+    health_check_interval: int = Field(15, env="HEALTH_CHECK_INTERVAL")  # 機器人探測 MCP Server 的最短間隔（失敗時）
+    health_check_max_interval: int = Field(600, env="HEALTH_CHECK_MAX_INTERVAL")  # 正常且閒置時的最長間隔
+    dispatch_poll_min_seconds: float = Field(1.0, env="DISPATCH_POLL_MIN_SECONDS")
+    dispatch_poll_max_seconds: float = Field(60.0, env="DISPATCH_POLL_MAX_SECONDS")
+    
+    # 多副本設定
+    replica_id: str = Field(
+        default_factory=lambda: f"{socket.gethostname()}-{os.getpid()}",
+        env="REPLICA_ID"
+    )
+    claim_lease_seconds: int = Field(60, env="CLAIM_LEASE_SECONDS")
+    claim_batch_size: int = Field(100, env="CLAIM_BATCH_SIZE")
+    
+    # 流量控制（每個 API 金鑰與專案的令牌桶；派送積壓超過門檻時拒絕或丟棄低優先級通知）
+    ingress_rate_per_second: float = Field(5.0, env="INGRESS_RATE_PER_SECOND")
+    ingress_burst: int = Field(20, env="INGRESS_BURST")
+    backpressure_shed_threshold: int = Field(500, env="BACKPRESSURE_SHED_THRESHOLD")
+    backpressure_reject_threshold: int = Field(2000, env="BACKPRESSURE_REJECT_THRESHOLD")
+    backpressure_retry_after_seconds: int = Field(10, env="BACKPRESSURE_RETRY_AFTER_SECONDS")
     
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
         case_sensitive = False
 
+    def get_bot_api_urls(self) -> List[str]:
+        """獲取所有機器人程序的 API 位址（DISCORD_BOT_API_URLS 優先）"""
+        if self.discord_bot_api_urls:
+            urls = [url.strip().rstrip("/") for url in self.discord_bot_api_urls.split(",") if url.strip()]
+        elif self.discord_bot_api_url:
+            urls = [self.discord_bot_api_url.rstrip("/")]
+        else:
+            urls = []
+        if not urls:
+            raise ValueError("未設定機器人 API 位址，請設定 DISCORD_BOT_API_URL 或 DISCORD_BOT_API_URLS")
+        return urls
+    
+    def get_shard_ids(self) -> Optional[List[int]]:
+        """獲取本程序負責的分片 ID"""
+        if not self.discord_shard_ids:
+            return None
+        return [int(shard_id) for shard_id in self.discord_shard_ids.split(",") if shard_id.strip()]
+    
     def get_cors_origins(self) -> List[str]:
         """獲取 CORS 允許的來源列表"""
         if isinstance(self.cors_allowed_origins, str):
@@ -101,6 +207,38 @@ class DiscordBotConfig:
     def command_prefix(self) -> str:
         """獲取命令前綴"""
         return "/"
+    
+    @property
+    def shard_kwargs(self) -> dict:
+        """獲取分片參數（未設定時由 Discord 建議分片數自動決定）"""
+        kwargs = {}
+        if self.settings.discord_shard_count:
+            kwargs["shard_count"] = self.settings.discord_shard_count
+            shard_ids = self.settings.get_shard_ids()
+            if shard_ids is not None:
+                kwargs["shard_ids"] = shard_ids
+        return kwargs
+    
+    @property
+    def api_server_kwargs(self) -> dict:
+        """獲取機器人 API 伺服器（uvicorn）參數
+        
+        伺服器嵌入機器人的事件迴圈執行：不由 uvicorn 建立迴圈、不執行 lifespan、
+        不覆寫既有的日誌設定；有安裝 httptools 時使用較快的 HTTP 解析器。
+        """
+        import importlib.util
+        return {
+            "host": self.settings.discord_bot_api_host,
+            "port": self.settings.discord_bot_api_port,
+            "loop": "none",
+            "http": "httptools" if importlib.util.find_spec("httptools") else "h11",
+            "lifespan": "off",
+            "backlog": self.settings.http_backlog,
+            "timeout_keep_alive": self.settings.http_keep_alive_seconds,
+            "access_log": False,
+            "log_config": None,
+            "log_level": self.settings.log_level.lower()
+        }
 
 
 class DatabaseConfig:
@@ -109,6 +247,24 @@ class DatabaseConfig:
     def __init__(self, settings: Settings):
         self.settings = settings
     
+    @property
+    def is_sqlite(self) -> bool:
+        """是否使用 SQLite"""
+        return self.settings.database_url.startswith("sqlite")
+    
+    @property
+    def sqlite_pragmas(self) -> dict:
+        """獲取 SQLite 連線時套用的 PRAGMA"""
+        return {
+            "journal_mode": self.settings.sqlite_journal_mode,
+            "synchronous": self.settings.sqlite_synchronous,
+            "mmap_size": self.settings.sqlite_mmap_size,
+            "cache_size": self.settings.sqlite_cache_size,
+            "busy_timeout": self.settings.sqlite_busy_timeout_ms,
+            "temp_store": "MEMORY",
+            "foreign_keys": "ON"
+        }
+    
     @property
     def engine_kwargs(self) -> dict:
         """獲取資料庫引擎參數"""
@@ -127,32 +283,87 @@ class DatabaseConfig:
             }
 
 
-# 全域設定實例
-settings = Settings()
-mcp_config = MCPServerConfig(settings)
-discord_config = DiscordBotConfig(settings)
-db_config = DatabaseConfig(settings)
+_settings: Optional[Settings] = None
+_settings_lock = threading.Lock()
 
 
 def get_settings() -> Settings:
-    """獲取設定實例"""
-    return settings
+    """獲取設定實例（第一次呼叫時才讀取環境變數）"""
+    global _settings
+    if _settings is None:
+        with _settings_lock:
+            if _settings is None:
+                _settings = Settings()
+    return _settings
+
+
+def reset_settings():
+    """清除已載入的設定，下次存取時重新讀取環境變數"""
+    global _settings
+    with _settings_lock:
+        _settings = None
+
+
+class LazySettings:
+    """設定代理
+    
+    模組匯入時不建立 Settings，第一次存取屬性時才讀取環境變數，
+    讓匯入不依賴完整的環境變數，也不在匯入時付出解析成本。
+    """
+    
+    __slots__ = ()
+    
+    def __getattr__(self, name: str):
+        return getattr(get_settings(), name)
+    
+    def __setattr__(self, name: str, value):
+        setattr(get_settings(), name, value)
+    
+    def __repr__(self) -> str:
+        return f"LazySettings({'loaded' if _settings is not None else 'not loaded'})"
+
+
+# 全域設定實例（延遲載入）
+settings = LazySettings()
+mcp_config = MCPServerConfig(settings)
+discord_config = DiscordBotConfig(settings)
+db_config = DatabaseConfig(settings)
 
 
-def validate_settings():
-    """驗證設定完整性"""
-    required_fields = [
+# 各服務必要的環境變數（tuple 表示其中之一即可）
+REQUIRED_SETTINGS = {
+    "mcp_server": [
+        "mcp_server_api_key",
+        ("discord_bot_api_url", "discord_bot_api_urls"),
+        "webhook_secret",
+        "jwt_secret_key"
+    ],
+    "discord_bot": [
         "discord_bot_token",
         "mcp_server_api_key",
-        "discord_bot_api_url",
         "webhook_secret",
         "jwt_secret_key"
     ]
+}
+
+
+def validate_settings(service: Optional[str] = None):
+    """驗證設定完整性（指定服務時只檢查該服務需要的欄位）"""
+    if service is None:
+        required_fields = sorted({field for fields in REQUIRED_SETTINGS.values() for field in fields}, key=str)
+    else:
+        required_fields = REQUIRED_SETTINGS[service]
     
-    missing_fields = []
-    for field in required_fields:
-        if not getattr(settings, field, None):
-            missing_fields.append(field.upper())
+    try:
+        loaded = get_settings()
+    except ValidationError as e:
+        missing_fields = [str(error["loc"][0]).upper() for error in e.errors()]
+    else:
+        missing_fields = [
+            " 或 ".join(name.upper() for name in alternatives)
+            for alternatives in (field if isinstance(field, tuple) else (field,) for field in required_fields)
+            if not any(getattr(loaded, name, None) for name in alternatives)
+        ]
     
     if missing_fields:
         raise ValueError(
@@ -162,45 +373,19 @@ def validate_settings():
 
 
 def setup_logging():
-    """設置日誌配置"""
-    import logging
+    """設置日誌配置（只在服務啟動時執行一次）
+    
+    日誌紀錄經由佇列交給背景執行緒序列化並寫入，檔案依大小輪替。
+    """
     import structlog
-    from pathlib import Path
-    
-    # 確保日誌目錄存在
-    log_file_path = Path(settings.log_file)
-    log_file_path.parent.mkdir(parents=True, exist_ok=True)
-    
-    # 設置日誌級別
-    log_level = getattr(logging, settings.log_level.upper(), logging.INFO)
-    
-    # 配置 structlog
-    structlog.configure(
-        processors=[
-            structlog.stdlib.filter_by_level,
-            structlog.stdlib.add_logger_name,
-            structlog.stdlib.add_log_level,
-            structlog.stdlib.PositionalArgumentsFormatter(),
-            structlog.processors.TimeStamper(fmt="iso"),
-            structlog.processors.StackInfoRenderer(),
-            structlog.processors.format_exc_info,
-            structlog.processors.UnicodeDecoder(),
-            structlog.processors.JSONRenderer()
-        ],
-        context_class=dict,
-        logger_factory=structlog.stdlib.LoggerFactory(),
-        wrapper_class=structlog.stdlib.BoundLogger,
-        cache_logger_on_first_use=True,
-    )
+    from .log_pipeline import start_logging
     
-    # 配置標準 logging
-    logging.basicConfig(
-        level=log_level,
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        handlers=[
-            logging.FileHandler(settings.log_file, encoding="utf-8"),
-            logging.StreamHandler()
-        ]
+    start_logging(
+        level=settings.log_level,
+        log_file=settings.log_file,
+        max_bytes=settings.log_max_bytes,
+        backup_count=settings.log_backup_count,
+        sample_rate=settings.log_sample_rate
     )
     
-    return structlog.get_logger() 
\ No newline at end of file
+    return structlog.get_logger()
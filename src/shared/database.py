@@ -3,19 +3,25 @@
 處理資料庫連接、表格定義和基本操作
 """
 
+import threading
 import uuid
-from datetime import datetime
-from typing import Optional, List, Dict, Any
-from sqlalchemy import create_engine, Column, String, Integer, DateTime, Text, Boolean, JSON, Enum
+from datetime import datetime, timedelta
+from typing import Optional, List, Dict, Any, Iterable, Iterator, Tuple
+from sqlalchemy import create_engine, event, insert, inspect, text, or_, select, tuple_, update, delete, Column, String, Integer, BigInteger, DateTime, Text, Boolean, JSON, Enum, Index
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.sql import func
 import structlog
 
+from .archive import TERMINAL_STATUSES, get_archive_store
 from .config import settings, db_config
+from .search import SEARCH_TABLE, SearchHit, create_search_index, parse_query
+from .writer import DatabaseWriter, WriteOperation
 from .models import (
-    NotificationType, Priority, NotificationStatus, ProjectStatus,
-    Notification, Project, NotificationResponse, UserPreferences
+    NotificationType, Priority, NotificationStatus, ProjectStatus, STATUS_TRANSITIONS, STATUS_TIMESTAMP_FIELDS,
+    SENT_IMPLIED_STATUSES, DestinationType, Notification, Project, NotificationResponse, UserPreferences, ApiKey,
+    Subscription, WorkStatus
 )
 
 logger = structlog.get_logger(__name__)
@@ -24,6 +30,14 @@ logger = structlog.get_logger(__name__)
 Base = declarative_base()
 
 
+class DuplicateNotificationError(Exception):
+    """通知去重鍵已存在"""
+    
+    def __init__(self, notification_id: str):
+        super().__init__(f"通知已存在: {notification_id}")
+        self.notification_id = notification_id
+
+
 class NotificationTable(Base):
     """通知資料表"""
     __tablename__ = "notifications"
@@ -39,7 +53,63 @@ class NotificationTable(Base):
     sent_at = Column(DateTime, nullable=True)
     read_at = Column(DateTime, nullable=True)
     replied_at = Column(DateTime, nullable=True)
-    metadata = Column(JSON, default=dict)
+    deliver_at = Column(DateTime, nullable=True, index=True)
+    expires_at = Column(DateTime, nullable=True)
+    metadata_ = Column("metadata", JSON, default=dict)
+    dedup_key = Column(String(255), unique=True, nullable=True)  # Idempotency-Key 或內容雜湊去重鍵
+    
+    __table_args__ = (
+        Index("ix_notifications_status_created_at", "status", "created_at"),  # 封存掃描、依狀態列出
+        Index("ix_notifications_created_at_id", "created_at", "id"),  # 鍵集分頁
+        Index("ix_notifications_project_created_at", "project_id", "created_at", "id"),
+        Index("ix_notifications_type_created_at", "type", "created_at", "id"),
+    )
+
+
+class NotificationOutboxTable(Base):
+    """通知派送外寄匣
+    
+    與通知在同一交易寫入，派送器依 seq 順序從頭讀取並以租約認領；
+    通知進入終止狀態（送達確認、過濾、過期、失敗）時在同一交易刪除，外寄匣只保留尚未完成的派送。
+    """
+    __tablename__ = "notification_outbox"
+    
+    # SQLite 需要 AUTOINCREMENT 才保證序號不會在刪除尾端資料列後重複使用
+    seq = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    notification_id = Column(String, nullable=False, unique=True)
+    available_at = Column(DateTime, nullable=False, default=datetime.utcnow)  # 排程或延後派送的時間
+    claimed_by = Column(String(100), nullable=True)  # 正在處理此通知的副本 ID
+    lease_expires_at = Column(DateTime, nullable=True)  # 認領租約到期時間
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = {"sqlite_autoincrement": True}
+
+
+class NotificationArchiveIndexTable(Base):
+    """已封存通知索引（通知 ID -> 封存分割）"""
+    __tablename__ = "notification_archive_index"
+    
+    id = Column(String, primary_key=True)
+    partition = Column(String(50), nullable=False)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+
+class BlobOwnerTable(Base):
+    """內容擁有者（內容識別碼 -> 可存取的專案；內容定址儲存中相同內容可屬於多個專案）"""
+    __tablename__ = "blob_owners"
+    
+    blob_id = Column(String(64), primary_key=True)
+    project_id = Column(String, primary_key=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class LeaseTable(Base):
+    """背景工作租約（多個副本共用資料庫時，同一工作只由持有租約的副本執行）"""
+    __tablename__ = "background_leases"
+    
+    name = Column(String(100), primary_key=True)
+    holder = Column(String(100), nullable=False)
+    expires_at = Column(DateTime, nullable=False)
 
 
 class ProjectTable(Base):
@@ -55,7 +125,7 @@ class ProjectTable(Base):
     current_task = Column(String(200), nullable=True)
     progress = Column(Integer, default=0)
     estimated_completion = Column(DateTime, nullable=True)
-    metadata = Column(JSON, default=dict)
+    metadata_ = Column("metadata", JSON, default=dict)
 
 
 class NotificationResponseTable(Base):
@@ -63,11 +133,44 @@ class NotificationResponseTable(Base):
     __tablename__ = "notification_responses"
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    notification_id = Column(String, nullable=False)
+    notification_id = Column(String, nullable=False, index=True)
     response_text = Column(String(1000), nullable=False)
     user_id = Column(String, nullable=False)
     responded_at = Column(DateTime, default=datetime.utcnow)
-    metadata = Column(JSON, default=dict)
+    metadata_ = Column("metadata", JSON, default=dict)
+
+
+class ApiKeyTable(Base):
+    """API 金鑰資料表（只儲存 SHA-256 雜湊值）"""
+    __tablename__ = "api_keys"
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    name = Column(String(100), nullable=False)
+    key_hash = Column(String(64), unique=True, nullable=False)
+    key_prefix = Column(String(16), nullable=False)
+    project_id = Column(String, nullable=True)
+    is_admin = Column(Boolean, default=False)
+    rate_limit_per_minute = Column(Integer, nullable=True)
+    daily_quota = Column(Integer, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    revoked_at = Column(DateTime, nullable=True)
+
+
+class SubscriptionTable(Base):
+    """通知訂閱資料表（專案或類型為 NULL 時訂閱全部）"""
+    __tablename__ = "subscriptions"
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    project_id = Column(String, nullable=True)
+    notification_type = Column(Enum(NotificationType), nullable=True)
+    destination_type = Column(Enum(DestinationType), nullable=False)
+    destination_id = Column(String(32), nullable=False)
+    guild_id = Column(String(32), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_subscriptions_project_type", "project_id", "notification_type"),  # 派送時整批查詢訂閱者
+    )
 
 
 class UserPreferencesTable(Base):
@@ -90,20 +193,123 @@ class UserPreferencesTable(Base):
 class DatabaseManager:
     """資料庫管理器"""
     
-    def __init__(self):
-        self.engine = create_engine(settings.database_url, **db_config.engine_kwargs)
+    def __init__(self, database_url: Optional[str] = None):
+        self.database_url = database_url or settings.database_url
+        self.engine = create_engine(self.database_url, **db_config.engine_kwargs)
         self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
         self.logger = structlog.get_logger(__name__)
+        self.search_index = create_search_index(self.is_sqlite)
+        
+        if self.is_sqlite:
+            event.listen(self.engine, "connect", self._apply_sqlite_pragmas)
+        
+        self.writer = DatabaseWriter(
+            self.SessionLocal,
+            max_batch_size=settings.db_writer_batch_size,
+            linger_seconds=settings.db_writer_linger_ms / 1000
+        )
+    
+    @property
+    def is_sqlite(self) -> bool:
+        """是否使用 SQLite"""
+        return self.database_url.startswith("sqlite")
+    
+    @staticmethod
+    def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+        """每條新連線套用 SQLite 效能設定"""
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in db_config.sqlite_pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+    
+    def start_writer(self):
+        """啟動單一寫入執行緒
+        
+        只用於 SQLite；DB_SINGLE_WRITER 關閉或使用 PostgreSQL 時不啟動，寫入直接在呼叫端執行，
+        多個連線與副本可以並行寫入。
+        """
+        if settings.db_single_writer and self.is_sqlite:
+            self.writer.start()
+    
+    def stop_writer(self):
+        """停止單一寫入執行緒"""
+        self.writer.stop()
+    
+    def write(self, operation: WriteOperation):
+        """執行寫入操作（寫入執行緒啟動時排入佇列批次提交）"""
+        return self.writer.execute(operation)
     
     def create_tables(self):
         """建立資料表"""
         try:
+            new_outbox = not inspect(self.engine).has_table(NotificationOutboxTable.__tablename__)
             Base.metadata.create_all(bind=self.engine)
+            if new_outbox:
+                self.backfill_outbox()
+            # create_all 不會為既有資料表補建新增的索引
+            for index in NotificationTable.__table__.indexes:
+                index.create(bind=self.engine, checkfirst=True)
+            inspector = inspect(self.engine)
+            if not inspector.has_table(SEARCH_TABLE) or "project_id" not in {
+                column["name"] for column in inspector.get_columns(SEARCH_TABLE)
+            }:
+                # 新增索引表，或升級前的索引表沒有專案欄位（FTS5 無法新增欄位），重建索引
+                with self.engine.begin() as connection:
+                    connection.execute(text(f"DROP TABLE IF EXISTS {SEARCH_TABLE}"))
+                    self.search_index.create(connection)
+                self.rebuild_search_index()
             self.logger.info("資料表建立成功")
         except Exception as e:
-            self.logger.error(f"資料表建立失敗: {e}")
+            self.logger.error("資料表建立失敗", error=str(e))
             raise
     
+    def backfill_outbox(self) -> int:
+        """為升級前建立、仍待發送的通知補上外寄匣資料列（新增外寄匣表時執行一次）"""
+        with self.get_session() as session:
+            result = session.execute(insert(NotificationOutboxTable).from_select(
+                ["notification_id", "available_at"],
+                select(
+                    NotificationTable.id,
+                    func.coalesce(NotificationTable.deliver_at, NotificationTable.created_at)
+                ).where(
+                    NotificationTable.status == NotificationStatus.PENDING
+                ).order_by(NotificationTable.created_at)
+            ))
+            session.commit()
+        
+        if result.rowcount:
+            self.logger.info("外寄匣補建完成", count=result.rowcount)
+        return result.rowcount
+    
+    def rebuild_search_index(self, chunk_size: int = 1000) -> int:
+        """為既有的通知與回覆建立搜尋索引（新增索引表時執行一次，之後由寫入操作增量更新）"""
+        indexed = 0
+        with self.get_session() as session:
+            documents = session.execute(
+                select(NotificationTable.id, NotificationTable.title, NotificationTable.content,
+                       NotificationTable.project_id)
+            ).yield_per(chunk_size)
+            for notification_id, title, content, project_id in documents:
+                self.search_index.add(session, notification_id, "notification", title, content, project_id)
+                indexed += 1
+            
+            responses = session.execute(
+                select(
+                    NotificationResponseTable.notification_id, NotificationResponseTable.response_text,
+                    NotificationTable.project_id
+                ).join(NotificationTable, NotificationTable.id == NotificationResponseTable.notification_id)
+            ).yield_per(chunk_size)
+            for notification_id, response_text, project_id in responses:
+                self.search_index.add(session, notification_id, "response", "", response_text, project_id)
+                indexed += 1
+            session.commit()
+        
+        if indexed:
+            self.logger.info("搜尋索引重建完成", documents=indexed)
+        return indexed
+    
     def get_session(self) -> Session:
         """獲取資料庫會話"""
         return self.SessionLocal()
@@ -112,44 +318,93 @@ class DatabaseManager:
         """資料庫健康檢查"""
         try:
             with self.get_session() as session:
-                session.execute("SELECT 1")
+                session.execute(text("SELECT 1"))
                 return True
         except Exception as e:
-            self.logger.error(f"資料庫健康檢查失敗: {e}")
+            self.logger.error("資料庫健康檢查失敗", error=str(e))
             return False
 
 
 class NotificationRepository:
     """通知資料存取物件"""
     
-    def __init__(self, db_manager: DatabaseManager):
+    def __init__(self, db_manager: DatabaseManager, archive_store=None):
         self.db_manager = db_manager
+        self.archive_store = archive_store
         self.logger = structlog.get_logger(__name__)
     
-    def create_notification(self, notification: Notification) -> str:
-        """建立通知"""
+    def _to_model(self, db_notification: NotificationTable) -> Notification:
+        return Notification(
+            id=db_notification.id,
+            type=db_notification.type,
+            title=db_notification.title,
+            content=db_notification.content,
+            priority=db_notification.priority,
+            project_id=db_notification.project_id,
+            status=db_notification.status,
+            created_at=db_notification.created_at,
+            sent_at=db_notification.sent_at,
+            read_at=db_notification.read_at,
+            replied_at=db_notification.replied_at,
+            deliver_at=db_notification.deliver_at,
+            expires_at=db_notification.expires_at,
+            metadata=db_notification.metadata_ or {}
+        )
+    
+    def create_notification(self, notification: Notification, dedup_key: Optional[str] = None) -> str:
+        """建立通知（去重鍵重複時拋出 DuplicateNotificationError）"""
+        def insert(session: Session) -> str:
+            db_notification = NotificationTable(
+                id=str(uuid.uuid4()),
+                type=notification.type,
+                title=notification.title,
+                content=notification.content,
+                priority=notification.priority,
+                project_id=notification.project_id,
+                deliver_at=notification.deliver_at,
+                expires_at=notification.expires_at,
+                metadata_=notification.metadata,
+                dedup_key=dedup_key
+            )
+            session.add(db_notification)
+            session.add(NotificationOutboxTable(
+                notification_id=db_notification.id,
+                available_at=notification.deliver_at or datetime.utcnow()
+            ))
+            self.db_manager.search_index.add(
+                session, db_notification.id, "notification", notification.title, notification.content,
+                notification.project_id
+            )
+            return db_notification.id
+        
         try:
-            with self.db_manager.get_session() as session:
-                db_notification = NotificationTable(
-                    type=notification.type,
-                    title=notification.title,
-                    content=notification.content,
-                    priority=notification.priority,
-                    project_id=notification.project_id,
-                    metadata=notification.metadata
-                )
-                session.add(db_notification)
-                session.commit()
-                session.refresh(db_notification)
-                
-                self.logger.info(f"通知建立成功: {db_notification.id}")
-                return db_notification.id
+            notification_id = self.db_manager.write(insert)
+            self.logger.info("通知建立成功", notification_id=notification_id, sampled=True)
+            return notification_id
+        except IntegrityError:
+            existing_id = self.get_notification_id_by_dedup_key(dedup_key) if dedup_key else None
+            if existing_id:
+                raise DuplicateNotificationError(existing_id)
+            self.logger.error("建立通知失敗: 資料完整性錯誤")
+            raise
         except Exception as e:
-            self.logger.error(f"建立通知失敗: {e}")
+            self.logger.error("建立通知失敗", error=str(e))
             raise
     
+    def get_notification_id_by_dedup_key(self, dedup_key: str) -> Optional[str]:
+        """以去重鍵查詢通知 ID"""
+        try:
+            with self.db_manager.get_session() as session:
+                row = session.query(NotificationTable.id).filter(
+                    NotificationTable.dedup_key == dedup_key
+                ).first()
+                return row[0] if row else None
+        except Exception as e:
+            self.logger.error("以去重鍵查詢通知失敗", error=str(e))
+            return None
+    
     def get_notification(self, notification_id: str) -> Optional[Notification]:
-        """獲取通知"""
+        """獲取通知（不在主資料表時查詢封存）"""
         try:
             with self.db_manager.get_session() as session:
                 db_notification = session.query(NotificationTable).filter(
@@ -157,77 +412,423 @@ class NotificationRepository:
                 ).first()
                 
                 if db_notification:
-                    return Notification(
-                        id=db_notification.id,
-                        type=db_notification.type,
-                        title=db_notification.title,
-                        content=db_notification.content,
-                        priority=db_notification.priority,
-                        project_id=db_notification.project_id,
-                        status=db_notification.status,
-                        created_at=db_notification.created_at,
-                        sent_at=db_notification.sent_at,
-                        read_at=db_notification.read_at,
-                        replied_at=db_notification.replied_at,
-                        metadata=db_notification.metadata
-                    )
+                    return self._to_model(db_notification)
+                
+                partition = session.query(NotificationArchiveIndexTable.partition).filter(
+                    NotificationArchiveIndexTable.id == notification_id
+                ).scalar()
+            
+            if partition is None:
                 return None
+            return (self.archive_store or get_archive_store()).read(partition, notification_id)
         except Exception as e:
-            self.logger.error(f"獲取通知失敗: {e}")
+            self.logger.error("獲取通知失敗", notification_id=notification_id, error=str(e))
             return None
     
-    def update_notification_status(self, notification_id: str, status: NotificationStatus, 
-                                 timestamp_field: Optional[str] = None) -> bool:
-        """更新通知狀態"""
+    def _list_query(self, project_id: Optional[str] = None, status: Optional[NotificationStatus] = None,
+                    type: Optional[NotificationType] = None, created_after: Optional[datetime] = None,
+                    created_before: Optional[datetime] = None, after: Optional[Tuple[datetime, str]] = None):
+        """依條件篩選通知，由新到舊排序；after 為上一頁最後一筆的 (created_at, id)"""
+        query = select(NotificationTable)
+        if project_id is not None:
+            query = query.where(NotificationTable.project_id == project_id)
+        if status is not None:
+            query = query.where(NotificationTable.status == status)
+        if type is not None:
+            query = query.where(NotificationTable.type == type)
+        if created_after is not None:
+            query = query.where(NotificationTable.created_at >= created_after)
+        if created_before is not None:
+            query = query.where(NotificationTable.created_at < created_before)
+        if after is not None:
+            query = query.where(tuple_(NotificationTable.created_at, NotificationTable.id) < tuple_(*after))
+        return query.order_by(NotificationTable.created_at.desc(), NotificationTable.id.desc())
+    
+    def list_notifications(self, limit: int = 50, **filters) -> List[Notification]:
+        """以鍵集分頁列出主資料表中的通知（不含已封存的通知），篩選條件見 _list_query"""
         try:
             with self.db_manager.get_session() as session:
-                db_notification = session.query(NotificationTable).filter(
-                    NotificationTable.id == notification_id
-                ).first()
-                
-                if db_notification:
-                    db_notification.status = status
-                    
-                    if timestamp_field:
-                        setattr(db_notification, timestamp_field, datetime.utcnow())
-                    
-                    session.commit()
-                    self.logger.info(f"通知狀態更新成功: {notification_id} -> {status}")
-                    return True
+                return [
+                    self._to_model(db_notification)
+                    for db_notification in session.scalars(self._list_query(**filters).limit(limit))
+                ]
+        except Exception as e:
+            self.logger.error("列出通知失敗", error=str(e))
+            raise
+    
+    def iter_notifications(self, chunk_size: int = 500, **filters) -> Iterator[Notification]:
+        """逐批讀取所有符合條件的通知（PostgreSQL 使用伺服器端游標），匯出大量資料時不會全部載入記憶體"""
+        with self.db_manager.get_session() as session:
+            result = session.scalars(
+                self._list_query(**filters).execution_options(yield_per=chunk_size)
+            )
+            for db_notification in result:
+                yield self._to_model(db_notification)
+    
+    def search_notifications(self, query: str, limit: int = 20, offset: int = 0,
+                             project_id: Optional[str] = None) -> List[Tuple[Notification, SearchHit]]:
+        """全文搜尋通知標題、內容與回覆，依相關度排序（同一通知可能因多則回覆出現多次）
+        
+        指定 project_id 時只搜尋該專案，過濾在分頁之前完成，每頁仍有 limit 筆。
+        已封存的通知不在索引中（封存時移除），仍可依 ID 以 get_notification 查詢。
+        """
+        terms = parse_query(query)
+        if not terms:
+            return []
+        
+        try:
+            with self.db_manager.get_session() as session:
+                hits = self.db_manager.search_index.search(session, terms, limit, offset, project_id)
+                notification_ids = {hit.notification_id for hit in hits}
+                notifications = {
+                    db_notification.id: self._to_model(db_notification)
+                    for db_notification in session.query(NotificationTable).filter(
+                        NotificationTable.id.in_(notification_ids)
+                    )
+                }
+        except Exception as e:
+            self.logger.error("全文搜尋失敗", query=query, error=str(e))
+            return []
+        
+        return [(notifications[hit.notification_id], hit) for hit in hits if hit.notification_id in notifications]
+    
+    def get_archivable_notifications(self, cutoff: datetime, limit: int) -> List[Notification]:
+        """獲取建立時間早於 cutoff 的終止狀態通知"""
+        try:
+            with self.db_manager.get_session() as session:
+                db_notifications = session.query(NotificationTable).filter(
+                    NotificationTable.status.in_(TERMINAL_STATUSES),
+                    NotificationTable.created_at < cutoff
+                ).order_by(NotificationTable.created_at).limit(limit).all()
+                return [self._to_model(n) for n in db_notifications]
+        except Exception as e:
+            self.logger.error("獲取可封存通知失敗", error=str(e))
+            return []
+    
+    def remove_archived_notifications(self, partitions: Dict[str, str], archived_at: datetime) -> int:
+        """記錄封存索引並從主資料表與搜尋索引刪除已封存的通知，回傳刪除筆數"""
+        if not partitions:
+            return 0
+        
+        def archive(session: Session) -> int:
+            # 只刪除仍為終止狀態的通知，搜尋索引只移除這些通知的資料列
+            notification_ids = session.scalars(select(NotificationTable.id).where(
+                NotificationTable.id.in_(list(partitions)),
+                NotificationTable.status.in_(TERMINAL_STATUSES)
+            )).all()
+            session.execute(delete(NotificationArchiveIndexTable).where(
+                NotificationArchiveIndexTable.id.in_(list(partitions))
+            ))
+            session.add_all([
+                NotificationArchiveIndexTable(id=notification_id, partition=partition, archived_at=archived_at)
+                for notification_id, partition in partitions.items()
+            ])
+            if not notification_ids:
+                return 0
+            self.db_manager.search_index.remove(session, notification_ids)
+            result = session.execute(delete(NotificationTable).where(
+                NotificationTable.id.in_(notification_ids),
+                NotificationTable.status.in_(TERMINAL_STATUSES)
+            ))
+            return result.rowcount
+        
+        try:
+            return self.db_manager.write(archive)
+        except Exception as e:
+            self.logger.error("移除已封存通知失敗", error=str(e))
+            raise
+    
+    @staticmethod
+    def _complete_outbox(session: Session, notification_ids: List[str]):
+        """刪除已完成派送的外寄匣資料列（與狀態更新在同一交易，作為派送確認）"""
+        session.execute(
+            delete(NotificationOutboxTable)
+            .where(NotificationOutboxTable.notification_id.in_(notification_ids))
+            .execution_options(synchronize_session=False)
+        )
+    
+    def transition_status(self, notification_id: str, status: NotificationStatus,
+                          now: Optional[datetime] = None) -> bool:
+        """轉移通知狀態，通知不存在或目前狀態不允許此轉移時回傳 False"""
+        return self.transition_statuses([notification_id], status, now) == 1
+    
+    def transition_statuses(self, notification_ids: List[str], status: NotificationStatus,
+                            now: Optional[datetime] = None) -> int:
+        """以單一條件式 UPDATE 批次轉移通知狀態，回傳實際轉移的筆數
+        
+        狀態轉移規則（STATUS_TRANSITIONS）寫在 WHERE 條件中，與其他寫入同時發生時也不會覆蓋較新的狀態；
+        離開待發送狀態的通知在同一交易移除外寄匣資料列。
+        """
+        if not notification_ids:
+            return 0
+        
+        now = now or datetime.utcnow()
+        values = {NotificationTable.status: status}
+        timestamp_field = STATUS_TIMESTAMP_FIELDS.get(status)
+        if timestamp_field:
+            values[getattr(NotificationTable, timestamp_field)] = now
+        if status in SENT_IMPLIED_STATUSES:
+            values[NotificationTable.sent_at] = func.coalesce(NotificationTable.sent_at, now)
+        
+        def transition(session: Session) -> int:
+            transitioned_ids = session.scalars(
+                update(NotificationTable)
+                .where(
+                    NotificationTable.id.in_(notification_ids),
+                    NotificationTable.status.in_(STATUS_TRANSITIONS[status])
+                )
+                .values(values)
+                .returning(NotificationTable.id)
+                .execution_options(synchronize_session=False)
+            ).all()
+            if transitioned_ids:
+                self._complete_outbox(session, transitioned_ids)
+            return len(transitioned_ids)
+        
+        try:
+            transitioned = self.db_manager.write(transition)
+            if transitioned:
+                self.logger.info("通知狀態更新成功", count=transitioned, status=status, sampled=True)
+            if transitioned < len(notification_ids):
+                self.logger.debug("略過不允許的狀態轉移", status=status, requested=len(notification_ids),
+                                  transitioned=transitioned)
+            return transitioned
+        except Exception as e:
+            self.logger.error("更新通知狀態失敗", status=status, error=str(e))
+            return 0
+    
+    def record_response(self, response: NotificationResponse) -> bool:
+        """儲存回覆、加入搜尋索引並把通知標記為已回覆（同一交易），通知不存在或狀態不允許回覆時回傳 False"""
+        def record(session: Session) -> bool:
+            updated = session.execute(
+                update(NotificationTable)
+                .where(
+                    NotificationTable.id == response.notification_id,
+                    NotificationTable.status.in_(STATUS_TRANSITIONS[NotificationStatus.REPLIED])
+                )
+                .values(
+                    status=NotificationStatus.REPLIED,
+                    replied_at=response.responded_at,
+                    sent_at=func.coalesce(NotificationTable.sent_at, response.responded_at)
+                )
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if not updated:
                 return False
+            self._complete_outbox(session, [response.notification_id])
+            
+            session.add(NotificationResponseTable(
+                notification_id=response.notification_id,
+                response_text=response.response_text,
+                user_id=response.user_id,
+                responded_at=response.responded_at,
+                metadata_=response.metadata
+            ))
+            project_id = session.execute(
+                select(NotificationTable.project_id).where(NotificationTable.id == response.notification_id)
+            ).scalar()
+            self.db_manager.search_index.add(
+                session, response.notification_id, "response", "", response.response_text, project_id
+            )
+            return True
+        
+        try:
+            recorded = self.db_manager.write(record)
+            if recorded:
+                self.logger.info("回覆儲存成功", notification_id=response.notification_id, sampled=True)
+            return recorded
         except Exception as e:
-            self.logger.error(f"更新通知狀態失敗: {e}")
+            self.logger.error("儲存回覆失敗", notification_id=response.notification_id, error=str(e))
             return False
     
-    def get_pending_notifications(self) -> List[Notification]:
-        """獲取待發送的通知"""
+    def get_latest_response(self, notification_id: str) -> Optional[NotificationResponse]:
+        """取得通知最新的一則回覆"""
+        with self.db_manager.get_session() as session:
+            db_response = session.query(NotificationResponseTable).filter(
+                NotificationResponseTable.notification_id == notification_id
+            ).order_by(NotificationResponseTable.responded_at.desc()).first()
+            if db_response is None:
+                return None
+            return NotificationResponse(
+                notification_id=db_response.notification_id,
+                response_text=db_response.response_text,
+                user_id=db_response.user_id,
+                responded_at=db_response.responded_at,
+                metadata=db_response.metadata_ or {}
+            )
+    
+    def get_pending_notifications(self, now: Optional[datetime] = None) -> List[Notification]:
+        """獲取待發送的通知（不含尚未到排程時間者）"""
         try:
+            now = now or datetime.utcnow()
             with self.db_manager.get_session() as session:
                 db_notifications = session.query(NotificationTable).filter(
-                    NotificationTable.status == NotificationStatus.PENDING
+                    NotificationTable.status == NotificationStatus.PENDING,
+                    or_(NotificationTable.deliver_at.is_(None), NotificationTable.deliver_at <= now)
                 ).order_by(NotificationTable.created_at.asc()).all()
                 
-                notifications = []
-                for db_notification in db_notifications:
-                    notifications.append(Notification(
-                        id=db_notification.id,
-                        type=db_notification.type,
-                        title=db_notification.title,
-                        content=db_notification.content,
-                        priority=db_notification.priority,
-                        project_id=db_notification.project_id,
-                        status=db_notification.status,
-                        created_at=db_notification.created_at,
-                        sent_at=db_notification.sent_at,
-                        read_at=db_notification.read_at,
-                        replied_at=db_notification.replied_at,
-                        metadata=db_notification.metadata
-                    ))
-                
-                return notifications
+                return [self._to_model(db_notification) for db_notification in db_notifications]
+        except Exception as e:
+            self.logger.error("獲取待發送通知失敗", error=str(e))
+            return []
+    
+    def claim_pending_notifications(self, replica_id: str, lease_seconds: int, limit: int = 100,
+                                    now: Optional[datetime] = None) -> List[Notification]:
+        """依外寄匣序號順序以租約認領可派送的通知，多個副本同時認領時不會取得相同的通知
+        
+        只讀取外寄匣開頭（尚未完成的派送），不掃描通知資料表的狀態。
+        PostgreSQL 以 SELECT ... FOR UPDATE SKIP LOCKED 跳過其他副本正在認領的列；
+        SQLite 不支援列鎖，但單一 UPDATE ... RETURNING 陳述式本身即持有寫入鎖，同樣是原子操作。
+        """
+        now = now or datetime.utcnow()
+        
+        def claim(session: Session) -> List[Notification]:
+            candidate_seqs = select(NotificationOutboxTable.seq).where(
+                NotificationOutboxTable.available_at <= now,
+                or_(NotificationOutboxTable.lease_expires_at.is_(None), NotificationOutboxTable.lease_expires_at <= now)
+            ).order_by(NotificationOutboxTable.seq).limit(limit).with_for_update(skip_locked=True)
+            
+            claimed = session.execute(
+                update(NotificationOutboxTable)
+                .where(NotificationOutboxTable.seq.in_(candidate_seqs.scalar_subquery()))
+                .values(claimed_by=replica_id, lease_expires_at=now + timedelta(seconds=lease_seconds))
+                .returning(NotificationOutboxTable.seq, NotificationOutboxTable.notification_id)
+                .execution_options(synchronize_session=False)
+            ).all()
+            if not claimed:
+                return []
+            
+            seqs = {notification_id: seq for seq, notification_id in claimed}
+            notifications = [
+                self._to_model(db_notification)
+                for db_notification in session.scalars(select(NotificationTable).where(
+                    NotificationTable.id.in_(seqs),
+                    NotificationTable.status == NotificationStatus.PENDING
+                ))
+            ]
+            notifications.sort(key=lambda notification: seqs[notification.id])
+            
+            # 通知已不是待發送狀態（例如被其他途徑更新），外寄匣資料列已無作用
+            stale_ids = set(seqs) - {notification.id for notification in notifications}
+            if stale_ids:
+                self._complete_outbox(session, list(stale_ids))
+            return notifications
+        
+        try:
+            return self.db_manager.write(claim)
         except Exception as e:
-            self.logger.error(f"獲取待發送通知失敗: {e}")
+            self.logger.error("認領待發送通知失敗", error=str(e))
             return []
+    
+    def extend_leases(self, replica_id: str, notification_ids: List[str], lease_seconds: int,
+                      now: Optional[datetime] = None) -> int:
+        """延長本副本仍在處理中通知的租約"""
+        if not notification_ids:
+            return 0
+        now = now or datetime.utcnow()
+        
+        def extend(session: Session) -> int:
+            return session.execute(
+                update(NotificationOutboxTable)
+                .where(
+                    NotificationOutboxTable.notification_id.in_(notification_ids),
+                    NotificationOutboxTable.claimed_by == replica_id
+                )
+                .values(lease_expires_at=now + timedelta(seconds=lease_seconds))
+                .execution_options(synchronize_session=False)
+            ).rowcount
+        
+        try:
+            return self.db_manager.write(extend)
+        except Exception as e:
+            self.logger.error("延長租約失敗", error=str(e))
+            return 0
+    
+    def release_claims(self, replica_id: str) -> int:
+        """釋放本副本認領但尚未送出的通知（關閉時使用）"""
+        def release(session: Session) -> int:
+            return session.execute(
+                update(NotificationOutboxTable)
+                .where(NotificationOutboxTable.claimed_by == replica_id)
+                .values(claimed_by=None, lease_expires_at=None)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+        
+        try:
+            return self.db_manager.write(release)
+        except Exception as e:
+            self.logger.error("釋放認領失敗", error=str(e))
+            return 0
+    
+    def reap_expired_leases(self, now: Optional[datetime] = None) -> int:
+        """清除已過期的租約（副本當機後由其他副本接手）"""
+        now = now or datetime.utcnow()
+        
+        def reap(session: Session) -> int:
+            return session.execute(
+                update(NotificationOutboxTable)
+                .where(NotificationOutboxTable.lease_expires_at <= now)
+                .values(claimed_by=None, lease_expires_at=None)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+        
+        try:
+            reaped = self.db_manager.write(reap)
+            if reaped:
+                self.logger.warning("回收過期租約", count=reaped)
+            return reaped
+        except Exception as e:
+            self.logger.error("回收過期租約失敗", error=str(e))
+            return 0
+    
+    def count_dispatch_backlog(self, now: Optional[datetime] = None) -> int:
+        """外寄匣中已到期、尚未完成派送的通知數量（所有副本共用的派送積壓）"""
+        now = now or datetime.utcnow()
+        try:
+            with self.db_manager.get_session() as session:
+                return session.scalar(
+                    select(func.count()).select_from(NotificationOutboxTable)
+                    .where(NotificationOutboxTable.available_at <= now)
+                ) or 0
+        except Exception as e:
+            self.logger.error("計算派送積壓失敗", error=str(e))
+            return 0
+    
+    def get_scheduled_notifications(self, now: Optional[datetime] = None) -> List[Tuple[str, datetime]]:
+        """獲取尚未到期的排程通知 (ID, 派送時間)"""
+        try:
+            now = now or datetime.utcnow()
+            with self.db_manager.get_session() as session:
+                return [
+                    (row.id, row.deliver_at)
+                    for row in session.query(NotificationTable.id, NotificationTable.deliver_at).filter(
+                        NotificationTable.deliver_at > now,
+                        NotificationTable.status == NotificationStatus.PENDING
+                    ).order_by(NotificationTable.deliver_at.asc())
+                ]
+        except Exception as e:
+            self.logger.error("獲取排程通知失敗", error=str(e))
+            return []
+    
+    def reschedule_notification(self, notification_id: str, deliver_at: datetime) -> bool:
+        """更新通知的排程派送時間"""
+        def update(session: Session) -> bool:
+            session.query(NotificationOutboxTable).filter(
+                NotificationOutboxTable.notification_id == notification_id
+            ).update({
+                NotificationOutboxTable.available_at: deliver_at,
+                NotificationOutboxTable.claimed_by: None,
+                NotificationOutboxTable.lease_expires_at: None
+            }, synchronize_session=False)
+            return session.query(NotificationTable).filter(
+                NotificationTable.id == notification_id
+            ).update({NotificationTable.deliver_at: deliver_at}, synchronize_session=False) > 0
+        
+        try:
+            return self.db_manager.write(update)
+        except Exception as e:
+            self.logger.error("更新排程時間失敗", notification_id=notification_id, error=str(e))
+            return False
 
 
 class ProjectRepository:
@@ -239,25 +840,26 @@ class ProjectRepository:
     
     def create_project(self, project: Project) -> str:
         """建立專案"""
+        def insert(session: Session) -> str:
+            db_project = ProjectTable(
+                id=str(uuid.uuid4()),
+                name=project.name,
+                description=project.description,
+                status=project.status,
+                current_task=project.current_task,
+                progress=project.progress,
+                estimated_completion=project.estimated_completion,
+                metadata_=project.metadata
+            )
+            session.add(db_project)
+            return db_project.id
+        
         try:
-            with self.db_manager.get_session() as session:
-                db_project = ProjectTable(
-                    name=project.name,
-                    description=project.description,
-                    status=project.status,
-                    current_task=project.current_task,
-                    progress=project.progress,
-                    estimated_completion=project.estimated_completion,
-                    metadata=project.metadata
-                )
-                session.add(db_project)
-                session.commit()
-                session.refresh(db_project)
-                
-                self.logger.info(f"專案建立成功: {db_project.id}")
-                return db_project.id
+            project_id = self.db_manager.write(insert)
+            self.logger.info("專案建立成功", project_id=project_id)
+            return project_id
         except Exception as e:
-            self.logger.error(f"建立專案失敗: {e}")
+            self.logger.error("建立專案失敗", error=str(e))
             raise
     
     def get_project(self, project_id: str) -> Optional[Project]:
@@ -279,13 +881,34 @@ class ProjectRepository:
                         current_task=db_project.current_task,
                         progress=db_project.progress,
                         estimated_completion=db_project.estimated_completion,
-                        metadata=db_project.metadata
+                        metadata=db_project.metadata_ or {}
                     )
                 return None
         except Exception as e:
-            self.logger.error(f"獲取專案失敗: {e}")
+            self.logger.error("獲取專案失敗", project_id=project_id, error=str(e))
             return None
     
+    def update_work_status(self, status: WorkStatus) -> bool:
+        """寫入專案的工作狀態，專案不存在時回傳 False"""
+        def update(session: Session) -> bool:
+            db_project = session.get(ProjectTable, status.project_id)
+            if db_project is None:
+                return False
+            
+            db_project.current_task = status.current_task
+            db_project.progress = status.progress
+            db_project.estimated_completion = status.estimated_completion
+            db_project.updated_at = datetime.utcnow()
+            # JSON 欄位需指派新物件才會被偵測為已變更
+            db_project.metadata_ = {**(db_project.metadata_ or {}), **status.details}
+            return True
+        
+        try:
+            return self.db_manager.write(update)
+        except Exception as e:
+            self.logger.error("更新工作狀態失敗", project_id=status.project_id, error=str(e))
+            raise
+    
     def get_active_projects(self) -> List[Project]:
         """獲取活躍專案"""
         try:
@@ -306,41 +929,444 @@ class ProjectRepository:
                         current_task=db_project.current_task,
                         progress=db_project.progress,
                         estimated_completion=db_project.estimated_completion,
-                        metadata=db_project.metadata
+                        metadata=db_project.metadata_ or {}
                     ))
                 
                 return projects
         except Exception as e:
-            self.logger.error(f"獲取活躍專案失敗: {e}")
+            self.logger.error("獲取活躍專案失敗", error=str(e))
+            return []
+    
+    def count_active_projects(self) -> int:
+        """計算活躍專案數量"""
+        try:
+            with self.db_manager.get_session() as session:
+                return session.scalar(
+                    select(func.count()).select_from(ProjectTable).where(ProjectTable.status == ProjectStatus.ACTIVE)
+                ) or 0
+        except Exception as e:
+            self.logger.error("計算活躍專案失敗", error=str(e))
+            return 0
+
+
+class UserPreferencesRepository:
+    """使用者偏好設定資料存取物件"""
+    
+    def __init__(self, db_manager: DatabaseManager):
+        self.db_manager = db_manager
+        self.logger = structlog.get_logger(__name__)
+    
+    def _to_model(self, db_preferences: UserPreferencesTable) -> UserPreferences:
+        return UserPreferences(
+            user_id=db_preferences.user_id,
+            notification_types=db_preferences.notification_types or [],
+            quiet_hours_start=db_preferences.quiet_hours_start,
+            quiet_hours_end=db_preferences.quiet_hours_end,
+            priority_filter=db_preferences.priority_filter,
+            discord_dm=db_preferences.discord_dm,
+            discord_channel_id=db_preferences.discord_channel_id,
+            timezone=db_preferences.timezone,
+            created_at=db_preferences.created_at,
+            updated_at=db_preferences.updated_at
+        )
+    
+    def upsert_preferences(self, preferences: UserPreferences) -> UserPreferences:
+        """建立或更新使用者偏好設定"""
+        def upsert(session: Session) -> UserPreferences:
+            db_preferences = session.query(UserPreferencesTable).filter(
+                UserPreferencesTable.user_id == preferences.user_id
+            ).first()
+            
+            if db_preferences is None:
+                db_preferences = UserPreferencesTable(user_id=preferences.user_id)
+                session.add(db_preferences)
+            
+            db_preferences.notification_types = list(preferences.notification_types)
+            db_preferences.quiet_hours_start = preferences.quiet_hours_start
+            db_preferences.quiet_hours_end = preferences.quiet_hours_end
+            db_preferences.priority_filter = preferences.priority_filter
+            db_preferences.discord_dm = preferences.discord_dm
+            db_preferences.discord_channel_id = preferences.discord_channel_id
+            db_preferences.timezone = preferences.timezone
+            
+            session.flush()
+            return self._to_model(db_preferences)
+        
+        try:
+            saved = self.db_manager.write(upsert)
+            self.logger.info("偏好設定更新成功", user_id=preferences.user_id)
+            return saved
+        except Exception as e:
+            self.logger.error("更新偏好設定失敗", user_id=preferences.user_id, error=str(e))
+            raise
+    
+    def get_preferences(self, user_id: str) -> Optional[UserPreferences]:
+        """獲取使用者偏好設定"""
+        try:
+            with self.db_manager.get_session() as session:
+                db_preferences = session.query(UserPreferencesTable).filter(
+                    UserPreferencesTable.user_id == user_id
+                ).first()
+                
+                return self._to_model(db_preferences) if db_preferences else None
+        except Exception as e:
+            self.logger.error("獲取偏好設定失敗", user_id=user_id, error=str(e))
+            return None
+    
+    def get_preferences_version(self) -> Tuple[int, Optional[datetime]]:
+        """偏好設定的版本（筆數與最後更新時間），任何副本新增、更新或刪除偏好時都會改變"""
+        with self.db_manager.get_session() as session:
+            count, updated_at = session.query(
+                func.count(UserPreferencesTable.user_id), func.max(UserPreferencesTable.updated_at)
+            ).one()
+            return count, updated_at
+    
+    def get_all_preferences(self) -> List[UserPreferences]:
+        """獲取所有使用者偏好設定"""
+        try:
+            with self.db_manager.get_session() as session:
+                return [
+                    self._to_model(db_preferences)
+                    for db_preferences in session.query(UserPreferencesTable).all()
+                ]
+        except Exception as e:
+            self.logger.error("獲取所有偏好設定失敗", error=str(e))
+            return []
+
+
+class ApiKeyRepository:
+    """API 金鑰資料存取物件"""
+    
+    def __init__(self, db_manager: DatabaseManager):
+        self.db_manager = db_manager
+        self.logger = structlog.get_logger(__name__)
+    
+    def _to_model(self, db_api_key: ApiKeyTable) -> ApiKey:
+        return ApiKey(
+            id=db_api_key.id,
+            name=db_api_key.name,
+            key_prefix=db_api_key.key_prefix,
+            project_id=db_api_key.project_id,
+            is_admin=bool(db_api_key.is_admin),
+            rate_limit_per_minute=db_api_key.rate_limit_per_minute,
+            daily_quota=db_api_key.daily_quota,
+            created_at=db_api_key.created_at,
+            revoked_at=db_api_key.revoked_at
+        )
+    
+    def create_api_key(self, api_key: ApiKey, key_hash: str) -> ApiKey:
+        """建立 API 金鑰"""
+        def insert(session: Session) -> ApiKey:
+            db_api_key = ApiKeyTable(
+                id=str(uuid.uuid4()),
+                name=api_key.name,
+                key_hash=key_hash,
+                key_prefix=api_key.key_prefix,
+                project_id=api_key.project_id,
+                is_admin=api_key.is_admin,
+                rate_limit_per_minute=api_key.rate_limit_per_minute,
+                daily_quota=api_key.daily_quota,
+                created_at=api_key.created_at
+            )
+            session.add(db_api_key)
+            session.flush()
+            return self._to_model(db_api_key)
+        
+        try:
+            created = self.db_manager.write(insert)
+            self.logger.info("API 金鑰建立成功", api_key_id=created.id, project_id=created.project_id)
+            return created
+        except Exception as e:
+            self.logger.error("建立 API 金鑰失敗", error=str(e))
+            raise
+    
+    def get_api_key(self, api_key_id: str) -> Optional[ApiKey]:
+        """以 ID 查詢 API 金鑰（包含已撤銷的金鑰）"""
+        with self.db_manager.get_session() as session:
+            db_api_key = session.get(ApiKeyTable, api_key_id)
+            return self._to_model(db_api_key) if db_api_key else None
+    
+    def get_api_key_by_hash(self, key_hash: str) -> Optional[ApiKey]:
+        """以雜湊值查詢 API 金鑰（包含已撤銷的金鑰）"""
+        with self.db_manager.get_session() as session:
+            db_api_key = session.query(ApiKeyTable).filter(ApiKeyTable.key_hash == key_hash).first()
+            return self._to_model(db_api_key) if db_api_key else None
+    
+    def list_api_keys(self) -> List[ApiKey]:
+        """列出所有 API 金鑰"""
+        try:
+            with self.db_manager.get_session() as session:
+                return [
+                    self._to_model(db_api_key)
+                    for db_api_key in session.query(ApiKeyTable).order_by(ApiKeyTable.created_at).all()
+                ]
+        except Exception as e:
+            self.logger.error("列出 API 金鑰失敗", error=str(e))
             return []
+    
+    def revoke_api_key(self, api_key_id: str, now: Optional[datetime] = None) -> Optional[str]:
+        """撤銷 API 金鑰，回傳金鑰雜湊值（讓呼叫端清除驗證快取），金鑰不存在時回傳 None"""
+        def revoke(session: Session) -> Optional[str]:
+            db_api_key = session.query(ApiKeyTable).filter(ApiKeyTable.id == api_key_id).first()
+            if db_api_key is None:
+                return None
+            if db_api_key.revoked_at is None:
+                db_api_key.revoked_at = now or datetime.utcnow()
+            return db_api_key.key_hash
+        
+        key_hash = self.db_manager.write(revoke)
+        if key_hash is not None:
+            self.logger.info("API 金鑰已撤銷", api_key_id=api_key_id)
+        return key_hash
+
+
+class SubscriptionRepository:
+    """通知訂閱資料存取物件"""
+    
+    def __init__(self, db_manager: DatabaseManager):
+        self.db_manager = db_manager
+        self.logger = structlog.get_logger(__name__)
+    
+    def _to_model(self, db_subscription: SubscriptionTable) -> Subscription:
+        return Subscription(
+            id=db_subscription.id,
+            project_id=db_subscription.project_id,
+            notification_type=db_subscription.notification_type,
+            destination_type=db_subscription.destination_type,
+            destination_id=db_subscription.destination_id,
+            guild_id=db_subscription.guild_id,
+            created_at=db_subscription.created_at
+        )
+    
+    def create_subscription(self, subscription: Subscription) -> Subscription:
+        """建立訂閱（相同的專案、類型與目的地已訂閱時回傳既有的訂閱）"""
+        notification_type = NotificationType(subscription.notification_type) if subscription.notification_type else None
+        
+        def insert(session: Session) -> Subscription:
+            existing = session.query(SubscriptionTable).filter(
+                SubscriptionTable.project_id.is_(None) if subscription.project_id is None
+                else SubscriptionTable.project_id == subscription.project_id,
+                SubscriptionTable.notification_type.is_(None) if notification_type is None
+                else SubscriptionTable.notification_type == notification_type,
+                SubscriptionTable.destination_type == DestinationType(subscription.destination_type),
+                SubscriptionTable.destination_id == subscription.destination_id
+            ).first()
+            if existing is not None:
+                return self._to_model(existing)
+            
+            db_subscription = SubscriptionTable(
+                id=str(uuid.uuid4()),
+                project_id=subscription.project_id,
+                notification_type=notification_type,
+                destination_type=DestinationType(subscription.destination_type),
+                destination_id=subscription.destination_id,
+                guild_id=subscription.guild_id,
+                created_at=subscription.created_at
+            )
+            session.add(db_subscription)
+            session.flush()
+            return self._to_model(db_subscription)
+        
+        try:
+            created = self.db_manager.write(insert)
+            self.logger.info("訂閱建立成功", subscription_id=created.id, project_id=created.project_id)
+            return created
+        except Exception as e:
+            self.logger.error("建立訂閱失敗", error=str(e))
+            raise
+    
+    def get_subscription(self, subscription_id: str) -> Optional[Subscription]:
+        """查詢單一訂閱"""
+        with self.db_manager.get_session() as session:
+            db_subscription = session.get(SubscriptionTable, subscription_id)
+            return self._to_model(db_subscription) if db_subscription else None
+    
+    def list_subscriptions(self, project_id: Optional[str] = None) -> List[Subscription]:
+        """列出訂閱（指定專案時只列出該專案的訂閱）"""
+        try:
+            with self.db_manager.get_session() as session:
+                query = session.query(SubscriptionTable)
+                if project_id is not None:
+                    query = query.filter(SubscriptionTable.project_id == project_id)
+                return [
+                    self._to_model(db_subscription)
+                    for db_subscription in query.order_by(SubscriptionTable.created_at).all()
+                ]
+        except Exception as e:
+            self.logger.error("列出訂閱失敗", error=str(e))
+            return []
+    
+    def find_subscriptions(self, keys: Iterable[Tuple[Optional[str], Optional[str]]]
+                           ) -> Dict[Tuple[Optional[str], Optional[str]], List[Subscription]]:
+        """以一次查詢取得多組 (專案, 類型) 的訂閱，包含專案或類型為萬用的訂閱
+        
+        回傳以訂閱本身的 (project_id, notification_type) 分組的結果，萬用欄位為 None，
+        由呼叫端依通知合併相符的分組。
+        """
+        keys = list(keys)
+        if not keys:
+            return {}
+        project_ids = {project_id for project_id, _ in keys if project_id is not None}
+        notification_types = {NotificationType(notification_type) for _, notification_type in keys if notification_type}
+        
+        with self.db_manager.get_session() as session:
+            rows = session.query(SubscriptionTable).filter(
+                or_(SubscriptionTable.project_id.is_(None), SubscriptionTable.project_id.in_(project_ids)),
+                or_(SubscriptionTable.notification_type.is_(None),
+                    SubscriptionTable.notification_type.in_(notification_types))
+            ).order_by(SubscriptionTable.created_at).all()
+            
+            grouped: Dict[Tuple[Optional[str], Optional[str]], List[Subscription]] = {}
+            for db_subscription in rows:
+                subscription = self._to_model(db_subscription)
+                grouped.setdefault((subscription.project_id, subscription.notification_type), []).append(subscription)
+            return grouped
+    
+    def delete_subscription(self, subscription_id: str) -> bool:
+        """刪除訂閱，訂閱不存在時回傳 False"""
+        def remove(session: Session) -> bool:
+            return session.execute(
+                delete(SubscriptionTable).where(SubscriptionTable.id == subscription_id)
+            ).rowcount > 0
+        
+        deleted = self.db_manager.write(remove)
+        if deleted:
+            self.logger.info("訂閱已刪除", subscription_id=subscription_id)
+        return deleted
+
+
+class LeaseRepository:
+    """背景工作租約資料存取物件"""
+    
+    def __init__(self, db_manager: DatabaseManager):
+        self.db_manager = db_manager
+        self.logger = structlog.get_logger(__name__)
+    
+    def try_acquire(self, name: str, holder: str, lease_seconds: int, now: Optional[datetime] = None) -> bool:
+        """取得或續約租約；租約由其他副本持有且尚未到期時回傳 False"""
+        now = now or datetime.utcnow()
+        expires_at = now + timedelta(seconds=lease_seconds)
+        
+        def acquire(session: Session) -> bool:
+            # 以條件更新搶租約，多個副本同時續約或接手時只有一個會成功
+            renewed = session.execute(
+                update(LeaseTable)
+                .where(LeaseTable.name == name, or_(LeaseTable.holder == holder, LeaseTable.expires_at <= now))
+                .values(holder=holder, expires_at=expires_at)
+            ).rowcount
+            if renewed:
+                return True
+            if session.get(LeaseTable, name) is not None:
+                return False
+            session.add(LeaseTable(name=name, holder=holder, expires_at=expires_at))
+            session.flush()
+            return True
+        
+        try:
+            return self.db_manager.write(acquire)
+        except IntegrityError:
+            return False  # 其他副本同時建立了租約
+    
+    def release(self, name: str, holder: str) -> bool:
+        """釋放自己持有的租約，讓其他副本不必等到期就能接手"""
+        def remove(session: Session) -> bool:
+            return session.execute(
+                delete(LeaseTable).where(LeaseTable.name == name, LeaseTable.holder == holder)
+            ).rowcount > 0
+        
+        return self.db_manager.write(remove)
 
 
-# 全域資料庫管理器實例
-db_manager = DatabaseManager()
-notification_repo = NotificationRepository(db_manager)
-project_repo = ProjectRepository(db_manager)
+class BlobOwnerRepository:
+    """內容擁有者資料存取物件"""
+    
+    def __init__(self, db_manager: DatabaseManager):
+        self.db_manager = db_manager
+        self.logger = structlog.get_logger(__name__)
+    
+    def add_owner(self, blob_id: str, project_id: str):
+        """記錄專案可存取此內容（已記錄時不變）"""
+        def add(session: Session):
+            if session.get(BlobOwnerTable, (blob_id, project_id)) is None:
+                session.add(BlobOwnerTable(blob_id=blob_id, project_id=project_id))
+                session.flush()
+        
+        try:
+            self.db_manager.write(add)
+        except IntegrityError:
+            pass  # 其他請求同時記錄了相同的擁有者
+    
+    def is_owner(self, blob_id: str, project_id: str) -> bool:
+        """專案是否可存取此內容"""
+        with self.db_manager.get_session() as session:
+            return session.get(BlobOwnerTable, (blob_id, project_id)) is not None
+
+
+# 全域資料庫管理器實例（第一次使用時才建立引擎與資料存取物件）
+_db_manager: Optional[DatabaseManager] = None
+_repositories: Dict[type, Any] = {}
+_init_lock = threading.Lock()
 
 
 def initialize_database():
     """初始化資料庫"""
     try:
-        db_manager.create_tables()
+        get_db_manager().create_tables()
         logger.info("資料庫初始化完成")
     except Exception as e:
-        logger.error(f"資料庫初始化失敗: {e}")
+        logger.error("資料庫初始化失敗", error=str(e))
         raise
 
 
 def get_db_manager() -> DatabaseManager:
     """獲取資料庫管理器"""
-    return db_manager
+    global _db_manager
+    if _db_manager is None:
+        with _init_lock:
+            if _db_manager is None:
+                _db_manager = DatabaseManager()
+    return _db_manager
+
+
+def _get_repository(repository_class: type):
+    repository = _repositories.get(repository_class)
+    if repository is None:
+        db_manager = get_db_manager()
+        with _init_lock:
+            repository = _repositories.setdefault(repository_class, repository_class(db_manager))
+    return repository
 
 
 def get_notification_repo() -> NotificationRepository:
     """獲取通知資料存取物件"""
-    return notification_repo
+    return _get_repository(NotificationRepository)
 
 
 def get_project_repo() -> ProjectRepository:
     """獲取專案資料存取物件"""
-    return project_repo 
\ No newline at end of file
+    return _get_repository(ProjectRepository)
+
+
+def get_preferences_repo() -> UserPreferencesRepository:
+    """獲取使用者偏好設定資料存取物件"""
+    return _get_repository(UserPreferencesRepository)
+
+
+def get_api_key_repo() -> ApiKeyRepository:
+    """獲取 API 金鑰資料存取物件"""
+    return _get_repository(ApiKeyRepository)
+
+
+def get_subscription_repo() -> SubscriptionRepository:
+    """獲取通知訂閱資料存取物件"""
+    return _get_repository(SubscriptionRepository)
+
+
+def get_lease_repo() -> LeaseRepository:
+    """獲取背景工作租約資料存取物件"""
+    return _get_repository(LeaseRepository)
+
+
+def get_blob_owner_repo() -> BlobOwnerRepository:
+    """獲取內容擁有者資料存取物件"""
+    return _get_repository(BlobOwnerRepository)
@@ -0,0 +1,160 @@
+"""
+非同步日誌模組
+呼叫端只執行輕量的 structlog 處理器並把紀錄放入佇列，
+JSON 序列化、例外格式化與檔案/終端寫入都由背景執行緒（QueueListener）完成
+"""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Optional
+
+import structlog
+
+from .tracing import add_trace_context
+
+
+class NonFormattingQueueHandler(logging.handlers.QueueHandler):
+    """不在呼叫端格式化的 QueueHandler
+    
+    標準 QueueHandler.prepare() 會先執行 format() 再放入佇列，等於在事件迴圈上做 JSON 序列化；
+    這裡直接放入原始紀錄，由背景執行緒的處理器格式化。
+    """
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class EventSampler:
+    """高流量事件取樣
+    
+    以 sampled=True 標記的 DEBUG/INFO 事件，同一事件每 N 筆只保留 1 筆，
+    保留的事件附上 sample_rate 方便還原實際數量；警告與錯誤不取樣。
+    """
+    
+    def __init__(self, rate: float):
+        self.interval = max(1, round(1 / rate)) if rate > 0 else 0
+        self._counters: Dict[str, int] = {}
+    
+    def __call__(self, logger, method_name: str, event_dict: dict) -> dict:
+        if not event_dict.pop("sampled", False) or method_name not in ("debug", "info"):
+            return event_dict
+        if self.interval == 0:
+            raise structlog.DropEvent
+        if self.interval == 1:
+            return event_dict
+        
+        event = event_dict.get("event")
+        count = self._counters.get(event, 0)
+        self._counters[event] = count + 1
+        if count % self.interval:
+            raise structlog.DropEvent
+        event_dict["sample_rate"] = 1 / self.interval
+        return event_dict
+
+
+def capture_exc_info(logger, method_name: str, event_dict: dict) -> dict:
+    """記下目前的例外，traceback 的格式化留給背景執行緒"""
+    if event_dict.get("exc_info") is True:
+        event_dict["exc_info"] = sys.exc_info()
+    return event_dict
+
+
+def add_record_timestamp(logger, method_name: str, event_dict: dict) -> dict:
+    """以紀錄建立時間作為時間戳記（在背景執行緒格式化時仍是事件發生的時間）"""
+    record = event_dict.get("_record")
+    if record is not None and "timestamp" not in event_dict:
+        event_dict["timestamp"] = datetime.fromtimestamp(record.created, timezone.utc).isoformat()
+    return event_dict
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.Handler] = None
+_lock = threading.Lock()
+
+
+def start_logging(level: str = "INFO", log_file: Optional[str] = None, max_bytes: int = 10 * 1024 * 1024,
+                  backup_count: int = 5, sample_rate: float = 1.0):
+    """啟動日誌管線（重複呼叫時不做任何事）"""
+    global _listener, _queue_handler
+    
+    with _lock:
+        if _listener is not None:
+            return
+        
+        log_level = getattr(logging, level.upper(), logging.INFO)
+        
+        # 呼叫端：過濾層級、取樣、附加基本欄位後包裝成 LogRecord
+        structlog.configure(
+            processors=[
+                structlog.stdlib.filter_by_level,
+                EventSampler(sample_rate),
+                structlog.stdlib.add_logger_name,
+                structlog.stdlib.add_log_level,
+                add_trace_context,
+                structlog.processors.StackInfoRenderer(),
+                capture_exc_info,
+                structlog.stdlib.ProcessorFormatter.wrap_for_formatter,
+            ],
+            context_class=dict,
+            logger_factory=structlog.stdlib.LoggerFactory(),
+            wrapper_class=structlog.stdlib.BoundLogger,
+            cache_logger_on_first_use=True,
+        )
+        
+        # 背景執行緒：格式化參數與例外並序列化為 JSON（第三方套件的標準 logging 紀錄也一併轉換）
+        formatter = structlog.stdlib.ProcessorFormatter(
+            foreign_pre_chain=[
+                structlog.stdlib.add_logger_name,
+                structlog.stdlib.add_log_level,
+            ],
+            processors=[
+                add_record_timestamp,
+                structlog.stdlib.PositionalArgumentsFormatter(),
+                structlog.processors.format_exc_info,
+                structlog.processors.UnicodeDecoder(),
+                structlog.stdlib.ProcessorFormatter.remove_processors_meta,
+                structlog.processors.JSONRenderer(ensure_ascii=False),
+            ],
+        )
+        
+        handlers = [logging.StreamHandler()]
+        if log_file:
+            Path(log_file).parent.mkdir(parents=True, exist_ok=True)
+            handlers.append(logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+            ))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+        
+        log_queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        _queue_handler = NonFormattingQueueHandler(log_queue)
+        root = logging.getLogger()
+        root.addHandler(_queue_handler)
+        root.setLevel(log_level)
+        
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+
+
+def stop_logging():
+    """寫出佇列中剩餘的紀錄並停止背景執行緒"""
+    global _listener, _queue_handler
+    
+    with _lock:
+        if _listener is None:
+            return
+        logging.getLogger().removeHandler(_queue_handler)
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+        _queue_handler = None
+
+
+atexit.register(stop_logging)
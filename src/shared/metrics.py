@@ -0,0 +1,46 @@
+"""
+監控指標模組
+集中定義 Prometheus 指標，供各服務共用
+"""
+
+from prometheus_client import Counter, Gauge, CONTENT_TYPE_LATEST, generate_latest
+
+
+# 通知建立
+NOTIFICATIONS_CREATED = Counter(
+    "mcp_notifications_created_total",
+    "已建立的通知數量",
+    ["type"]
+)
+
+# 重複通知抑制（reason: idempotency_key / content_hash，source: cache / database）
+NOTIFICATIONS_DEDUPLICATED = Counter(
+    "mcp_notifications_deduplicated_total",
+    "因重複而被抑制的通知數量",
+    ["reason", "source"]
+)
+
+
+# 流量控制拒絕的建立請求（reason: rate_limited / backpressure）
+NOTIFICATIONS_REJECTED = Counter(
+    "mcp_notifications_rejected_total",
+    "因流量控制被拒絕建立的通知數量",
+    ["reason"]
+)
+
+# 積壓過高時派送器丟棄的低優先級通知
+NOTIFICATIONS_SHED = Counter(
+    "mcp_notifications_shed_total",
+    "因派送積壓被丟棄的通知數量"
+)
+
+# 外寄匣中已到期、尚未完成派送的通知數量
+DISPATCH_BACKLOG = Gauge(
+    "mcp_dispatch_backlog",
+    "待派送的通知積壓數量"
+)
+
+
+def render_metrics() -> tuple:
+    """輸出 Prometheus 文字格式的指標與對應的 Content-Type"""
+    return generate_latest(), CONTENT_TYPE_LATEST
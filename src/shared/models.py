@@ -3,10 +3,10 @@
 定義系統中使用的各種資料結構
 """
 
-from datetime import datetime
+from datetime import datetime, timezone
 from enum import Enum
-from typing import Optional, Dict, Any, List
-from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any, FrozenSet, List
+from pydantic import BaseModel, Field, validator
 
 
 class NotificationType(str, Enum):
@@ -26,6 +26,20 @@ class Priority(str, Enum):
     URGENT = "urgent"
 
 
+# 優先級排序（數字越大越重要）
+PRIORITY_RANK = {
+    Priority.LOW.value: 0,
+    Priority.MEDIUM.value: 1,
+    Priority.HIGH.value: 2,
+    Priority.URGENT.value: 3,
+}
+
+
+def enum_value(value) -> str:
+    """取得枚舉或字串的值（模型使用 use_enum_values，資料表讀出則為枚舉）"""
+    return getattr(value, "value", value)
+
+
 class NotificationStatus(str, Enum):
     """通知狀態枚舉"""
     PENDING = "pending"         # 待發送
@@ -34,6 +48,37 @@ class NotificationStatus(str, Enum):
     READ = "read"              # 已讀取
     REPLIED = "replied"        # 已回覆
     FAILED = "failed"          # 發送失敗
+    FILTERED = "filtered"      # 依使用者偏好過濾
+    EXPIRED = "expired"        # 超過有效期限未送出
+
+
+# 狀態轉移規則：目標狀態 -> 允許的來源狀態（不在表中的轉移一律拒絕，例如已回覆不能回到已發送）
+STATUS_TRANSITIONS: Dict[NotificationStatus, FrozenSet[NotificationStatus]] = {
+    NotificationStatus.PENDING: frozenset(),
+    NotificationStatus.SENT: frozenset({NotificationStatus.PENDING}),
+    NotificationStatus.DELIVERED: frozenset({NotificationStatus.PENDING, NotificationStatus.SENT}),
+    NotificationStatus.READ: frozenset({NotificationStatus.SENT, NotificationStatus.DELIVERED}),
+    # 送達確認前就收到回覆時也接受；同一通知可有多則回覆
+    NotificationStatus.REPLIED: frozenset({
+        NotificationStatus.PENDING, NotificationStatus.SENT, NotificationStatus.DELIVERED,
+        NotificationStatus.READ, NotificationStatus.REPLIED
+    }),
+    NotificationStatus.FAILED: frozenset({NotificationStatus.PENDING}),
+    NotificationStatus.FILTERED: frozenset({NotificationStatus.PENDING}),
+    NotificationStatus.EXPIRED: frozenset({NotificationStatus.PENDING}),
+}
+
+# 轉移到該狀態時一併記錄的時間欄位
+STATUS_TIMESTAMP_FIELDS: Dict[NotificationStatus, str] = {
+    NotificationStatus.SENT: "sent_at",
+    NotificationStatus.READ: "read_at",
+    NotificationStatus.REPLIED: "replied_at",
+}
+
+# 表示通知已發出的狀態：送達回執或回覆早於 SENT 轉移到達時，轉移到這些狀態會補上尚未設定的 sent_at
+SENT_IMPLIED_STATUSES: FrozenSet[NotificationStatus] = frozenset({
+    NotificationStatus.DELIVERED, NotificationStatus.READ, NotificationStatus.REPLIED
+})
 
 
 class ProjectStatus(str, Enum):
@@ -57,8 +102,17 @@ class Notification(BaseModel):
     sent_at: Optional[datetime] = None
     read_at: Optional[datetime] = None
     replied_at: Optional[datetime] = None
+    deliver_at: Optional[datetime] = None   # 排程派送時間（UTC），None 表示立即派送
+    expires_at: Optional[datetime] = None   # 有效期限（UTC），逾期未送出則不再派送
     metadata: Dict[str, Any] = Field(default_factory=dict)
 
+    @validator("deliver_at", "expires_at")
+    def normalize_utc(cls, value: Optional[datetime]) -> Optional[datetime]:
+        """帶時區的時間轉換為不帶時區的 UTC 時間（與資料庫一致）"""
+        if value is not None and value.tzinfo is not None:
+            return value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
     class Config:
         use_enum_values = True
 
@@ -72,6 +126,23 @@ class NotificationResponse(BaseModel):
     metadata: Dict[str, Any] = Field(default_factory=dict)
 
 
+class NotificationReceipt(BaseModel):
+    """送達/已讀回執資料模型"""
+    notification_id: str
+    status: NotificationStatus
+
+    @validator("status")
+    def validate_receipt_status(cls, value):
+        if value not in (NotificationStatus.DELIVERED, NotificationStatus.READ):
+            raise ValueError("回執狀態只能是 delivered 或 read")
+        return value
+
+
+class ReceiptBatch(BaseModel):
+    """回執批次資料模型"""
+    receipts: List[NotificationReceipt] = Field(..., max_items=1000)
+
+
 class Project(BaseModel):
     """專案資料模型"""
     id: Optional[str] = None
@@ -118,6 +189,39 @@ class UserPreferences(BaseModel):
         use_enum_values = True
 
 
+class ApiKey(BaseModel):
+    """API 金鑰資料模型（金鑰本身只在建立時回傳一次，資料庫只儲存雜湊值）"""
+    id: Optional[str] = None
+    name: str = Field(..., min_length=1, max_length=100)
+    key_prefix: Optional[str] = None
+    project_id: Optional[str] = None  # 未指定時可存取所有專案
+    is_admin: bool = False
+    rate_limit_per_minute: Optional[int] = Field(None, ge=1)
+    daily_quota: Optional[int] = Field(None, ge=1)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    revoked_at: Optional[datetime] = None
+
+
+class DestinationType(str, Enum):
+    """訂閱目的地類型"""
+    CHANNEL = "channel"         # Discord 頻道
+    USER = "user"               # Discord 使用者私訊
+
+
+class Subscription(BaseModel):
+    """通知訂閱資料模型（專案或類型未指定時訂閱全部）"""
+    id: Optional[str] = None
+    project_id: Optional[str] = None
+    notification_type: Optional[NotificationType] = None
+    destination_type: DestinationType
+    destination_id: str = Field(..., regex=r"^\d{1,20}$")
+    guild_id: Optional[str] = Field(None, regex=r"^\d{1,20}$")  # 頻道所屬伺服器，用於路由到負責的分片
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Config:
+        use_enum_values = True
+
+
 class MCPRequest(BaseModel):
     """MCP 請求資料模型"""
     method: str
@@ -0,0 +1,31 @@
+"""
+自適應輪詢模組
+背景輪詢在有工作或偵測到失敗時縮短間隔，閒置時逐步拉長，安靜的部署幾乎不產生背景負載
+"""
+
+from typing import Optional
+
+
+class AdaptiveInterval:
+    """自適應輪詢間隔
+    
+    reset() 回到最短間隔（有工作或需要盡快確認狀態時），
+    backoff() 將間隔乘以 factor，直到最長間隔（閒置或狀態正常時）。
+    """
+    
+    def __init__(self, min_seconds: float, max_seconds: float, factor: float = 2.0,
+                 initial_seconds: Optional[float] = None):
+        self.min_seconds = min_seconds
+        self.max_seconds = max(min_seconds, max_seconds)
+        self.factor = factor
+        self.current = min_seconds if initial_seconds is None else initial_seconds
+    
+    def reset(self) -> float:
+        """回到最短間隔"""
+        self.current = self.min_seconds
+        return self.current
+    
+    def backoff(self) -> float:
+        """拉長間隔"""
+        self.current = min(self.max_seconds, self.current * self.factor)
+        return self.current
@@ -0,0 +1,44 @@
+"""
+令牌桶限流模組
+MCP Server 用於限制建立通知的速率，Discord Bot 用於限制每個頻道或使用者的發送速率
+"""
+
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+
+class TokenBucketLimiter:
+    """令牌桶限流器
+    
+    每個鍵有 burst 個令牌，以 rate_per_second 的速度補充；令牌用完時回傳需要等待的秒數。
+    只保留最近使用的 max_keys 個令牌桶，被淘汰的鍵下次視為令牌全滿。
+    """
+    
+    def __init__(self, rate_per_second: float, burst: int, max_keys: int = 10000):
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[Hashable, list]" = OrderedDict()
+    
+    def __len__(self) -> int:
+        return len(self._buckets)
+    
+    def acquire(self, key: Hashable, now: Optional[float] = None) -> Optional[float]:
+        """取得一個令牌；不足時不扣除並回傳需要等待的秒數"""
+        now = time.monotonic() if now is None else now
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = [float(self.burst), now]
+            self._buckets[key] = bucket
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(float(self.burst), bucket[0] + (now - bucket[1]) * self.rate_per_second)
+            bucket[1] = now
+        
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return None
+        return (1 - bucket[0]) / self.rate_per_second
@@ -0,0 +1,145 @@
+"""
+全文搜尋模組
+以倒排索引搜尋通知標題、內容與回覆文字：SQLite 使用 FTS5，PostgreSQL 使用 tsvector + GIN 索引；
+通知封存時一併移除索引資料列，索引只涵蓋主資料表中的通知
+"""
+
+import re
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.orm import Session
+
+
+# 中日文沒有空白分詞，建立索引與查詢前在每個字元前後補上空白，
+# 讓分詞器把每個字元當成一個詞，查詢時再以片語比對相鄰字元
+_CJK_RE = re.compile(r"([\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff])")
+_WORD_RE = re.compile(r"\w")
+
+SEARCH_TABLE = "notification_search"
+
+
+class SearchHit(NamedTuple):
+    """搜尋結果（分數越高越相關）"""
+    notification_id: str
+    kind: str
+    score: float
+
+
+def segment(value: str) -> str:
+    """在中日文字元之間插入空白"""
+    return _CJK_RE.sub(r" \1 ", value or "")
+
+
+def parse_query(query: str) -> List[str]:
+    """把查詢字串拆成詞組（以空白分隔，每個詞組都必須出現），忽略沒有文字的詞組"""
+    terms = []
+    for term in query.replace('"', " ").split():
+        if _WORD_RE.search(term):
+            terms.append(" ".join(segment(term).split()))
+    return terms
+
+
+class SQLiteSearchIndex:
+    """SQLite FTS5 索引
+    
+    標題權重為內容的兩倍；排序使用 FTS5 內建的 rank 欄位，
+    ORDER BY rank LIMIT 可由 FTS5 直接處理，不需要先取出所有符合的文件。
+    專案 ID 存在不建索引的欄位，限定專案的搜尋在分頁前過濾。
+    """
+    
+    def create(self, connection):
+        connection.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+            "notification_id UNINDEXED, kind UNINDEXED, project_id UNINDEXED, title, body, "
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        ))
+        connection.execute(text(
+            f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rank) VALUES ('rank', 'bm25(0.0, 0.0, 0.0, 2.0, 1.0)')"
+        ))
+    
+    def add(self, session: Session, notification_id: str, kind: str, title: str, body: str,
+            project_id: Optional[str] = None):
+        session.execute(
+            text(f"INSERT INTO {SEARCH_TABLE} (notification_id, kind, project_id, title, body) "
+                 "VALUES (:notification_id, :kind, :project_id, :title, :body)"),
+            {"notification_id": notification_id, "kind": kind, "project_id": project_id,
+             "title": segment(title), "body": segment(body)}
+        )
+    
+    def remove(self, session: Session, notification_ids: List[str]):
+        session.execute(
+            text(f"DELETE FROM {SEARCH_TABLE} WHERE notification_id IN :notification_ids")
+            .bindparams(bindparam("notification_ids", expanding=True)),
+            {"notification_ids": notification_ids}
+        )
+    
+    def search(self, session: Session, terms: List[str], limit: int, offset: int,
+               project_id: Optional[str] = None) -> List[SearchHit]:
+        match = " AND ".join(f'"{term}"' for term in terms)
+        scope = "AND project_id = :project_id " if project_id is not None else ""
+        rows = session.execute(
+            text(f"SELECT notification_id, kind, rank FROM {SEARCH_TABLE} "
+                 f"WHERE {SEARCH_TABLE} MATCH :match {scope}ORDER BY rank LIMIT :limit OFFSET :offset"),
+            {"match": match, "project_id": project_id, "limit": limit, "offset": offset}
+        )
+        # bm25 越小越相關，轉為越大越相關
+        return [SearchHit(row.notification_id, row.kind, -row.rank) for row in rows]
+
+
+class PostgresSearchIndex:
+    """PostgreSQL tsvector 索引（simple 設定，不做語言相關的詞幹處理）"""
+    
+    def create(self, connection):
+        connection.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ("
+            "id BIGSERIAL PRIMARY KEY, "
+            "notification_id VARCHAR NOT NULL, "
+            "kind VARCHAR(20) NOT NULL, "
+            "project_id VARCHAR, "
+            "document TSVECTOR NOT NULL)"
+        ))
+        connection.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_{SEARCH_TABLE}_document ON {SEARCH_TABLE} USING GIN (document)"
+        ))
+        connection.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_{SEARCH_TABLE}_project_id ON {SEARCH_TABLE} (project_id)"
+        ))
+        connection.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_{SEARCH_TABLE}_notification_id ON {SEARCH_TABLE} (notification_id)"
+        ))
+    
+    def add(self, session: Session, notification_id: str, kind: str, title: str, body: str,
+            project_id: Optional[str] = None):
+        session.execute(
+            text(f"INSERT INTO {SEARCH_TABLE} (notification_id, kind, project_id, document) VALUES ("
+                 ":notification_id, :kind, :project_id, "
+                 "setweight(to_tsvector('simple', :title), 'A') || setweight(to_tsvector('simple', :body), 'B'))"),
+            {"notification_id": notification_id, "kind": kind, "project_id": project_id,
+             "title": segment(title), "body": segment(body)}
+        )
+    
+    def remove(self, session: Session, notification_ids: List[str]):
+        session.execute(
+            text(f"DELETE FROM {SEARCH_TABLE} WHERE notification_id IN :notification_ids")
+            .bindparams(bindparam("notification_ids", expanding=True)),
+            {"notification_ids": notification_ids}
+        )
+    
+    def search(self, session: Session, terms: List[str], limit: int, offset: int,
+               project_id: Optional[str] = None) -> List[SearchHit]:
+        params = {f"term_{i}": term for i, term in enumerate(terms)}
+        tsquery = " && ".join(f"phraseto_tsquery('simple', :{name})" for name in params)
+        scope = "AND project_id = :project_id " if project_id is not None else ""
+        rows = session.execute(
+            text(f"SELECT notification_id, kind, ts_rank_cd(document, query) AS score "
+                 f"FROM {SEARCH_TABLE}, (SELECT {tsquery} AS query) AS q "
+                 f"WHERE document @@ query {scope}ORDER BY score DESC LIMIT :limit OFFSET :offset"),
+            {**params, "project_id": project_id, "limit": limit, "offset": offset}
+        )
+        return [SearchHit(row.notification_id, row.kind, float(row.score)) for row in rows]
+
+
+def create_search_index(is_sqlite: bool):
+    """依資料庫類型建立搜尋索引實作"""
+    return SQLiteSearchIndex() if is_sqlite else PostgresSearchIndex()
@@ -0,0 +1,351 @@
+"""
+分散式追蹤模組
+以 W3C traceparent 在 MCP Server、派送器與 Discord Bot 之間傳遞追蹤上下文，
+記錄各階段的 span 並以 OTLP/JSON 格式匯出到本機檔案或 OpenTelemetry Collector
+"""
+
+import json
+import queue
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import structlog
+
+
+TRACEPARENT_HEADER = "traceparent"
+_TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+class SpanKind(IntEnum):
+    """OTLP span 類型"""
+    INTERNAL = 1
+    SERVER = 2
+    CLIENT = 3
+
+
+class StatusCode(IntEnum):
+    """OTLP span 狀態"""
+    UNSET = 0
+    OK = 1
+    ERROR = 2
+
+
+class SpanContext:
+    """追蹤上下文（traceparent 的內容）"""
+    
+    __slots__ = ("trace_id", "span_id", "sampled")
+    
+    def __init__(self, trace_id: str, span_id: str, sampled: bool = True):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+    
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[SpanContext]:
+    """解析 traceparent 標頭，格式不符時回傳 None"""
+    if not value:
+        return None
+    match = _TRACEPARENT_RE.match(value.strip().lower())
+    if match is None:
+        return None
+    trace_id, span_id, flags = match.groups()
+    if trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return SpanContext(trace_id, span_id, bool(int(flags, 16) & 1))
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits) or 1:0{bits // 4}x}"
+
+
+class Span:
+    """單一階段的計時紀錄"""
+    
+    __slots__ = ("name", "context", "parent_span_id", "kind", "attributes",
+                 "start_ns", "end_ns", "status", "status_message")
+    
+    def __init__(self, name: str, parent: Optional[SpanContext], kind: SpanKind,
+                 attributes: Optional[Dict[str, Any]] = None):
+        trace_id = parent.trace_id if parent is not None else _new_id(128)
+        sampled = parent.sampled if parent is not None else True
+        self.name = name
+        self.context = SpanContext(trace_id, _new_id(64), sampled)
+        self.parent_span_id = parent.span_id if parent is not None else None
+        self.kind = kind
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.status = StatusCode.UNSET
+        self.status_message: Optional[str] = None
+    
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+    
+    def set_error(self, message: str):
+        self.status = StatusCode.ERROR
+        self.status_message = message
+    
+    @property
+    def duration_ms(self) -> Optional[float]:
+        if self.end_ns is None:
+            return None
+        return (self.end_ns - self.start_ns) / 1e6
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    """目前執行中的 span"""
+    return _current_span.get()
+
+
+def current_traceparent() -> Optional[str]:
+    """目前 span 的 traceparent，沒有 span 時回傳 None"""
+    span = _current_span.get()
+    return span.context.traceparent if span is not None else None
+
+
+@contextmanager
+def start_span(name: str, parent: Optional[SpanContext] = None, kind: SpanKind = SpanKind.INTERNAL,
+               attributes: Optional[Dict[str, Any]] = None) -> Iterator[Span]:
+    """開始一個 span（未指定 parent 時接續目前的 span），離開時記錄結束時間並匯出"""
+    if parent is None:
+        current = _current_span.get()
+        parent = current.context if current is not None else None
+    
+    span = Span(name, parent, kind, attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.set_error(f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        span.end_ns = time.time_ns()
+        _current_span.reset(token)
+        if _exporter is not None and span.context.sampled:
+            _exporter.export(span)
+
+
+def inject_headers(headers: Dict[str, str]) -> Dict[str, str]:
+    """把目前的追蹤上下文加入 HTTP 標頭"""
+    traceparent = current_traceparent()
+    if traceparent is not None:
+        headers[TRACEPARENT_HEADER] = traceparent
+    return headers
+
+
+def inject_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """把目前的追蹤上下文存入通知 metadata，讓之後的派送與回覆接續同一條追蹤"""
+    traceparent = current_traceparent()
+    if traceparent is not None:
+        metadata["trace"] = {TRACEPARENT_HEADER: traceparent}
+    return metadata
+
+
+def extract_metadata(metadata: Optional[Dict[str, Any]]) -> Optional[SpanContext]:
+    """從通知 metadata 取出追蹤上下文"""
+    trace = (metadata or {}).get("trace")
+    if not isinstance(trace, dict):
+        return None
+    return parse_traceparent(trace.get(TRACEPARENT_HEADER))
+
+
+def add_trace_context(logger, method_name: str, event_dict: dict) -> dict:
+    """structlog 處理器：在日誌中附上 trace_id 與 span_id"""
+    span = _current_span.get()
+    if span is not None:
+        event_dict.setdefault("trace_id", span.context.trace_id)
+        event_dict.setdefault("span_id", span.context.span_id)
+    return event_dict
+
+
+class TracingMiddleware:
+    """ASGI 中介層：從 traceparent 標頭接續追蹤，為每個請求建立伺服器端 span"""
+    
+    def __init__(self, app, excluded_paths=("/health", "/metrics")):
+        self.app = app
+        self.excluded_paths = frozenset(excluded_paths)
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
+        
+        parent = None
+        for key, value in scope["headers"]:
+            if key == b"traceparent":
+                parent = parse_traceparent(value.decode("latin-1"))
+                break
+        
+        attributes = {"http.method": scope["method"], "http.target": scope["path"]}
+        with start_span(f"{scope['method']} {scope['path']}", parent, SpanKind.SERVER, attributes) as span:
+            async def send_with_status(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.set_error(f"HTTP {message['status']}")
+                await send(message)
+            
+            await self.app(scope, receive, send_with_status)
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_span(span: Span) -> Dict[str, Any]:
+    encoded = {
+        "traceId": span.context.trace_id,
+        "spanId": span.context.span_id,
+        "name": span.name,
+        "kind": int(span.kind),
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": [
+            {"key": key, "value": _otlp_value(value)}
+            for key, value in span.attributes.items() if value is not None
+        ],
+        "status": {"code": int(span.status)}
+    }
+    if span.parent_span_id:
+        encoded["parentSpanId"] = span.parent_span_id
+    if span.status_message:
+        encoded["status"]["message"] = span.status_message
+    return encoded
+
+
+def build_otlp_payload(service_name: str, spans: List[Span]) -> Dict[str, Any]:
+    """組成 OTLP ExportTraceServiceRequest（JSON 編碼）"""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+            "scopeSpans": [{
+                "scope": {"name": __name__},
+                "spans": [_otlp_span(span) for span in spans]
+            }]
+        }]
+    }
+
+
+_STOP = object()
+
+
+class OTLPJsonExporter:
+    """OTLP/JSON 匯出器
+    
+    span 結束時只放入佇列，由背景執行緒批次序列化後寫入 JSON Lines 檔案
+    或以 OTLP/HTTP 送到 Collector（{endpoint}/v1/traces）；佇列滿時丟棄，不阻擋請求。
+    """
+    
+    def __init__(self, service_name: str, file_path: Optional[str] = None, endpoint: Optional[str] = None,
+                 batch_size: int = 256, flush_seconds: float = 2.0, max_queue_size: int = 10000):
+        self.service_name = service_name
+        self.file_path = file_path
+        self.endpoint = endpoint.rstrip("/") + "/v1/traces" if endpoint else None
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.dropped = 0
+        self.logger = structlog.get_logger(__name__)
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue_size)
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._http_client = None
+        if self.file_path:
+            Path(self.file_path).parent.mkdir(parents=True, exist_ok=True)
+    
+    def start(self):
+        self._thread.start()
+    
+    def export(self, span: Span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+    
+    def shutdown(self, timeout: float = 5.0):
+        """寫出剩餘的 span 並停止背景執行緒"""
+        if not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        if self._http_client is not None:
+            self._http_client.close()
+    
+    def _run(self):
+        batch: List[Span] = []
+        deadline = time.monotonic() + self.flush_seconds
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+            
+            if item is not None and item is not _STOP:
+                batch.append(item)
+            if batch and (item is None or item is _STOP or len(batch) >= self.batch_size):
+                self._flush(batch)
+                batch = []
+            if item is _STOP:
+                return
+            if item is None:
+                deadline = time.monotonic() + self.flush_seconds
+    
+    def _flush(self, spans: List[Span]):
+        payload = build_otlp_payload(self.service_name, spans)
+        try:
+            if self.file_path:
+                with open(self.file_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(payload, ensure_ascii=False) + "\n")
+            if self.endpoint:
+                if self._http_client is None:
+                    import httpx
+                    self._http_client = httpx.Client(timeout=5.0)
+                response = self._http_client.post(self.endpoint, json=payload)
+                response.raise_for_status()
+        except Exception as e:
+            self.logger.warning("追蹤資料匯出失敗", spans=len(spans), error=str(e))
+
+
+_exporter: Optional[OTLPJsonExporter] = None
+
+
+def setup_tracing(service_name: str):
+    """依設定啟動追蹤匯出（TRACING_EXPORTER=none 時只傳遞上下文，不匯出）"""
+    global _exporter
+    from .config import settings
+    
+    if _exporter is not None or settings.tracing_exporter == "none":
+        return
+    _exporter = OTLPJsonExporter(
+        service_name,
+        file_path=settings.tracing_file if settings.tracing_exporter == "file" else None,
+        endpoint=settings.otlp_endpoint if settings.tracing_exporter == "otlp" else None,
+        flush_seconds=settings.tracing_flush_seconds
+    )
+    _exporter.start()
+
+
+def shutdown_tracing():
+    """停止追蹤匯出"""
+    global _exporter
+    if _exporter is not None:
+        _exporter.shutdown()
+        _exporter = None
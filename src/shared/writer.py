@@ -0,0 +1,140 @@
+"""
+資料庫單一寫入模組
+所有寫入操作排入佇列，由專用執行緒批次執行並合併提交（group commit）
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+
+import structlog
+from sqlalchemy.orm import Session
+
+
+# 寫入操作：接收 Session，回傳結果（不可回傳 ORM 物件，提交後即失效）
+WriteOperation = Callable[[Session], Any]
+
+_STOP = object()
+
+
+class DatabaseWriter:
+    """資料庫寫入執行緒
+    
+    SQLite 同一時間只允許一個寫入者，且每次提交都要 fsync。
+    將寫入集中到單一執行緒後不會再互相等待鎖，
+    提交期間累積的操作會在下一批一起提交，多筆寫入只需一次 fsync。
+    """
+    
+    def __init__(self, session_factory: Callable[[], Session], max_batch_size: int = 256,
+                 linger_seconds: float = 0.0):
+        self.session_factory = session_factory
+        self.max_batch_size = max_batch_size
+        self.linger_seconds = linger_seconds
+        self.logger = structlog.get_logger(__name__)
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+    
+    def start(self):
+        """啟動寫入執行緒"""
+        if self.running:
+            return
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+        self.logger.info("資料庫寫入執行緒已啟動")
+    
+    def stop(self, timeout: float = 10.0):
+        """處理完佇列中的操作後停止寫入執行緒"""
+        if not self.running:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+        self.logger.info("資料庫寫入執行緒已停止")
+    
+    def submit(self, operation: WriteOperation) -> Future:
+        """排入寫入操作，回傳提交後完成的 Future"""
+        future: Future = Future()
+        self._queue.put((operation, future))
+        return future
+    
+    def execute(self, operation: WriteOperation) -> Any:
+        """執行寫入操作並等待提交完成"""
+        if not self.running or threading.current_thread() is self._thread:
+            return self._execute_inline(operation)
+        return self.submit(operation).result()
+    
+    def _execute_inline(self, operation: WriteOperation) -> Any:
+        with self.session_factory() as session:
+            try:
+                result = operation(session)
+                session.commit()
+                return result
+            except Exception:
+                session.rollback()
+                raise
+    
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            
+            batch = [item]
+            if self.linger_seconds > 0:
+                time.sleep(self.linger_seconds)
+            while len(batch) < self.max_batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            
+            self._run_batch([
+                (operation, future) for operation, future in batch
+                if future.set_running_or_notify_cancel()
+            ])
+    
+    def _run_batch(self, batch: List[Tuple[WriteOperation, Future]]):
+        """在同一個交易中執行整批操作；單一操作失敗時只讓該操作失敗，其餘重新執行"""
+        while batch:
+            results = []
+            failed_index = None
+            
+            with self.session_factory() as session:
+                for index, (operation, future) in enumerate(batch):
+                    try:
+                        results.append(operation(session))
+                        session.flush()
+                    except Exception as e:
+                        session.rollback()
+                        future.set_exception(e)
+                        failed_index = index
+                        break
+                
+                if failed_index is None:
+                    try:
+                        session.commit()
+                    except Exception as e:
+                        session.rollback()
+                        self.logger.error("批次提交失敗", batch_size=len(batch), error=str(e))
+                        for _, future in batch:
+                            future.set_exception(e)
+                        return
+            
+            if failed_index is not None:
+                batch = batch[:failed_index] + batch[failed_index + 1:]
+                continue
+            
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+            return
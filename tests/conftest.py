@@ -0,0 +1,10 @@
+"""
+測試共用設定
+日誌寫到暫存目錄，避免測試啟動服務時在工作目錄產生 ./logs/mcp_server.log
+"""
+
+import os
+import tempfile
+
+# 必須在匯入 src.shared.config 之前設定（settings 於匯入時讀取環境變數）
+os.environ.setdefault("LOG_FILE", os.path.join(tempfile.mkdtemp(prefix="mcp-test-logs-"), "mcp_server.log"))
@@ -0,0 +1,98 @@
+"""
+通知封存測試
+"""
+
+import pytest
+from datetime import datetime
+
+from src.shared.archive import ArchiveStore, NotificationArchiver, partition_for
+from src.shared.database import DatabaseManager, LeaseRepository, NotificationRepository, NotificationTable
+from src.shared.models import Notification, NotificationStatus, NotificationType
+
+
+@pytest.fixture
+def db_manager(tmp_path):
+    """使用暫存 SQLite 檔案的資料庫管理器"""
+    manager = DatabaseManager(f"sqlite:///{tmp_path / 'test.db'}")
+    manager.create_tables()
+    return manager
+
+
+def create(repo, db_manager, title, status, created_at):
+    notification_id = repo.create_notification(Notification(
+        type=NotificationType.STATUS,
+        title=title,
+        content="進度更新"
+    ))
+    repo.transition_status(notification_id, status)
+    with db_manager.get_session() as session:
+        session.query(NotificationTable).filter(NotificationTable.id == notification_id).update(
+            {NotificationTable.created_at: created_at}
+        )
+        session.commit()
+    return notification_id
+
+
+class TestNotificationArchiver:
+    """通知封存工作測試"""
+    
+    def test_archives_old_terminal_notifications(self, db_manager, tmp_path):
+        """測試只封存超過保留天數的終止狀態通知，封存後仍可讀取"""
+        store = ArchiveStore(str(tmp_path / "archive"))
+        repo = NotificationRepository(db_manager, archive_store=store)
+        now = datetime(2026, 3, 15)
+        
+        old_ids = [
+            create(repo, db_manager, f"舊通知 {index}", NotificationStatus.SENT, datetime(2026, 1, 10 + index))
+            for index in range(5)
+        ]
+        pending_id = create(repo, db_manager, "待發送", NotificationStatus.PENDING, datetime(2026, 1, 1))
+        recent_id = create(repo, db_manager, "近期", NotificationStatus.SENT, datetime(2026, 3, 10))
+        
+        archiver = NotificationArchiver(repo, store, retention_days=30, chunk_size=2, chunk_pause_seconds=0)
+        assert archiver.run_once(now) == 5
+        assert archiver.run_once(now) == 0
+        
+        with db_manager.get_session() as session:
+            remaining = {row[0] for row in session.query(NotificationTable.id)}
+        assert remaining == {pending_id, recent_id}
+        assert store.path_for(partition_for(datetime(2026, 1, 1))).exists()
+        
+        archived = repo.get_notification(old_ids[0])
+        assert archived.title == "舊通知 0"
+        assert archived.status == NotificationStatus.SENT.value
+        assert repo.get_notification("missing") is None
+    
+    def test_archives_delivered_notifications(self, db_manager, tmp_path):
+        """測試已送達但未讀取或回覆的通知也會封存"""
+        store = ArchiveStore(str(tmp_path / "archive"))
+        repo = NotificationRepository(db_manager, archive_store=store)
+        delivered_id = create(repo, db_manager, "已送達", NotificationStatus.DELIVERED, datetime(2026, 1, 5))
+        
+        archiver = NotificationArchiver(repo, store, retention_days=30, chunk_size=10, chunk_pause_seconds=0)
+        assert archiver.run_once(datetime(2026, 3, 15)) == 1
+        assert repo.get_notification(delivered_id).status == NotificationStatus.DELIVERED.value
+
+
+
+class TestLeaseRepository:
+    """背景工作租約測試"""
+    
+    def test_single_holder_until_expired(self, db_manager):
+        """測試同一時間只有一個副本持有封存租約，到期或釋放後由其他副本接手"""
+        leases = LeaseRepository(db_manager)
+        now = datetime(2026, 3, 15)
+        
+        assert leases.try_acquire("archiver", "replica-a", 60, now)
+        assert not leases.try_acquire("archiver", "replica-b", 60, now)
+        assert leases.try_acquire("archiver", "replica-a", 60, now)  # 持有者續約
+        
+        assert leases.try_acquire("archiver", "replica-b", 60, datetime(2026, 3, 15, 0, 2))
+        assert not leases.try_acquire("archiver", "replica-a", 60, datetime(2026, 3, 15, 0, 2))
+        
+        assert leases.release("archiver", "replica-b")
+        assert leases.try_acquire("archiver", "replica-a", 60, datetime(2026, 3, 15, 0, 2))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
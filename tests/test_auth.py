@@ -0,0 +1,179 @@
+"""
+API 金鑰驗證測試
+"""
+
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.mcp_server.auth import ADMIN_PRINCIPAL, Authenticator, CredentialCache, Principal, UsageLimiter, generate_api_key, hash_api_key
+from src.shared.database import ApiKeyRepository, DatabaseManager
+from src.shared.models import ApiKey
+
+
+@pytest.fixture
+def frequent_switches():
+    """縮短執行緒切換間隔，讓競爭條件容易重現"""
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+class CountingRepository:
+    """記錄查詢次數的 API 金鑰資料存取物件"""
+    
+    def __init__(self, repo):
+        self.repo = repo
+        self.lookups = 0
+    
+    def get_api_key_by_hash(self, key_hash):
+        self.lookups += 1
+        return self.repo.get_api_key_by_hash(key_hash)
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """使用暫存 SQLite 檔案的 API 金鑰資料存取物件"""
+    manager = DatabaseManager(f"sqlite:///{tmp_path / 'test.db'}")
+    manager.create_tables()
+    return ApiKeyRepository(manager)
+
+
+def create_key(repo, **fields):
+    raw_key = generate_api_key()
+    api_key = repo.create_api_key(
+        ApiKey(name="agent", key_prefix=raw_key[:12], **fields), hash_api_key(raw_key)
+    )
+    return raw_key, api_key
+
+
+class TestAuthenticator:
+    """憑證驗證測試"""
+    
+    def test_admin_key_and_cached_api_key(self, repo):
+        """測試全域金鑰為管理員，資料庫金鑰驗證後快取，不再查詢資料庫"""
+        counting = CountingRepository(repo)
+        authenticator = Authenticator(counting, admin_api_key="root", jwt_secret_key="secret")
+        raw_key, api_key = create_key(repo, project_id="p1")
+        
+        assert authenticator.authenticate("root").is_admin
+        
+        principal = authenticator.authenticate(raw_key)
+        assert principal.key_id == api_key.id
+        assert principal.can_access_project("p1") and not principal.can_access_project("p2")
+        assert authenticator.cached(raw_key) == (True, principal)
+        assert counting.lookups == 1
+        
+        assert authenticator.authenticate("mcp_unknown") is None
+        assert authenticator.cached("mcp_unknown") == (True, None)  # 無效金鑰也會快取
+    
+    def test_revoked_key_is_rejected_after_invalidate(self, repo):
+        """測試撤銷金鑰並清除快取後無法再使用"""
+        authenticator = Authenticator(repo, admin_api_key="root", jwt_secret_key="secret")
+        raw_key, api_key = create_key(repo)
+        assert authenticator.authenticate(raw_key) is not None
+        
+        key_hash = repo.revoke_api_key(api_key.id)
+        authenticator.invalidate(key_hash)
+        
+        assert authenticator.authenticate(raw_key) is None
+        assert repo.revoke_api_key("missing") is None
+    
+    def test_issued_jwt_carries_principal(self, repo):
+        """測試換發的 JWT 保留專案與限制，且簽章錯誤或過期的權杖無效"""
+        authenticator = Authenticator(repo, admin_api_key="root", jwt_secret_key="secret")
+        _, api_key = create_key(repo, project_id="p1", rate_limit_per_minute=10)
+        principal = Principal(api_key.id, "agent", project_id="p1", rate_limit_per_minute=10)
+        token, _ = authenticator.issue_token(principal, expires_minutes=5)
+        
+        verified = authenticator.authenticate(token)
+        assert (verified.key_id, verified.project_id, verified.rate_limit_per_minute) == (api_key.id, "p1", 10)
+        
+        other = Authenticator(repo, admin_api_key="root", jwt_secret_key="other")
+        assert other.authenticate(token) is None
+        expired, _ = authenticator.issue_token(principal, expires_minutes=-1)
+        assert authenticator.authenticate(expired) is None
+    
+    def test_jwt_rejected_after_key_revoked(self, repo):
+        """測試撤銷金鑰後，由該金鑰換發且仍未到期的 JWT 也無法使用"""
+        authenticator = Authenticator(repo, admin_api_key="root", jwt_secret_key="secret")
+        raw_key, api_key = create_key(repo)
+        token, _ = authenticator.issue_token(authenticator.authenticate(raw_key), expires_minutes=60)
+        assert authenticator.authenticate(token) is not None
+        
+        key_hash = repo.revoke_api_key(api_key.id)
+        authenticator.invalidate(key_hash, api_key.id)
+        assert authenticator.authenticate(token) is None  # 本副本快取中的 JWT 立即失效
+        
+        # 其他副本的快取沒有這把金鑰時，驗證 JWT 會查到撤銷狀態
+        replica = Authenticator(repo, admin_api_key="root", jwt_secret_key="secret")
+        assert replica.authenticate(token) is None
+        assert replica.authenticate(authenticator.issue_token(ADMIN_PRINCIPAL, expires_minutes=5)[0]).is_admin
+
+
+class TestUsageLimiter:
+    """請求頻率與配額測試"""
+    
+    def test_rate_limit_per_minute(self):
+        """測試每分鐘上限與下一分鐘重置"""
+        limiter = UsageLimiter()
+        principal = Principal("k1", "agent", rate_limit_per_minute=2)
+        now = 120.0
+        
+        assert limiter.check(principal, now) is None
+        assert limiter.check(principal, now + 1) is None
+        assert limiter.check(principal, now + 10) == pytest.approx(50)
+        assert limiter.check(principal, now + 60) is None
+    
+    def test_daily_quota_and_unlimited_keys(self):
+        """測試每日配額，沒有設定限制的金鑰不計數"""
+        limiter = UsageLimiter()
+        principal = Principal("k1", "agent", daily_quota=1)
+        now = 100 * 86400 + 3600.0
+        
+        assert limiter.check(principal, now) is None
+        assert limiter.check(principal, now + 61) > 0
+        assert limiter.check(Principal("k2", "admin", is_admin=True), now) is None
+    
+    def test_concurrent_checks_do_not_exceed_limit(self, frequent_switches):
+        """測試多個執行緒同時檢查時，放行的請求數剛好等於上限"""
+        limiter = UsageLimiter()
+        principal = Principal("k1", "agent", rate_limit_per_minute=2000)
+        barrier = threading.Barrier(8)
+        
+        def worker(_):
+            barrier.wait()
+            return sum(limiter.check(principal, 120.0) is None for _ in range(500))
+        
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            assert sum(pool.map(worker, range(8))) == 2000
+
+
+class TestCredentialCache:
+    """憑證快取測試"""
+    
+    def test_concurrent_access(self, frequent_switches):
+        """測試多個執行緒同時讀寫、過期與移除時不會拋出例外，容量維持在上限內"""
+        cache = CredentialCache(max_size=50, ttl_seconds=60)
+        barrier = threading.Barrier(8)
+        
+        def worker(seed):
+            barrier.wait()
+            for i in range(20000):
+                key = f"k{(seed * 7 + i) % 80}"
+                cache.put(key, seed, ttl_seconds=0.5, now=float(i))
+                cache.get(key, now=float(i + 1))  # 讀取時可能同時有其他執行緒讓它過期或移除
+                if i % 3 == 0:
+                    cache.discard(key)
+            return True
+        
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            assert all(pool.map(worker, range(8)))
+        assert len(cache) <= 50
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,131 @@
+"""
+大型內容儲存與附件測試
+"""
+
+import hashlib
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from src.discord_bot.attachments import download_blob, fits_in_pages, split_pages
+from src.mcp_server import main
+from src.mcp_server.attachments import INLINE_CONTENT_LIMIT, resolve_attachment, spill_content
+from src.mcp_server.auth import Principal
+from src.shared.blobs import BlobStore, BlobTooLargeError
+from src.shared.database import BlobOwnerRepository, DatabaseManager
+
+
+@pytest.fixture
+def store(tmp_path):
+    """使用暫存目錄的內容定址儲存"""
+    return BlobStore(str(tmp_path / "blobs"), max_bytes=1024 * 1024)
+
+
+class TestBlobStore:
+    """內容定址儲存測試"""
+    
+    def test_streamed_content_is_deduplicated(self, store):
+        """測試分塊寫入以 SHA-256 命名，相同內容只儲存一份"""
+        data = b"line\n" * 50000
+        writer = store.writer()
+        for start in range(0, len(data), 4096):
+            writer.write(data[start:start + 4096])
+        info = writer.commit()
+        
+        assert info.blob_id == hashlib.sha256(data).hexdigest()
+        assert store.put(data) == info
+        assert b"".join(store.iter_chunks(info.blob_id)) == data
+        assert list(store.tmp_dir.iterdir()) == []
+        assert store.size("f" * 64) is None
+    
+    def test_rejects_oversized_content(self, store):
+        """測試超過大小上限時丟棄暫存檔"""
+        writer = store.writer()
+        with pytest.raises(BlobTooLargeError):
+            writer.write(b"x" * (store.max_bytes + 1))
+        assert list(store.tmp_dir.iterdir()) == []
+
+
+class TestNotificationAttachments:
+    """通知附件測試"""
+    
+    def test_long_content_spills_to_attachment(self, store):
+        """測試超過通知上限的內容轉存為附件，通知只保留預覽"""
+        content = "錯誤日誌\n" * 1000
+        preview, attachment = spill_content(content, store)
+        
+        assert len(preview) < INLINE_CONTENT_LIMIT
+        assert b"".join(store.iter_chunks(attachment["blob_id"])).decode("utf-8") == content
+        assert spill_content("短內容", store) == ("短內容", None)
+    
+    def test_resolve_uploaded_attachment(self, store):
+        """測試引用已上傳的內容時補上大小，並拒絕不存在的內容"""
+        info = store.put(b"diff --git a/x b/x")
+        attachment = resolve_attachment({"blob_id": info.blob_id, "filename": "../x.diff"}, store)
+        
+        assert attachment["size"] == info.size
+        assert attachment["filename"] == ".._x.diff"
+        with pytest.raises(ValueError):
+            resolve_attachment({"blob_id": "0" * 64}, store)
+
+
+class TestBlobAccess:
+    """內容存取權限測試"""
+    
+    def test_project_keys_only_download_own_blobs(self, store, tmp_path, monkeypatch):
+        """測試專案金鑰只能下載自己專案的內容，其他專案的內容與不存在的內容同樣回傳 404"""
+        manager = DatabaseManager(f"sqlite:///{tmp_path / 'test.db'}")
+        manager.create_tables()
+        owners = BlobOwnerRepository(manager)
+        monkeypatch.setattr(main, "get_blob_store", lambda: store)
+        monkeypatch.setattr(main, "get_blob_owner_repo", lambda: owners)
+        caller = {"principal": Principal("k1", "agent", project_id="p1")}
+        monkeypatch.setitem(main.app.dependency_overrides, main.verify_api_key, lambda: caller["principal"])
+        client = TestClient(main.app)
+        
+        blob_id = client.put("/api/v1/blobs", content=b"secret diff").json()["data"]["blob_id"]
+        assert client.get(f"/api/v1/blobs/{blob_id}").content == b"secret diff"
+        
+        caller["principal"] = Principal("k2", "other", project_id="p2")
+        denied = client.get(f"/api/v1/blobs/{blob_id}")
+        missing = client.get(f"/api/v1/blobs/{'0' * 64}")
+        assert denied.status_code == missing.status_code == 404
+        assert denied.json() == missing.json()
+        
+        # 上傳相同內容的專案也成為擁有者，未綁定專案的金鑰（機器人）可下載所有內容
+        assert client.put("/api/v1/blobs", content=b"secret diff").json()["data"]["blob_id"] == blob_id
+        assert client.get(f"/api/v1/blobs/{blob_id}").status_code == 200
+        caller["principal"] = Principal("bot", "bot")
+        assert client.get(f"/api/v1/blobs/{store.put(b'spilled').blob_id}").status_code == 200
+        manager.stop_writer()
+
+
+class TestBotAttachments:
+    """機器人附件送出測試"""
+    
+    def test_split_pages_prefers_line_breaks(self):
+        """測試分頁不超過上限並盡量在換行處切開"""
+        text = "\n".join(f"line {index:03d}" for index in range(100))
+        pages = split_pages(text, 100)
+        
+        assert all(len(page) <= 100 for page in pages)
+        assert all(page.startswith("line") for page in pages)
+        assert "\n".join(pages) == text
+        assert fits_in_pages(1000, "text/plain; charset=utf-8", 100, 3)
+        assert not fits_in_pages(10, "application/octet-stream", 100, 3)
+    
+    @pytest.mark.asyncio
+    async def test_download_streams_to_spooled_file(self):
+        """測試下載內容寫入暫存檔並移到開頭"""
+        data = b"x" * 200000
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, content=data))
+        async with httpx.AsyncClient(transport=transport) as client:
+            spool = await download_blob(client, "http://mcp/api/v1/blobs/abc", {})
+        
+        with spool:
+            assert spool.read() == data
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,141 @@
+"""
+Discord Bot 執行器測試
+"""
+
+import asyncio
+import os
+import signal
+import socket
+
+import httpx
+import pytest
+
+from src.discord_bot import main as bot_main
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def runner(monkeypatch):
+    """以假的 Gateway 連線取代真正的登入"""
+    port = free_port()
+    monkeypatch.setattr(bot_main.settings, "discord_bot_api_host", "127.0.0.1")
+    monkeypatch.setattr(bot_main.settings, "discord_bot_api_port", port)
+    
+    closed = asyncio.Event()
+    
+    async def fake_start(token):
+        await closed.wait()
+    
+    async def fake_close():
+        closed.set()
+    
+    monkeypatch.setattr(bot_main.bot, "start", fake_start)
+    monkeypatch.setattr(bot_main.bot, "close", fake_close)
+    monkeypatch.setattr(bot_main.bot, "is_closed", closed.is_set)
+    return port, closed
+
+
+class TestStartBot:
+    """API 伺服器與 Gateway 共用事件迴圈測試"""
+    
+    @pytest.mark.asyncio
+    async def test_serves_api_and_shuts_down_on_signal(self, runner):
+        """測試 API 伺服器與機器人同時執行，收到 SIGTERM 後一起關閉"""
+        port, closed = runner
+        task = asyncio.create_task(bot_main.start_bot())
+        
+        async with httpx.AsyncClient() as client:
+            for _ in range(100):
+                try:
+                    response = await client.get(f"http://127.0.0.1:{port}/health")
+                    break
+                except httpx.ConnectError:
+                    await asyncio.sleep(0.05)
+            assert response.status_code == 200
+        
+        os.kill(os.getpid(), signal.SIGTERM)
+        await asyncio.wait_for(task, timeout=5)
+        assert closed.is_set()
+    
+    @pytest.mark.asyncio
+    async def test_gateway_failure_stops_api(self, runner, monkeypatch):
+        """測試 Gateway 連線失敗時停止 API 伺服器並回報錯誤"""
+        async def failing_start(token):
+            await asyncio.sleep(0.1)
+            raise RuntimeError("登入失敗")
+        
+        monkeypatch.setattr(bot_main.bot, "start", failing_start)
+        
+        with pytest.raises(RuntimeError):
+            await asyncio.wait_for(bot_main.start_bot(), timeout=5)
+
+
+
+class TestDeliveryDedup:
+    """通知重送去重測試"""
+    
+    @pytest.mark.asyncio
+    async def test_redelivered_notification_is_not_sent_twice(self, monkeypatch):
+        """測試 MCP Server 重送同一通知時只發送一次，並回傳原本的訊息 ID"""
+        sent = []
+        
+        class FakeMessage:
+            id = 42
+        
+        class FakeChannel:
+            id = 1
+            
+            async def send(self, embed, view=None):
+                sent.append(embed)
+                return FakeMessage()
+        
+        monkeypatch.setattr(bot_main.bot, "get_notification_channel", lambda guild_id=None: FakeChannel())
+        monkeypatch.setattr(bot_main.bot, "delivered_notifications", bot_main.OrderedDict())
+        data = {"notification_id": "n1", "type": "status", "title": "完成", "content": "內容", "priority": "low"}
+        
+        first = await bot_main.receive_notification(data, token="w")
+        second = await bot_main.receive_notification(data, token="w")
+        
+        assert len(sent) == 1
+        assert first["duplicate"] is False
+        assert second == {"success": True, "message": "通知已送達", "duplicate": True, "message_id": "42"}
+
+
+
+class TestHealthProbe:
+    """MCP Server 自適應健康探測測試"""
+    
+    @pytest.mark.asyncio
+    async def test_probe_interval_adapts_to_health(self, monkeypatch):
+        """測試正常時拉長間隔、失敗時回到最短間隔，最近有往來時不探測"""
+        probes = []
+        results = [False, True]
+        
+        async def fake_probe():
+            probes.append(True)
+            return results.pop(0)
+        
+        bot = bot_main.bot
+        monkeypatch.setattr(bot, "probe_mcp_server", fake_probe)
+        monkeypatch.setattr(bot, "health_interval", bot_main.AdaptiveInterval(15, 600, initial_seconds=60))
+        monkeypatch.setattr(bot, "last_mcp_contact", 0.0)
+        monkeypatch.setattr(bot, "mcp_healthy", None)
+        
+        await bot.check_mcp_server.coro(bot)
+        assert (bot.mcp_healthy, bot.health_interval.current) == (False, 15)
+        
+        await bot.check_mcp_server.coro(bot)
+        assert (bot.mcp_healthy, bot.health_interval.current) == (True, 30)
+        
+        await bot.check_mcp_server.coro(bot)  # 剛探測成功，不再呼叫
+        assert len(probes) == 2
+        assert bot.health_interval.current == 60
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,246 @@
+"""
+資料庫存取測試
+"""
+
+import pytest
+from datetime import datetime, timedelta
+
+from src.shared.database import (
+    DatabaseManager, NotificationRepository, NotificationOutboxTable, NotificationTable, UserPreferencesRepository,
+    DuplicateNotificationError
+)
+from src.shared.models import (
+    Notification, NotificationResponse, NotificationType, NotificationStatus, Priority, UserPreferences
+)
+
+
+@pytest.fixture
+def db_manager(tmp_path):
+    """使用暫存 SQLite 檔案的資料庫管理器"""
+    manager = DatabaseManager(f"sqlite:///{tmp_path / 'test.db'}")
+    manager.create_tables()
+    return manager
+
+
+class TestNotificationRepository:
+    """通知資料存取測試"""
+    
+    def test_create_and_update_notification(self, db_manager):
+        """測試建立通知與更新狀態"""
+        repo = NotificationRepository(db_manager)
+        notification_id = repo.create_notification(Notification(
+            type=NotificationType.STATUS,
+            title="狀態更新",
+            content="完成 50%",
+            priority=Priority.LOW,
+            metadata={"step": 1}
+        ))
+        
+        assert [n.id for n in repo.get_pending_notifications()] == [notification_id]
+        assert repo.transition_status(notification_id, NotificationStatus.SENT)
+        
+        notification = repo.get_notification(notification_id)
+        assert notification.status == NotificationStatus.SENT
+        assert notification.sent_at is not None
+        assert notification.metadata == {"step": 1}
+        assert repo.get_pending_notifications() == []
+    
+    def test_duplicate_dedup_key_rejected(self, db_manager):
+        """測試去重鍵唯一索引"""
+        repo = NotificationRepository(db_manager)
+        notification = Notification(type=NotificationType.STATUS, title="標題", content="內容")
+        
+        notification_id = repo.create_notification(notification, dedup_key="idem:abc")
+        
+        with pytest.raises(DuplicateNotificationError) as exc_info:
+            repo.create_notification(notification, dedup_key="idem:abc")
+        assert exc_info.value.notification_id == notification_id
+        assert len(repo.get_pending_notifications()) == 1
+    
+    def test_scheduled_notifications_not_pending_until_due(self, db_manager):
+        """測試排程通知到期前不會被取出"""
+        repo = NotificationRepository(db_manager)
+        now = datetime.utcnow()
+        notification_id = repo.create_notification(Notification(
+            type=NotificationType.QUESTION,
+            title="提醒",
+            content="記得檢查部署",
+            deliver_at=now + timedelta(minutes=30)
+        ))
+        
+        assert repo.get_pending_notifications(now) == []
+        assert repo.get_scheduled_notifications(now) == [(notification_id, now + timedelta(minutes=30))]
+        assert [n.id for n in repo.get_pending_notifications(now + timedelta(minutes=30))] == [notification_id]
+
+    
+    def test_replicas_claim_disjoint_notifications(self, db_manager):
+        """測試多個副本認領的通知不重複，租約過期後可被接手"""
+        repo = NotificationRepository(db_manager)
+        ids = [
+            repo.create_notification(Notification(type=NotificationType.STATUS, title=f"通知 {i}", content="內容"))
+            for i in range(5)
+        ]
+        now = datetime.utcnow()
+        
+        first = repo.claim_pending_notifications("replica-a", lease_seconds=60, limit=3, now=now)
+        second = repo.claim_pending_notifications("replica-b", lease_seconds=60, limit=3, now=now)
+        
+        assert [n.id for n in first] == ids[:3]
+        assert [n.id for n in second] == ids[3:]
+        assert repo.claim_pending_notifications("replica-c", lease_seconds=60, now=now) == []
+        
+        # replica-a 當機，租約過期後由其他副本接手
+        later = now + timedelta(seconds=61)
+        assert repo.reap_expired_leases(later) == 5
+        assert [n.id for n in repo.claim_pending_notifications("replica-c", lease_seconds=60, now=later)] == ids
+    
+    def test_sent_notifications_are_not_reclaimed(self, db_manager):
+        """測試已送出的通知不會再被認領，關閉時釋放尚未送出的認領"""
+        repo = NotificationRepository(db_manager)
+        sent_id = repo.create_notification(Notification(type=NotificationType.STATUS, title="a", content="內容"))
+        pending_id = repo.create_notification(Notification(type=NotificationType.STATUS, title="b", content="內容"))
+        
+        repo.claim_pending_notifications("replica-a", lease_seconds=60)
+        repo.transition_status(sent_id, NotificationStatus.SENT)
+        assert repo.release_claims("replica-a") == 1
+        
+        assert [n.id for n in repo.claim_pending_notifications("replica-b", lease_seconds=60)] == [pending_id]
+
+    
+    def test_status_transitions_follow_state_machine(self, db_manager):
+        """測試狀態轉移規則寫在 UPDATE 條件中，批次轉移只計算實際轉移的筆數"""
+        repo = NotificationRepository(db_manager)
+        replied_id, sent_id, pending_id = [
+            repo.create_notification(Notification(type=NotificationType.QUESTION, title=f"問題 {i}", content="內容"))
+            for i in range(3)
+        ]
+        
+        assert repo.transition_statuses([replied_id, sent_id], NotificationStatus.SENT) == 2
+        assert repo.transition_status(replied_id, NotificationStatus.REPLIED)
+        
+        # 已回覆不能回到已發送，已發送不能再標記為失敗
+        assert not repo.transition_status(replied_id, NotificationStatus.SENT)
+        assert not repo.transition_status(sent_id, NotificationStatus.FAILED)
+        assert not repo.transition_status(pending_id, NotificationStatus.READ)
+        assert not repo.transition_status("missing", NotificationStatus.SENT)
+        
+        assert repo.transition_statuses([replied_id, sent_id, pending_id], NotificationStatus.FAILED) == 1
+        
+        statuses = {n.id: n.status for n in repo.list_notifications()}
+        assert statuses == {
+            replied_id: NotificationStatus.REPLIED.value,
+            sent_id: NotificationStatus.SENT.value,
+            pending_id: NotificationStatus.FAILED.value
+        }
+        assert repo.get_notification(replied_id).replied_at is not None
+    
+    def test_receipt_before_sent_sets_sent_at(self, db_manager):
+        """測試送達回執或回覆早於 SENT 轉移時補上 sent_at，遲到的 SENT 被拒絕，已有的 sent_at 不被覆蓋"""
+        repo = NotificationRepository(db_manager)
+        delivered_id, replied_id, sent_id = [
+            repo.create_notification(Notification(type=NotificationType.QUESTION, title=f"問題 {i}", content="內容"))
+            for i in range(3)
+        ]
+        delivered_at = datetime(2026, 3, 1, 12, 0)
+        
+        assert repo.transition_status(delivered_id, NotificationStatus.DELIVERED, now=delivered_at)
+        assert not repo.transition_status(delivered_id, NotificationStatus.SENT)
+        assert repo.get_notification(delivered_id).sent_at == delivered_at
+        
+        assert repo.record_response(NotificationResponse(
+            notification_id=replied_id, response_text="好", user_id="u1", responded_at=delivered_at
+        ))
+        assert repo.get_notification(replied_id).sent_at == delivered_at
+        
+        sent_at = datetime(2026, 3, 1, 11, 0)
+        assert repo.transition_status(sent_id, NotificationStatus.SENT, now=sent_at)
+        assert repo.transition_status(sent_id, NotificationStatus.DELIVERED, now=delivered_at)
+        assert repo.get_notification(sent_id).sent_at == sent_at
+    
+    def test_outbox_holds_only_unfinished_deliveries(self, db_manager):
+        """測試外寄匣與通知同時寫入、完成派送時移除，延後派送時更新可派送時間"""
+        repo = NotificationRepository(db_manager)
+        sent_id = repo.create_notification(Notification(type=NotificationType.STATUS, title="a", content="內容"))
+        deferred_id = repo.create_notification(Notification(type=NotificationType.STATUS, title="b", content="內容"))
+        
+        def outbox_ids():
+            with db_manager.get_session() as session:
+                return [row.notification_id for row in session.query(NotificationOutboxTable).order_by(
+                    NotificationOutboxTable.seq
+                )]
+        
+        assert outbox_ids() == [sent_id, deferred_id]
+        
+        now = datetime.utcnow()
+        assert [n.id for n in repo.claim_pending_notifications("replica-a", 60, now=now)] == [sent_id, deferred_id]
+        repo.transition_status(sent_id, NotificationStatus.SENT)
+        repo.reschedule_notification(deferred_id, now + timedelta(hours=1))
+        assert outbox_ids() == [deferred_id]
+        
+        assert repo.claim_pending_notifications("replica-a", 60, now=now) == []
+        later = now + timedelta(hours=1)
+        assert (repo.count_dispatch_backlog(now), repo.count_dispatch_backlog(later)) == (0, 1)
+        assert [n.id for n in repo.claim_pending_notifications("replica-a", 60, now=later)] == [deferred_id]
+    
+    def test_outbox_backfilled_for_existing_pending_notifications(self, db_manager):
+        """測試升級前建立的待發送通知在新增外寄匣表時補上"""
+        repo = NotificationRepository(db_manager)
+        pending_id = repo.create_notification(Notification(type=NotificationType.STATUS, title="a", content="內容"))
+        sent_id = repo.create_notification(Notification(type=NotificationType.STATUS, title="b", content="內容"))
+        repo.transition_status(sent_id, NotificationStatus.SENT)
+        NotificationOutboxTable.__table__.drop(db_manager.engine)
+        
+        db_manager.create_tables()
+        
+        assert [n.id for n in repo.claim_pending_notifications("replica-a", 60)] == [pending_id]
+    
+    def test_list_notifications_keyset_pagination(self, db_manager):
+        """測試以 (created_at, id) 分頁時，建立時間相同的通知不會重複或遺漏"""
+        repo = NotificationRepository(db_manager)
+        ids = [
+            repo.create_notification(Notification(
+                type=NotificationType.STATUS if i % 2 else NotificationType.QUESTION,
+                title=f"通知 {i}",
+                content="內容",
+                project_id="p1"
+            ))
+            for i in range(5)
+        ]
+        with db_manager.get_session() as session:
+            session.query(NotificationTable).update({NotificationTable.created_at: datetime(2024, 1, 1)})
+            session.commit()
+        
+        pages, after = [], None
+        while True:
+            page = repo.list_notifications(limit=2, project_id="p1", after=after)
+            if not page:
+                break
+            pages.append([n.id for n in page])
+            after = (page[-1].created_at, page[-1].id)
+        
+        assert [len(page) for page in pages] == [2, 2, 1]
+        assert sum(pages, []) == sorted(ids, reverse=True)
+        assert repo.list_notifications(project_id="p2") == []
+        
+        statuses = [n.id for n in repo.iter_notifications(chunk_size=2, type=NotificationType.STATUS)]
+        assert statuses == sorted([ids[1], ids[3]], reverse=True)
+        assert list(repo.iter_notifications(created_before=datetime(2024, 1, 1))) == []
+
+
+class TestUserPreferencesRepository:
+    """使用者偏好設定資料存取測試"""
+    
+    def test_upsert_preferences(self, db_manager):
+        """測試建立與更新偏好設定"""
+        repo = UserPreferencesRepository(db_manager)
+        
+        repo.upsert_preferences(UserPreferences(user_id="u1"))
+        repo.upsert_preferences(UserPreferences(user_id="u1", timezone="Asia/Taipei"))
+        
+        assert repo.get_preferences("u1").timezone == "Asia/Taipei"
+        assert len(repo.get_all_preferences()) == 1
+        assert repo.get_preferences("missing") is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
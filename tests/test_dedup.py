@@ -0,0 +1,87 @@
+"""
+通知去重測試
+"""
+
+import pytest
+
+from src.shared.database import DatabaseManager, DuplicateNotificationError, NotificationRepository
+from src.shared.models import Notification, NotificationType
+from src.mcp_server.dedup import DedupCache, NotificationDeduplicator, content_hash
+
+
+def make_notification(title="建置完成", project_id="p1"):
+    return Notification(type=NotificationType.STATUS, title=title, content="全部測試通過", project_id=project_id)
+
+
+class TestDedupCache:
+    """LRU 快取測試"""
+    
+    def test_ttl_and_capacity(self):
+        """測試存活時間與容量上限"""
+        cache = DedupCache(max_size=2, ttl_seconds=10)
+        
+        cache.put("a", "n1", now=0)
+        cache.put("b", "n2", now=0)
+        assert cache.get("a", now=5) == "n1"
+        
+        # "a" 剛被使用，容量滿時淘汰最久未用的 "b"
+        cache.put("c", "n3", now=5)
+        assert cache.get("b", now=5) is None
+        assert cache.get("a", now=10) is None  # 已過期
+        assert len(cache) == 1
+
+
+class TestNotificationDeduplicator:
+    """通知去重器測試"""
+    
+    def test_content_hash_keys(self):
+        """測試內容雜湊只受 (project_id, type, title, content) 影響"""
+        assert content_hash(make_notification()) == content_hash(make_notification())
+        assert content_hash(make_notification()) != content_hash(make_notification(project_id="p2"))
+        
+        deduplicator = NotificationDeduplicator(window_seconds=300, cache_size=100, idempotency_ttl_seconds=3600)
+        keys = deduplicator.keys_for(make_notification(), now=600)
+        assert keys.reason == "content_hash"
+        assert keys.db_key.endswith(":2")
+        
+        assert deduplicator.lookup(keys) is None
+        deduplicator.remember(keys, "n1")
+        assert deduplicator.lookup(deduplicator.keys_for(make_notification(), now=601)) == "n1"
+    
+    def test_idempotency_key_takes_precedence(self):
+        """測試 Idempotency-Key 優先於內容雜湊"""
+        deduplicator = NotificationDeduplicator(window_seconds=0, cache_size=100, idempotency_ttl_seconds=3600)
+        
+        assert deduplicator.keys_for(make_notification()) is None
+        
+        keys = deduplicator.keys_for(make_notification(), idempotency_key="retry-1")
+        assert keys.reason == "idempotency_key"
+        assert keys.db_key == keys.cache_key == "idem:retry-1"
+    
+    def test_idempotency_key_is_scoped_per_tenant(self, tmp_path):
+        """測試兩個租戶使用相同的 Idempotency-Key 時各自建立通知"""
+        manager = DatabaseManager(f"sqlite:///{tmp_path / 'test.db'}")
+        manager.create_tables()
+        repo = NotificationRepository(manager)
+        deduplicator = NotificationDeduplicator(window_seconds=300, cache_size=100, idempotency_ttl_seconds=3600)
+        
+        created = {}
+        for tenant in ("key-a", "key-b"):
+            notification = make_notification(project_id=tenant)
+            keys = deduplicator.keys_for(notification, idempotency_key="retry-1", scope=tenant)
+            assert deduplicator.lookup(keys) is None
+            created[tenant] = repo.create_notification(notification, dedup_key=keys.db_key)
+            deduplicator.remember(keys, created[tenant])
+        
+        assert created["key-a"] != created["key-b"]
+        assert repo.get_notification(created["key-b"]).project_id == "key-b"
+        
+        # 同一租戶重試仍然去重
+        retry = deduplicator.keys_for(make_notification(project_id="key-a"), idempotency_key="retry-1", scope="key-a")
+        assert deduplicator.lookup(retry) == created["key-a"]
+        with pytest.raises(DuplicateNotificationError):
+            repo.create_notification(make_notification(project_id="key-a"), dedup_key=retry.db_key)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,66 @@
+"""
+通知摘要測試
+"""
+
+import pytest
+
+from src.shared.models import Notification, NotificationType, Priority
+from src.mcp_server.digest import NotificationDigest
+
+
+def make_notification(notification_id, type=NotificationType.STATUS, priority=Priority.LOW, project_id="p1"):
+    return Notification(
+        id=notification_id,
+        type=type,
+        title=f"通知 {notification_id}",
+        content="進度更新",
+        priority=priority,
+        project_id=project_id
+    )
+
+
+class TestNotificationDigest:
+    """通知摘要緩衝區測試"""
+    
+    def test_accepts_low_priority_status_only(self):
+        """測試只合併低優先級的狀態與里程碑通知"""
+        digest = NotificationDigest(window_seconds=30, max_items=10, max_priority="medium")
+        
+        assert digest.accepts(make_notification("a"))
+        assert digest.accepts(make_notification("b", type=NotificationType.MILESTONE, priority=Priority.MEDIUM))
+        assert not digest.accepts(make_notification("c", priority=Priority.HIGH))
+        assert not digest.accepts(make_notification("d", type=NotificationType.QUESTION))
+    
+    def test_groups_by_project_within_window(self):
+        """測試同專案通知在時間窗內合併"""
+        digest = NotificationDigest(window_seconds=30, max_items=10)
+        
+        assert digest.add(make_notification("a"), now=0)
+        assert digest.add(make_notification("b"), now=5)
+        assert digest.add(make_notification("c", project_id="p2"), now=20)
+        assert not digest.add(make_notification("a"), now=6)  # 重複加入
+        
+        assert digest.pop_due(now=10) == []
+        assert digest.seconds_until_due(now=10) == 20
+        
+        batches = digest.pop_due(now=30)
+        assert len(batches) == 1
+        assert batches[0].project_id == "p1"
+        assert [n.id for n in batches[0].notifications] == ["a", "b"]
+        assert "a" not in digest
+        assert "c" in digest
+    
+    def test_full_batch_is_due_immediately(self):
+        """測試批次已滿時立即到期"""
+        digest = NotificationDigest(window_seconds=30, max_items=2)
+        
+        digest.add(make_notification("a"), now=0)
+        digest.add(make_notification("b"), now=0)
+        
+        batches = digest.pop_due(now=0)
+        assert len(batches) == 1
+        assert len(digest) == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
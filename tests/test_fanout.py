@@ -0,0 +1,175 @@
+"""
+通知扇出測試
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import discord
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+
+from src.discord_bot import main as bot_main
+from src.discord_bot.fanout import FanoutSender
+from src.mcp_server.fanout import Destination, FanoutPlanner, group_by_route
+from src.shared.database import DatabaseManager, SubscriptionRepository
+from src.shared.models import DestinationType, Notification, NotificationType, Subscription
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """使用暫存 SQLite 檔案的訂閱資料存取物件"""
+    manager = DatabaseManager(f"sqlite:///{tmp_path / 'test.db'}")
+    manager.create_tables()
+    return SubscriptionRepository(manager)
+
+
+def subscribe(repo, destination_id, project_id=None, notification_type=None, destination_type=DestinationType.CHANNEL):
+    return repo.create_subscription(Subscription(
+        project_id=project_id,
+        notification_type=notification_type,
+        destination_type=destination_type,
+        destination_id=destination_id
+    ))
+
+
+class TestFanoutPlanner:
+    """訂閱展開測試"""
+    
+    def test_merges_wildcard_subscriptions(self, repo):
+        """測試合併精確與萬用訂閱，同一目的地只出現一次，重複訂閱回傳既有訂閱"""
+        first = subscribe(repo, "100", project_id="p1", notification_type=NotificationType.ALERT)
+        assert subscribe(repo, "100", project_id="p1", notification_type=NotificationType.ALERT).id == first.id
+        subscribe(repo, "100", project_id="p1")
+        subscribe(repo, "200", notification_type=NotificationType.ALERT, destination_type=DestinationType.USER)
+        subscribe(repo, "300", project_id="p2")
+        
+        alert = Notification(id="n1", type=NotificationType.ALERT, title="t", content="c", project_id="p1")
+        status = Notification(id="n2", type=NotificationType.STATUS, title="t", content="c", project_id="p1")
+        other = Notification(id="n3", type=NotificationType.MILESTONE, title="t", content="c", project_id="p3")
+        plans = FanoutPlanner(repo).plan([alert, status, other])
+        
+        assert plans["n1"] == [Destination("channel", "100"), Destination("user", "200")]
+        assert plans["n2"] == [Destination("channel", "100")]
+        assert "n3" not in plans  # 沒有訂閱者，沿用預設頻道
+    
+    def test_single_query_for_many_subscribers(self, repo):
+        """測試數百個訂閱者與整批通知只查詢一次資料庫"""
+        for index in range(300):
+            subscribe(repo, str(1000 + index), project_id="p1")
+        notifications = [
+            Notification(id=f"n{index}", type=NotificationType.MILESTONE, title="t", content="c", project_id="p1")
+            for index in range(20)
+        ]
+        
+        statements = []
+        event.listen(repo.db_manager.engine, "before_cursor_execute",
+                     lambda *args: statements.append(args[2]))
+        plans = FanoutPlanner(repo).plan(notifications)
+        
+        assert len(statements) == 1
+        assert len(plans) == 20 and all(len(destinations) == 300 for destinations in plans.values())
+    
+    def test_groups_destinations_by_shard(self):
+        """測試依目的地所屬伺服器分組，私訊送往預設程序"""
+        destinations = [Destination("channel", "1", "g1"), Destination("user", "2"), Destination("channel", "3", "g2")]
+        routes = group_by_route(destinations, lambda guild_id: "http://b" if guild_id == "g2" else "http://a")
+        
+        assert routes == {
+            "http://a": [Destination("channel", "1", "g1"), Destination("user", "2")],
+            "http://b": [Destination("channel", "3", "g2")]
+        }
+
+
+class TestFanoutSender:
+    """扇出發送測試"""
+    
+    @pytest.mark.asyncio
+    async def test_limits_concurrency_and_classifies_errors(self):
+        """測試限制同時發送數量，並區分無法重試與暫時性錯誤"""
+        active = []
+        peak = []
+        
+        async def ok():
+            active.append(1)
+            peak.append(len(active))
+            await asyncio.sleep(0.01)
+            active.pop()
+            return "m"
+        
+        async def forbidden():
+            raise discord.Forbidden(SimpleNamespace(status=403, reason="Forbidden"), "Missing Access")
+        
+        async def unavailable():
+            raise discord.HTTPException(SimpleNamespace(status=503, reason="Unavailable"), "retry")
+        
+        sender = FanoutSender(rate_per_second=100, burst=5, concurrency=3)
+        results = await sender.send_all([(f"channel:{index}", ok) for index in range(10)]
+                                        + [("user:1", forbidden), ("user:2", unavailable)])
+        
+        assert max(peak) == 3
+        assert all(result.delivered for result in results[:10])
+        assert (results[10].delivered, results[10].permanent) == (False, True)
+        assert (results[11].delivered, results[11].permanent) == (False, False)
+    
+    @pytest.mark.asyncio
+    async def test_rate_limits_each_destination(self):
+        """測試同一目的地超過突發量時等待令牌"""
+        sender = FanoutSender(rate_per_second=1000, burst=1)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await sender.wait_turn("channel:1")
+        await sender.wait_turn("channel:2")
+        assert loop.time() - started < 0.05
+        
+        sender.limiter.rate_per_second = 20
+        started = loop.time()
+        await sender.wait_turn("channel:1")
+        assert loop.time() - started >= 0.03
+
+
+class TestBotFanout:
+    """機器人扇出派送測試"""
+    
+    @pytest.mark.asyncio
+    async def test_retry_skips_delivered_destinations(self, monkeypatch):
+        """測試部分目的地暫時失敗時回應 502，重送時只發送尚未送達的目的地"""
+        sent = []
+        failing = {"200"}
+        
+        class FakeTarget:
+            def __init__(self, target_id):
+                self.id = int(target_id)
+            
+            async def send(self, embed, view=None):
+                if str(self.id) in failing:
+                    raise discord.HTTPException(SimpleNamespace(status=500, reason="error"), "boom")
+                sent.append(self.id)
+                return SimpleNamespace(id=self.id * 10)
+        
+        async def fake_resolve(destination):
+            return FakeTarget(destination["id"])
+        
+        bot = bot_main.bot
+        monkeypatch.setattr(bot, "resolve_destination", fake_resolve)
+        monkeypatch.setattr(bot, "delivered_notifications", bot_main.OrderedDict())
+        monkeypatch.setattr(bot, "fanout", FanoutSender(rate_per_second=100, burst=5))
+        data = {
+            "notification_id": "n1", "type": "status", "title": "完成", "content": "內容", "priority": "low",
+            "destinations": [{"type": "channel", "id": "100"}, {"type": "user", "id": "200"}]
+        }
+        
+        with pytest.raises(HTTPException) as error:
+            await bot_main.receive_notification(data, token="w")
+        assert error.value.status_code == 502
+        
+        failing.clear()
+        result = await bot_main.receive_notification(data, token="w")
+        
+        assert sent == [100, 200]
+        assert [delivery["message_id"] for delivery in result["deliveries"]] == ["1000", "2000"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
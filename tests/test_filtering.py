@@ -0,0 +1,119 @@
+"""
+通知過濾引擎測試
+"""
+
+import time
+
+import pytest
+from datetime import datetime
+
+from src.shared.models import Notification, NotificationType, Priority, UserPreferences
+from src.mcp_server.filtering import PreferenceFilter, FilterDecision, CompiledPreferences
+
+
+class FakePreferencesRepo:
+    """記憶體內的偏好設定來源"""
+    
+    def __init__(self, preferences):
+        self.preferences = {p.user_id: p for p in preferences}
+        self.load_count = 0
+        self.version = 0
+    
+    def get_preferences_version(self):
+        return len(self.preferences), self.version
+    
+    def get_all_preferences(self):
+        self.load_count += 1
+        return list(self.preferences.values())
+    
+    def get_preferences(self, user_id):
+        self.load_count += 1
+        return self.preferences.get(user_id)
+
+
+def make_notification(type=NotificationType.MILESTONE, priority=Priority.MEDIUM):
+    return Notification(id="n1", type=type, title="標題", content="內容", priority=priority)
+
+
+class TestCompiledPreferences:
+    """偏好規則編譯測試"""
+    
+    def test_quiet_hours_across_midnight_with_timezone(self):
+        """測試跨午夜的勿擾時段與時區換算"""
+        rule = CompiledPreferences.compile(UserPreferences(
+            user_id="u1", quiet_hours_start="22:00", quiet_hours_end="08:00", timezone="Asia/Taipei"
+        ))
+        
+        # 台北 23:30 = UTC 15:30，勿擾到台北 08:00 = UTC 00:00
+        assert rule.quiet_until(datetime(2024, 1, 15, 15, 30)) == datetime(2024, 1, 16, 0, 0)
+        # 台北 12:00 = UTC 04:00，不在勿擾時段
+        assert rule.quiet_until(datetime(2024, 1, 15, 4, 0)) is None
+
+
+class TestPreferenceFilter:
+    """通知過濾引擎測試"""
+    
+    def test_no_preferences_delivers_everything(self):
+        """測試沒有偏好設定時全部派送"""
+        engine = PreferenceFilter(FakePreferencesRepo([]))
+        
+        assert engine.evaluate(make_notification()) == (FilterDecision.DELIVER, None)
+    
+    def test_type_and_priority_filter(self):
+        """測試通知類型與優先級過濾"""
+        engine = PreferenceFilter(FakePreferencesRepo([UserPreferences(
+            user_id="u1", notification_types=[NotificationType.QUESTION],
+            priority_filter=Priority.HIGH, quiet_hours_start="00:00", quiet_hours_end="00:00"
+        )]))
+        
+        assert engine.evaluate(make_notification())[0] == FilterDecision.DROP
+        assert engine.evaluate(make_notification(type=NotificationType.QUESTION))[0] == FilterDecision.DROP
+        assert engine.evaluate(make_notification(
+            type=NotificationType.QUESTION, priority=Priority.HIGH
+        ))[0] == FilterDecision.DELIVER
+    
+    def test_quiet_hours_defer(self):
+        """測試勿擾時段延後派送"""
+        engine = PreferenceFilter(FakePreferencesRepo([UserPreferences(user_id="u1")]))
+        now = datetime(2024, 1, 15, 23, 0)
+        
+        decision, release_at = engine.evaluate(make_notification(), now=now)
+        assert decision == FilterDecision.DEFER
+        assert release_at == datetime(2024, 1, 16, 8, 0)
+        
+        # 緊急通知不受勿擾時段限制
+        assert engine.evaluate(make_notification(priority=Priority.URGENT), now=now)[0] == FilterDecision.DELIVER
+        # 勿擾時段結束後重新判斷即可派送
+        assert engine.evaluate(make_notification(), now=release_at)[0] == FilterDecision.DELIVER
+    
+    def test_rules_cached_until_invalidated(self):
+        """測試偏好規則快取與失效"""
+        repo = FakePreferencesRepo([UserPreferences(user_id="u1", quiet_hours_start="00:00", quiet_hours_end="00:00")])
+        engine = PreferenceFilter(repo)
+        
+        for _ in range(100):
+            engine.evaluate(make_notification())
+        assert repo.load_count == 1
+        
+        repo.preferences["u1"] = UserPreferences(user_id="u1", notification_types=[NotificationType.ERROR])
+        engine.invalidate("u1")
+        assert engine.evaluate(make_notification())[0] == FilterDecision.DROP
+        assert repo.load_count == 2
+    
+    def test_reloads_when_updated_elsewhere(self):
+        """測試其他副本更新偏好（沒有呼叫本程序的 invalidate）時，超過檢查間隔後重新載入"""
+        repo = FakePreferencesRepo([UserPreferences(user_id="u1", quiet_hours_start="00:00", quiet_hours_end="00:00")])
+        engine = PreferenceFilter(repo, refresh_seconds=30)
+        assert engine.evaluate(make_notification())[0] == FilterDecision.DELIVER
+        
+        repo.preferences["u1"] = UserPreferences(user_id="u1", notification_types=[NotificationType.ERROR])
+        repo.version += 1
+        assert engine.evaluate(make_notification())[0] == FilterDecision.DELIVER  # 尚未到檢查間隔
+        
+        engine.refresh(now=time.monotonic() + 31)
+        assert engine.evaluate(make_notification())[0] == FilterDecision.DROP
+        assert repo.load_count == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
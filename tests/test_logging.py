@@ -0,0 +1,58 @@
+"""
+日誌管線測試
+"""
+
+import logging
+import queue
+
+import pytest
+import structlog
+
+from src.shared.log_pipeline import EventSampler, NonFormattingQueueHandler
+
+
+class TestEventSampler:
+    """高流量事件取樣測試"""
+    
+    def test_keeps_one_in_n_sampled_events(self):
+        """測試標記取樣的 INFO 事件每 N 筆保留 1 筆"""
+        sampler = EventSampler(rate=0.25)
+        kept = 0
+        for _ in range(20):
+            try:
+                event_dict = sampler(None, "info", {"event": "通知發送成功", "sampled": True})
+                kept += 1
+                assert event_dict["sample_rate"] == 0.25
+                assert "sampled" not in event_dict
+            except structlog.DropEvent:
+                pass
+        assert kept == 5
+    
+    def test_unmarked_and_errors_are_never_sampled(self):
+        """測試未標記的事件與錯誤不取樣"""
+        sampler = EventSampler(rate=0.0)
+        assert sampler(None, "info", {"event": "啟動成功"}) == {"event": "啟動成功"}
+        assert sampler(None, "error", {"event": "失敗", "sampled": True}) == {"event": "失敗"}
+        with pytest.raises(structlog.DropEvent):
+            sampler(None, "info", {"event": "通知發送成功", "sampled": True})
+
+
+class TestNonFormattingQueueHandler:
+    """佇列處理器測試"""
+    
+    def test_record_is_enqueued_unformatted(self):
+        """測試紀錄原樣放入佇列，不在呼叫端格式化"""
+        log_queue = queue.SimpleQueue()
+        handler = NonFormattingQueueHandler(log_queue)
+        event_dict = {"event": "通知建立成功", "notification_id": "n1"}
+        record = logging.LogRecord("test", logging.INFO, __file__, 1, event_dict, None, None)
+        
+        handler.emit(record)
+        
+        queued = log_queue.get_nowait()
+        assert queued is record
+        assert queued.msg is event_dict
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,197 @@
+"""
+MCP JSON-RPC 協定測試
+"""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from src.mcp_server import jsonrpc
+from src.mcp_server.auth import ADMIN_PRINCIPAL, Principal
+from src.mcp_server.jsonrpc import MCPProtocol
+from src.mcp_server.main import NotificationService
+from src.mcp_server.replies import ReplyNotifier
+from src.mcp_server.stdio import run_session
+from src.mcp_server.tools import build_tools
+from src.shared.database import DatabaseManager, ProjectRepository
+from src.shared.models import Project
+
+
+class FakeService:
+    """記錄呼叫的通知服務"""
+    
+    def __init__(self):
+        self.submitted = []
+        self.replied = asyncio.Event()
+    
+    async def submit_notification(self, notification_data, principal, idempotency_key=None):
+        if notification_data["title"] == "busy":
+            raise HTTPException(status_code=429, detail="建立通知的速率過高")
+        self.submitted.append((notification_data, principal, idempotency_key))
+        return {"notification_id": "n1", "message": "通知建立成功，正在處理發送"}
+    
+    async def wait_for_reply(self, notification_id, principal, timeout, on_status=None):
+        await on_status("sent")
+        await on_status("read")
+        await self.replied.wait()
+        return {"notification_id": notification_id, "status": "replied", "replied": True, "response_text": "好"}
+    
+    async def update_work_status(self, status_data, principal):
+        return {"message": "工作狀態更新成功"}
+
+
+@pytest.fixture
+def service():
+    return FakeService()
+
+
+@pytest.fixture
+def protocol(service):
+    return MCPProtocol("test", "1.0.0", build_tools(lambda: service))
+
+
+def request(method, params=None, request_id=1):
+    message = {"jsonrpc": "2.0", "id": request_id, "method": method}
+    if params is not None:
+        message["params"] = params
+    return message
+
+
+class TestProtocol:
+    """協定訊息處理測試"""
+    
+    @pytest.mark.asyncio
+    async def test_initialize_and_list_tools(self, protocol):
+        """測試協定版本協商與工具列表"""
+        result = (await protocol.handle(request("initialize", {"protocolVersion": "2025-03-26"}), None))["result"]
+        assert result["protocolVersion"] == "2025-03-26"
+        assert result["capabilities"] == {"tools": {"listChanged": False}}
+        
+        result = (await protocol.handle(request("initialize", {"protocolVersion": "1999-01-01"}), None))["result"]
+        assert result["protocolVersion"] == jsonrpc.PROTOCOL_VERSIONS[0]
+        
+        tools = (await protocol.handle(request("tools/list"), None))["result"]["tools"]
+        assert [tool["name"] for tool in tools] == ["send_notification", "wait_for_reply", "update_work_status"]
+    
+    @pytest.mark.asyncio
+    async def test_errors_notifications_and_batches(self, protocol):
+        """測試未知方法與工具回覆協定錯誤，通知不回覆，批次只回覆請求"""
+        assert (await protocol.handle(request("resources/list"), None))["error"]["code"] == jsonrpc.METHOD_NOT_FOUND
+        unknown_tool = await protocol.handle(request("tools/call", {"name": "missing"}), None)
+        assert unknown_tool["error"]["code"] == jsonrpc.INVALID_PARAMS
+        assert (await protocol.handle({"id": 1, "method": "ping"}, None))["error"]["code"] == jsonrpc.INVALID_REQUEST
+        
+        assert await protocol.handle({"jsonrpc": "2.0", "method": "notifications/initialized"}, None) is None
+        responses = await protocol.handle_payload([
+            {"jsonrpc": "2.0", "method": "notifications/initialized"},
+            request("ping", request_id=7)
+        ], None)
+        assert responses == [{"jsonrpc": "2.0", "id": 7, "result": {}}]
+        assert not jsonrpc.has_requests([{"jsonrpc": "2.0", "method": "notifications/initialized"}])
+
+
+class TestTools:
+    """工具呼叫測試"""
+    
+    @pytest.mark.asyncio
+    async def test_send_notification_uses_service(self, protocol, service):
+        """測試工具直接呼叫通知服務，選項放入 metadata，服務錯誤轉為 isError 結果"""
+        result = (await protocol.handle(request("tools/call", {"name": "send_notification", "arguments": {
+            "title": "要部署嗎？", "content": "v2.1", "type": "question", "choices": ["是", "否"],
+            "idempotency_key": "k1"
+        }}), ADMIN_PRINCIPAL))["result"]
+        
+        assert result["isError"] is False
+        assert result["structuredContent"]["notification_id"] == "n1"
+        assert jsonrpc.loads(result["content"][0]["text"]) == result["structuredContent"]
+        notification_data, principal, idempotency_key = service.submitted[0]
+        assert notification_data == {"title": "要部署嗎？", "content": "v2.1", "type": "question",
+                                     "metadata": {"choices": ["是", "否"]}}
+        assert (principal, idempotency_key) == (ADMIN_PRINCIPAL, "k1")
+        
+        busy = (await protocol.handle(request("tools/call", {"name": "send_notification", "arguments": {
+            "title": "busy", "content": "x"
+        }}), ADMIN_PRINCIPAL))["result"]
+        assert busy["isError"] is True and "429" in busy["structuredContent"]["error"]
+        
+        invalid = (await protocol.handle(request("tools/call", {"name": "update_work_status", "arguments": {
+            "project_id": "p1", "current_task": "寫測試", "progress": 150
+        }}), ADMIN_PRINCIPAL))["result"]
+        assert invalid["isError"] is True
+    
+    @pytest.mark.asyncio
+    async def test_stdio_streams_progress_without_blocking(self, protocol, service):
+        """測試 stdio 傳輸：等待回覆時串流進度，其他請求不被擋住"""
+        reader = asyncio.StreamReader()
+        written = []
+        session = asyncio.create_task(run_session(protocol, reader, lambda data: written.append(jsonrpc.loads(data))))
+        
+        reader.feed_data(jsonrpc.dumps(request("tools/call", {
+            "name": "wait_for_reply", "arguments": {"notification_id": "n1"}, "_meta": {"progressToken": "t1"}
+        }, request_id=1)) + b"\n")
+        reader.feed_data(b"not json\n" + jsonrpc.dumps(request("ping", request_id=2)) + b"\n")
+        await asyncio.sleep(0.01)
+        
+        assert [message.get("id") for message in written if "id" in message] == [None, 2]
+        progress = [message["params"] for message in written if message.get("method") == "notifications/progress"]
+        assert [(item["progressToken"], item["progress"]) for item in progress] == [("t1", 1), ("t1", 2)]
+        
+        service.replied.set()
+        reader.feed_eof()
+        await session
+        assert written[-1]["id"] == 1
+        assert written[-1]["result"]["structuredContent"]["response_text"] == "好"
+    
+    @pytest.mark.asyncio
+    async def test_update_work_status_persists_project(self, tmp_path):
+        """測試 update_work_status 工具寫入專案狀態，其他專案的金鑰與不存在的專案回傳錯誤"""
+        db = DatabaseManager(f"sqlite:///{tmp_path / 'work.db'}")
+        db.create_tables()
+        project_repo = ProjectRepository(db)
+        project_id = project_repo.create_project(Project(name="demo", metadata={"owner": "ops"}))
+        
+        service = NotificationService.__new__(NotificationService)
+        service.project_repo = project_repo
+        protocol = MCPProtocol("test", "1.0.0", build_tools(lambda: service))
+        
+        def call(arguments, principal):
+            return protocol.handle(request("tools/call", {"name": "update_work_status", "arguments": arguments}),
+                                   principal)
+        
+        owner = Principal(key_id="k1", name="demo", project_id=project_id)
+        result = (await call({"project_id": project_id, "current_task": "寫測試", "progress": 60,
+                              "details": {"branch": "main"}}, owner))["result"]
+        assert result["isError"] is False
+        
+        project = project_repo.get_project(project_id)
+        assert (project.current_task, project.progress) == ("寫測試", 60)
+        assert project.metadata == {"owner": "ops", "branch": "main"}
+        
+        other = (await call({"project_id": project_id, "current_task": "x", "progress": 1},
+                            Principal(key_id="k2", name="other", project_id="other")))["result"]
+        assert other["isError"] is True and "403" in other["structuredContent"]["error"]
+        missing = (await call({"project_id": "missing", "current_task": "x", "progress": 1}, ADMIN_PRINCIPAL))["result"]
+        assert missing["isError"] is True and "404" in missing["structuredContent"]["error"]
+        assert project_repo.get_project(project_id).progress == 60
+        db.stop_writer()
+
+
+class TestReplyNotifier:
+    """回覆通知器測試"""
+    
+    @pytest.mark.asyncio
+    async def test_wakes_waiters_and_cleans_up(self):
+        """測試收到回覆時喚醒所有等待者，結束後不保留事件"""
+        notifier = ReplyNotifier()
+        waiters = [asyncio.create_task(notifier.wait("n1", 5)) for _ in range(2)]
+        await asyncio.sleep(0)
+        
+        notifier.notify("n1")
+        assert await asyncio.gather(*waiters) == [True, True]
+        assert await notifier.wait("n2", 0.01) is False
+        assert len(notifier) == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,65 @@
+"""
+問題選項測試
+"""
+
+from types import SimpleNamespace
+
+import discord
+import pytest
+
+from src.discord_bot.questions import (
+    build_answer_view, build_question_view, find_choice_label, parse_question_custom_id
+)
+
+
+def sent_message(view: discord.ui.View):
+    """模擬送出後由 Discord 回傳的訊息元件"""
+    return SimpleNamespace(components=[discord.ActionRow(row) for row in view.to_components()])
+
+
+class TestQuestionComponents:
+    """問題選項元件測試"""
+    
+    @pytest.mark.asyncio
+    async def test_buttons_round_trip_through_custom_id(self):
+        """測試少量選項使用按鈕，點擊後只靠訊息內容即可取得通知 ID 與選項文字"""
+        view = build_question_view("n1", ["是", "否", " "])
+        
+        assert view.is_finished()  # 不登記到 View 快取
+        buttons = view.children
+        assert [button.label for button in buttons] == ["是", "否"]
+        assert [button.custom_id for button in buttons] == ["mcpq:n1:0", "mcpq:n1:1"]
+        
+        message = sent_message(view)
+        assert parse_question_custom_id("mcpq:n1:1") == ("n1", 1)
+        assert find_choice_label(message, "mcpq:n1:1", 1) == "否"
+        
+        answered = build_answer_view(message, "mcpq:n1:1")
+        assert all(item.disabled for item in answered.children)
+        assert answered.children[1].style == discord.ButtonStyle.success
+        assert not any(item.disabled for item in build_answer_view(message, None).children)
+    
+    @pytest.mark.asyncio
+    async def test_many_choices_use_select_menu(self):
+        """測試超過 5 個選項時使用下拉選單"""
+        choices = [f"選項 {i}" for i in range(8)]
+        view = build_question_view("n2", choices)
+        
+        assert len(view.children) == 1
+        assert isinstance(view.children[0], discord.ui.Select)
+        
+        message = sent_message(view)
+        assert parse_question_custom_id("mcpq:n2", ["6"]) == ("n2", 6)
+        assert find_choice_label(message, "mcpq:n2", 6) == "選項 6"
+    
+    @pytest.mark.asyncio
+    async def test_no_choices(self):
+        """測試沒有選項或選項格式錯誤時不建立元件，非問題元件不解析"""
+        assert build_question_view("n3", None) is None
+        assert build_question_view("n3", "是/否") is None
+        assert parse_question_custom_id("other:n3:0") is None
+        assert parse_question_custom_id("mcpq:n3:x") is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,56 @@
+"""
+流量控制測試
+"""
+
+import pytest
+
+from src.mcp_server.ratelimit import Backpressure
+from src.shared.ratelimit import TokenBucketLimiter
+from src.shared.models import Priority
+
+
+class TestTokenBucketLimiter:
+    """令牌桶測試"""
+    
+    def test_burst_then_refill(self):
+        """測試突發額度用完後回傳等待秒數，並依速率補充"""
+        limiter = TokenBucketLimiter(rate_per_second=2, burst=3)
+        
+        assert [limiter.acquire("k", now=0.0) for _ in range(3)] == [None, None, None]
+        assert limiter.acquire("k", now=0.0) == pytest.approx(0.5)
+        assert limiter.acquire("k", now=0.5) is None
+        assert limiter.acquire("k", now=0.5) == pytest.approx(0.5)
+    
+    def test_keys_are_independent_and_bounded(self):
+        """測試不同鍵各自計算，且只保留最近使用的鍵"""
+        limiter = TokenBucketLimiter(rate_per_second=1, burst=1, max_keys=2)
+        
+        assert limiter.acquire(("key-a", "p1"), now=0.0) is None
+        assert limiter.acquire(("key-a", "p1"), now=0.0) is not None
+        assert limiter.acquire(("key-a", "p2"), now=0.0) is None
+        assert limiter.acquire(("key-b", "p1"), now=0.0) is None
+        assert len(limiter) == 2
+
+
+class TestBackpressure:
+    """派送積壓測試"""
+    
+    def test_admission_by_priority(self):
+        """測試積壓超過門檻時依序拒絕 low 與非 urgent 通知"""
+        backpressure = Backpressure(shed_threshold=10, reject_threshold=20)
+        assert backpressure.admit(Priority.LOW.value)
+        
+        backpressure.update(9)
+        backpressure.record_admitted()
+        assert not backpressure.admit(Priority.LOW.value)
+        assert backpressure.admit(Priority.MEDIUM.value)
+        assert backpressure.should_shed(Priority.LOW.value)
+        assert not backpressure.should_shed(Priority.MEDIUM.value)
+        
+        backpressure.update(20)
+        assert not backpressure.admit(Priority.HIGH.value)
+        assert backpressure.admit(Priority.URGENT.value)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
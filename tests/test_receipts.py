@@ -0,0 +1,63 @@
+"""
+送達與已讀回執測試
+"""
+
+import asyncio
+
+import pytest
+
+from src.discord_bot.receipts import RECEIPT_DELIVERED, RECEIPT_READ, ReceiptBatcher
+
+
+class TestReceiptBatcher:
+    """回執批次器測試"""
+    
+    @pytest.mark.asyncio
+    async def test_debounces_and_deduplicates(self):
+        """測試時間窗內的回執合併成一批，重複的回執只回報一次"""
+        batches = []
+        
+        async def send(receipts):
+            batches.append(receipts)
+            return True
+        
+        batcher = ReceiptBatcher(send, flush_seconds=0.05)
+        assert batcher.add("a", RECEIPT_READ)
+        assert batcher.add("a", RECEIPT_DELIVERED)
+        assert batcher.add("b", RECEIPT_DELIVERED)
+        assert not batcher.add("a", RECEIPT_READ)
+        
+        await asyncio.sleep(0.1)
+        
+        assert batches == [[
+            {"notification_id": "a", "status": "delivered"},
+            {"notification_id": "b", "status": "delivered"},
+            {"notification_id": "a", "status": "read"},
+        ]]
+        assert not batcher.add("a", RECEIPT_READ)  # 已回報
+    
+    @pytest.mark.asyncio
+    async def test_full_batch_sent_immediately_and_failures_retried(self):
+        """測試批次滿時立即送出，送出失敗時保留到下一輪"""
+        results = [False, True]
+        batches = []
+        
+        async def send(receipts):
+            batches.append([receipt["notification_id"] for receipt in receipts])
+            return results.pop(0)
+        
+        batcher = ReceiptBatcher(send, flush_seconds=60, max_batch=2)
+        batcher.add("a", RECEIPT_DELIVERED)
+        batcher.add("b", RECEIPT_DELIVERED)
+        await asyncio.sleep(0)
+        
+        assert batches == [["a", "b"]]
+        assert len(batcher) == 2
+        
+        await batcher.close()
+        assert batches == [["a", "b"], ["a", "b"]]
+        assert len(batcher) == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
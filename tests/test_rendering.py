@@ -0,0 +1,81 @@
+"""
+嵌入訊息渲染測試
+"""
+
+import pytest
+
+from src.discord_bot.rendering import (
+    DIGEST_MAX_FIELDS, EmbedCache, build_digest_embed, build_notification_embed, progress_bar
+)
+
+
+def digest_items(count):
+    return [
+        {"notification_id": f"n{index:07d}", "type": "status", "title": f"步驟 {index}", "content": "完成"}
+        for index in range(count)
+    ]
+
+
+class TestRendering:
+    """嵌入訊息建立測試"""
+    
+    def test_notification_embed(self):
+        """測試通知嵌入訊息的標題、顏色、優先級欄位與頁尾"""
+        embed = build_notification_embed("12345678-abcd", "question", "部署？", "請確認", "urgent")
+        
+        assert embed.title == "❓ 部署？"
+        assert embed.description == "請確認"
+        assert embed.color.value == 0x992d22
+        assert [(field.name, field.value) for field in embed.fields] == [("優先級", "🔴 URGENT")]
+        assert embed.footer.text == "通知 ID: 12345678..."
+        assert embed.timestamp is not None
+    
+    def test_progress_bar_is_clamped(self):
+        """測試進度條每 10% 一格，超出範圍或無效值時截斷"""
+        assert progress_bar(57) == "▓" * 5 + "░" * 5
+        assert progress_bar(150) == "▓" * 10
+        assert progress_bar(None) == progress_bar(-5) == "░" * 10
+    
+    def test_digest_keeps_latest_fields(self):
+        """測試摘要超過欄位上限時只顯示最新的通知"""
+        embed = build_digest_embed("p1", digest_items(DIGEST_MAX_FIELDS + 2))
+        
+        assert len(embed.fields) == DIGEST_MAX_FIELDS
+        assert embed.fields[-1].name == f"📊 步驟 {DIGEST_MAX_FIELDS + 1}"
+        assert "已省略較早的 2 則更新" in embed.description
+    
+    def test_digest_fits_embed_total_limit(self):
+        """測試長內容的摘要總長度不超過 Discord 的 6000 字上限，每則通知仍保留一個欄位"""
+        items = [
+            {"notification_id": f"n{index:07d}", "type": "status", "title": f"步驟 {index}", "content": "x" * 2000}
+            for index in range(20)
+        ]
+        embed = build_digest_embed("p1", items)
+        
+        assert len(embed) <= 6000
+        assert len(embed.fields) == 20
+        assert all(field.value.startswith("x") and field.value.endswith("…") for field in embed.fields)
+
+
+class TestEmbedCache:
+    """渲染快取測試"""
+    
+    def test_cached_template_is_not_mutated(self):
+        """測試相同內容重複使用樣板，修改回傳的嵌入訊息不影響快取"""
+        cache = EmbedCache(max_size=1)
+        build = lambda: {"title": "狀態", "fields": [{"name": "a", "value": "1", "inline": True}]}
+        
+        first = cache.render("key", build)
+        first.add_field(name="b", value="2")
+        first.set_field_at(0, name="changed", value="1")
+        second = cache.render("key", build)
+        
+        assert (cache.hits, cache.misses) == (1, 1)
+        assert [field.name for field in second.fields] == ["a"]
+        
+        cache.render("other", build)
+        assert len(cache) == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,45 @@
+"""
+分片路由測試
+"""
+
+import pytest
+
+from src.mcp_server.routing import ShardRouter, shard_for_guild
+
+
+GUILD_ID = 123456789012345678
+
+
+class TestShardRouter:
+    """機器人分片路由器測試"""
+    
+    def test_shard_formula(self):
+        """測試 Discord 分片公式"""
+        assert shard_for_guild(GUILD_ID, 1) == 0
+        assert shard_for_guild(GUILD_ID, 4) == (GUILD_ID >> 22) % 4
+    
+    def test_routes_to_shard_owner(self):
+        """測試依伺服器所屬分片路由"""
+        router = ShardRouter(["http://bot-0:8080", "http://bot-1:8080"])
+        
+        # 尚未取得分片資訊時送往第一個程序
+        assert router.route(str(GUILD_ID)) == "http://bot-0:8080"
+        
+        router.update("http://bot-0:8080", {"shard_ids": [0, 1], "shard_count": 4})
+        router.update("http://bot-1:8080", {"shard_ids": [2, 3], "shard_count": 4})
+        
+        expected = "http://bot-0:8080" if shard_for_guild(GUILD_ID, 4) < 2 else "http://bot-1:8080"
+        assert router.route(str(GUILD_ID)) == expected
+        assert router.route(None) == "http://bot-0:8080"
+    
+    def test_reshard_resets_map(self):
+        """測試總分片數改變時重建對照表"""
+        router = ShardRouter(["http://bot-0:8080", "http://bot-1:8080"])
+        router.update("http://bot-1:8080", {"shard_ids": [0, 1], "shard_count": 2})
+        router.update("http://bot-0:8080", {"shard_ids": [0], "shard_count": 1})
+        
+        assert router.shard_map == {0: "http://bot-0:8080"}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
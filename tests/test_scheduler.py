@@ -0,0 +1,66 @@
+"""
+排程派送測試
+"""
+
+import pytest
+from datetime import datetime, timedelta, timezone
+
+from src.shared.models import Notification, NotificationType
+from src.mcp_server.scheduler import DeliveryScheduler
+
+
+class TestDeliveryScheduler:
+    """延後派送計時器測試"""
+    
+    def test_pop_due_in_deadline_order(self):
+        """測試依到期時間釋放"""
+        scheduler = DeliveryScheduler()
+        base = datetime(2024, 1, 15, 12, 0)
+        
+        scheduler.schedule("late", base + timedelta(minutes=30))
+        scheduler.schedule("early", base + timedelta(minutes=5))
+        
+        assert scheduler.seconds_until_next(now=base) == 300
+        assert scheduler.pop_due(now=base) == []
+        assert scheduler.pop_due(now=base + timedelta(hours=1)) == ["early", "late"]
+        assert len(scheduler) == 0
+    
+    def test_reschedule_and_cancel(self):
+        """測試改期與取消"""
+        scheduler = DeliveryScheduler()
+        base = datetime(2024, 1, 15, 12, 0)
+        
+        scheduler.schedule("a", base + timedelta(minutes=5))
+        scheduler.schedule("a", base + timedelta(minutes=10))
+        scheduler.schedule("b", base + timedelta(minutes=1))
+        scheduler.cancel("b")
+        
+        assert scheduler.seconds_until_next(now=base) == 600
+        assert scheduler.pop_due(now=base + timedelta(minutes=5)) == []
+        assert scheduler.pop_due(now=base + timedelta(minutes=10)) == ["a"]
+    
+    def test_rebuild(self):
+        """測試以資料庫排程重建"""
+        scheduler = DeliveryScheduler()
+        base = datetime(2024, 1, 15, 12, 0)
+        
+        scheduler.rebuild([("a", base + timedelta(minutes=2)), ("b", base + timedelta(minutes=1))])
+        
+        assert "a" in scheduler
+        assert scheduler.pop_due(now=base + timedelta(minutes=1)) == ["b"]
+
+
+def test_notification_schedule_fields_normalized_to_utc():
+    """測試帶時區的排程時間轉為 UTC"""
+    notification = Notification(
+        type=NotificationType.QUESTION,
+        title="提醒",
+        content="30 分鐘後提醒",
+        deliver_at=datetime(2024, 1, 15, 20, 0, tzinfo=timezone(timedelta(hours=8)))
+    )
+    
+    assert notification.deliver_at == datetime(2024, 1, 15, 12, 0)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
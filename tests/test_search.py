@@ -0,0 +1,145 @@
+"""
+全文搜尋測試
+"""
+
+import pytest
+from datetime import datetime
+from sqlalchemy import text
+
+from src.shared.archive import ArchiveStore, NotificationArchiver
+from src.shared.database import DatabaseManager, NotificationRepository, NotificationTable
+from src.shared.models import Notification, NotificationResponse, NotificationStatus, NotificationType
+from src.shared.search import parse_query, segment
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """使用暫存 SQLite 檔案的通知資料存取物件"""
+    manager = DatabaseManager(f"sqlite:///{tmp_path / 'test.db'}")
+    manager.create_tables()
+    return NotificationRepository(manager)
+
+
+def create(repo, title, content, project_id=None):
+    return repo.create_notification(Notification(
+        type=NotificationType.QUESTION,
+        title=title,
+        content=content,
+        project_id=project_id
+    ))
+
+
+class TestQueryParsing:
+    """查詢字串處理測試"""
+    
+    def test_segments_cjk_characters(self):
+        """測試中文字元以空白分開，英文單字保持完整"""
+        assert segment("部署失敗 error").split() == ["部", "署", "失", "敗", "error"]
+    
+    def test_parse_query_drops_quotes_and_empty_terms(self):
+        """測試移除引號與沒有文字的詞組"""
+        assert parse_query('資料庫 "migration" ??') == ["資 料 庫", "migration"]
+        assert parse_query("  ") == []
+
+
+class TestNotificationSearch:
+    """通知全文搜尋測試"""
+    
+    def test_matches_title_content_and_responses(self, repo):
+        """測試搜尋標題、內容與回覆文字"""
+        deploy_id = create(repo, "部署到正式環境？", "請確認是否部署 v2.1")
+        create(repo, "資料庫遷移", "migration 已完成")
+        
+        assert [n.id for n, _ in repo.search_notifications("部署")] == [deploy_id]
+        assert repo.search_notifications("MIGRATION")[0][0].title == "資料庫遷移"
+        assert repo.search_notifications("署部") == []  # 以片語比對，字序不同不算符合
+        
+        assert repo.record_response(NotificationResponse(
+            notification_id=deploy_id, response_text="好的，週五下午再上線", user_id="u1"
+        ))
+        results = repo.search_notifications("上線")
+        assert [(n.id, hit.kind) for n, hit in results] == [(deploy_id, "response")]
+        assert results[0][0].status == NotificationStatus.REPLIED
+    
+    def test_ranks_title_matches_first_and_paginates(self, repo):
+        """測試標題符合的排序較前，並支援分頁"""
+        content_id = create(repo, "每日進度", "今天處理快取問題")
+        title_id = create(repo, "快取問題", "需要決定過期時間")
+        
+        assert [n.id for n, _ in repo.search_notifications("快取")] == [title_id, content_id]
+        assert [n.id for n, _ in repo.search_notifications("快取", limit=1, offset=1)] == [content_id]
+    
+    def test_project_scope_applied_before_pagination(self, repo):
+        """測試其他專案的結果排在前面時，限定專案的搜尋每頁仍有完整筆數，回覆也依通知的專案過濾"""
+        for index in range(5):
+            create(repo, f"快取問題 {index}", "快取", project_id="other")
+        own_ids = [create(repo, f"每日進度 {index}", "處理快取", project_id="p1") for index in range(3)]
+        repo.transition_status(own_ids[0], NotificationStatus.SENT)
+        repo.record_response(NotificationResponse(notification_id=own_ids[0], response_text="快取已清除", user_id="u1"))
+        
+        first_page = repo.search_notifications("快取", limit=2, project_id="p1")
+        second_page = repo.search_notifications("快取", limit=2, offset=2, project_id="p1")
+        
+        assert len(first_page) == 2 and len(second_page) == 2
+        assert {n.project_id for n, _ in first_page + second_page} == {"p1"}
+        assert {n.id for n, _ in first_page + second_page} == set(own_ids)
+        assert len(repo.search_notifications("快取", limit=20)) == 9
+    
+    def test_response_to_missing_notification(self, repo):
+        """測試回覆不存在的通知時不寫入"""
+        assert not repo.record_response(NotificationResponse(
+            notification_id="missing", response_text="收到", user_id="u1"
+        ))
+    
+    def test_rebuild_indexes_existing_rows(self, repo):
+        """測試既有資料庫新增索引表時補建索引"""
+        notification_id = create(repo, "舊通知", "升級前建立")
+        with repo.db_manager.engine.begin() as connection:
+            connection.execute(text("DROP TABLE notification_search"))
+        
+        repo.db_manager.create_tables()
+        
+        assert [n.id for n, _ in repo.search_notifications("升級")] == [notification_id]
+    
+    def test_rebuild_adds_project_column(self, repo):
+        """測試升級前沒有專案欄位的索引表會重建"""
+        notification_id = create(repo, "舊通知", "升級前建立", project_id="p1")
+        with repo.db_manager.engine.begin() as connection:
+            connection.execute(text("DROP TABLE notification_search"))
+            connection.execute(text(
+                "CREATE VIRTUAL TABLE notification_search USING fts5(notification_id UNINDEXED, kind UNINDEXED, title, body)"
+            ))
+        
+        repo.db_manager.create_tables()
+        
+        assert [n.id for n, _ in repo.search_notifications("升級", project_id="p1")] == [notification_id]
+
+    
+    def test_archiving_removes_index_rows(self, repo, tmp_path):
+        """測試封存通知時一併移除搜尋索引資料列（含回覆），索引不隨封存持續成長"""
+        ids = [create(repo, f"部署紀錄 {index}", "部署完成") for index in range(6)]
+        live_id = create(repo, "部署排程", "下週部署")
+        assert repo.record_response(NotificationResponse(notification_id=ids[0], response_text="部署順利", user_id="u1"))
+        with repo.db_manager.get_session() as session:
+            session.query(NotificationTable).filter(NotificationTable.id.in_(ids)).update({
+                NotificationTable.status: NotificationStatus.SENT,
+                NotificationTable.created_at: datetime(2026, 1, 10)
+            })
+            session.commit()
+        
+        def index_size():
+            with repo.db_manager.get_session() as session:
+                return session.execute(text("SELECT COUNT(*) FROM notification_search")).scalar()
+        
+        assert index_size() == 8
+        store = ArchiveStore(str(tmp_path / "archive"))
+        archiver = NotificationArchiver(repo, store, retention_days=30, chunk_size=100, chunk_pause_seconds=0)
+        assert archiver.run_once(datetime(2026, 6, 1)) == 6
+        
+        assert index_size() == 1
+        assert [n.id for n, _ in repo.search_notifications("部署")] == [live_id]
+        repo.archive_store = store
+        assert repo.get_notification(ids[0]).title == "部署紀錄 0"  # 封存的通知仍可依 ID 查詢
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,119 @@
+"""
+啟動與匯入測試
+進入點必須能在沒有環境變數的情況下匯入，且匯入時不建立設定、資料庫引擎或日誌處理器
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# MCP Server 匯入時間上限（毫秒），CI 機器較慢時可用環境變數放寬
+IMPORT_BUDGET_MS = int(os.environ.get("MCP_IMPORT_BUDGET_MS", "3000"))
+
+REQUIRED_ENV = ["DISCORD_BOT_TOKEN", "MCP_SERVER_API_KEY", "DISCORD_BOT_API_URL", "WEBHOOK_SECRET", "JWT_SECRET_KEY"]
+
+
+def run_python(code: str, tmp_path, *args: str) -> subprocess.CompletedProcess:
+    """在沒有必要環境變數的新直譯器中執行程式碼（工作目錄不含 .env）"""
+    env = {key: value for key, value in os.environ.items() if key not in REQUIRED_ENV}
+    env["PYTHONPATH"] = str(PROJECT_ROOT)
+    return subprocess.run(
+        [sys.executable, *args, "-c", code],
+        cwd=tmp_path, env=env, capture_output=True, text=True, timeout=60
+    )
+
+
+class TestLazyStartup:
+    """延遲初始化測試"""
+    
+    def test_config_import_without_env(self, tmp_path):
+        """測試匯入設定模組不讀取環境變數"""
+        result = run_python(
+            "from src.shared import config\n"
+            "assert config._settings is None\n"
+            "assert repr(config.settings) == 'LazySettings(not loaded)'\n",
+            tmp_path
+        )
+        assert result.returncode == 0, result.stderr
+    
+    def test_mcp_server_import_is_lazy(self, tmp_path):
+        """測試匯入 MCP Server 不建立設定、資料庫引擎，也不載入 discord"""
+        result = run_python(
+            "import sys, logging\n"
+            "import src.mcp_server.main as main\n"
+            "from src.shared import config, database\n"
+            "assert config._settings is None\n"
+            "assert database._db_manager is None\n"
+            "assert main._notification_service is None\n"
+            "assert not logging.getLogger().handlers\n"
+            "assert 'discord' not in sys.modules\n"
+            "assert 'uvicorn' not in sys.modules\n",
+            tmp_path
+        )
+        assert result.returncode == 0, result.stderr
+    
+    def test_discord_bot_import_without_env(self, tmp_path):
+        """測試匯入 Discord Bot 不需要環境變數"""
+        result = run_python(
+            "import src.discord_bot.main\n"
+            "from src.shared import config\n"
+            "assert config._settings is None\n",
+            tmp_path
+        )
+        assert result.returncode == 0, result.stderr
+    
+    def test_validate_settings_reports_missing_fields(self, tmp_path):
+        """測試缺少環境變數時列出欄位名稱"""
+        result = run_python(
+            "from src.shared.config import validate_settings\n"
+            "try:\n"
+            "    validate_settings('mcp_server')\n"
+            "except ValueError as e:\n"
+            "    assert 'MCP_SERVER_API_KEY' in str(e), e\n"
+            "else:\n"
+            "    raise AssertionError('應該要失敗')\n",
+            tmp_path
+        )
+        assert result.returncode == 0, result.stderr
+    
+    def test_bot_api_urls_accepts_either_setting(self, tmp_path):
+        """測試只設定 DISCORD_BOT_API_URLS 也能通過驗證，兩者都沒設定時回報清楚的錯誤"""
+        result = run_python(
+            "import os\n"
+            "os.environ.update(MCP_SERVER_API_KEY='k', WEBHOOK_SECRET='w', JWT_SECRET_KEY='j', DISCORD_BOT_TOKEN='t')\n"
+            "from src.shared.config import Settings, validate_settings\n"
+            "try:\n"
+            "    Settings().get_bot_api_urls()\n"
+            "except ValueError as e:\n"
+            "    assert 'DISCORD_BOT_API_URLS' in str(e), e\n"
+            "else:\n"
+            "    raise AssertionError('應該要失敗')\n"
+            "try:\n"
+            "    validate_settings('mcp_server')\n"
+            "except ValueError as e:\n"
+            "    assert 'DISCORD_BOT_API_URL 或 DISCORD_BOT_API_URLS' in str(e), e\n"
+            "else:\n"
+            "    raise AssertionError('應該要失敗')\n"
+            "os.environ['DISCORD_BOT_API_URLS'] = 'http://a/, http://b'\n"
+            "assert Settings().get_bot_api_urls() == ['http://a', 'http://b']\n",
+            tmp_path
+        )
+        assert result.returncode == 0, result.stderr
+    
+    def test_mcp_server_import_time_budget(self, tmp_path):
+        """以 -X importtime 量測 MCP Server 匯入時間"""
+        result = run_python("import src.mcp_server.main", tmp_path, "-X", "importtime")
+        assert result.returncode == 0, result.stderr
+        
+        line = next(line for line in result.stderr.splitlines() if line.endswith("| src.mcp_server.main"))
+        cumulative_us = int(line.split("|")[1])
+        assert cumulative_us / 1000 < IMPORT_BUDGET_MS
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
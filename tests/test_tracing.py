@@ -0,0 +1,100 @@
+"""
+分散式追蹤測試
+"""
+
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.shared import tracing
+from src.shared.tracing import (
+    OTLPJsonExporter, TracingMiddleware, current_span, extract_metadata, inject_metadata,
+    parse_traceparent, start_span
+)
+
+
+TRACEPARENT = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+
+
+class TestTraceContext:
+    """追蹤上下文測試"""
+    
+    def test_parse_traceparent(self):
+        """測試解析與格式化 traceparent"""
+        context = parse_traceparent(TRACEPARENT)
+        assert context.trace_id == "4bf92f3577b34da6a3ce929d0e0e4736"
+        assert context.span_id == "00f067aa0ba902b7"
+        assert context.traceparent == TRACEPARENT
+        
+        assert parse_traceparent("invalid") is None
+        assert parse_traceparent("00-" + "0" * 32 + "-00f067aa0ba902b7-01") is None
+    
+    def test_nested_spans_share_trace(self):
+        """測試巢狀 span 接續同一條追蹤，離開後還原上一層"""
+        with start_span("parent") as parent:
+            with start_span("child") as child:
+                assert current_span() is child
+                assert child.context.trace_id == parent.context.trace_id
+                assert child.parent_span_id == parent.context.span_id
+            assert current_span() is parent
+        assert current_span() is None
+        assert child.duration_ms is not None
+    
+    def test_metadata_round_trip(self):
+        """測試追蹤上下文存入通知 metadata 後可接續"""
+        metadata = {}
+        with start_span("create") as span:
+            inject_metadata(metadata)
+        
+        with start_span("dispatch", parent=extract_metadata(metadata)) as dispatch:
+            assert dispatch.context.trace_id == span.context.trace_id
+            assert dispatch.parent_span_id == span.context.span_id
+        
+        assert extract_metadata({}) is None
+
+
+class TestTracingMiddleware:
+    """追蹤中介層測試"""
+    
+    def test_continues_incoming_trace(self):
+        """測試請求接續 traceparent 標頭的追蹤"""
+        app = FastAPI()
+        app.add_middleware(TracingMiddleware)
+        
+        @app.get("/trace")
+        async def trace():
+            span = current_span()
+            return {"trace_id": span.context.trace_id, "parent": span.parent_span_id}
+        
+        client = TestClient(app)
+        data = client.get("/trace", headers={"traceparent": TRACEPARENT}).json()
+        assert data == {"trace_id": "4bf92f3577b34da6a3ce929d0e0e4736", "parent": "00f067aa0ba902b7"}
+
+
+class TestOTLPJsonExporter:
+    """OTLP 匯出器測試"""
+    
+    def test_writes_otlp_json_lines(self, tmp_path, monkeypatch):
+        """測試 span 以 OTLP/JSON 寫入檔案"""
+        path = tmp_path / "traces.jsonl"
+        exporter = OTLPJsonExporter("test-service", file_path=str(path), flush_seconds=0.05)
+        exporter.start()
+        monkeypatch.setattr(tracing, "_exporter", exporter)
+        
+        with start_span("notification.dispatch", attributes={"notification.id": "n1", "guild": None}):
+            pass
+        exporter.shutdown()
+        
+        payload = json.loads(path.read_text(encoding="utf-8").splitlines()[0])
+        resource_spans = payload["resourceSpans"][0]
+        assert resource_spans["resource"]["attributes"][0]["value"]["stringValue"] == "test-service"
+        span = resource_spans["scopeSpans"][0]["spans"][0]
+        assert span["name"] == "notification.dispatch"
+        assert span["attributes"] == [{"key": "notification.id", "value": {"stringValue": "n1"}}]
+        assert int(span["endTimeUnixNano"]) >= int(span["startTimeUnixNano"])
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,86 @@
+"""
+資料庫單一寫入執行緒測試
+"""
+
+import threading
+import time
+
+import pytest
+from sqlalchemy import text
+
+from src.shared.database import DatabaseManager, NotificationRepository, NotificationTable
+from src.shared.models import Notification, NotificationType
+
+
+@pytest.fixture
+def db_manager(tmp_path):
+    manager = DatabaseManager(f"sqlite:///{tmp_path / 'test.db'}")
+    manager.create_tables()
+    manager.writer.start()
+    yield manager
+    manager.writer.stop()
+
+
+def make_notification(index):
+    return Notification(type=NotificationType.STATUS, title=f"通知 {index}", content="內容")
+
+
+class TestDatabaseWriter:
+    """單一寫入執行緒測試"""
+    
+    def test_sqlite_pragmas_applied(self, db_manager):
+        """測試連線套用 WAL 等 PRAGMA"""
+        with db_manager.get_session() as session:
+            assert session.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+            assert session.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+            assert session.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+    
+    def test_concurrent_writes_are_group_committed(self, db_manager):
+        """測試多執行緒並行寫入全部成功且合併提交"""
+        repo = NotificationRepository(db_manager)
+        commits = []
+        original_factory = db_manager.writer.session_factory
+        
+        def counting_factory():
+            session = original_factory()
+            original_commit = session.commit
+            session.commit = lambda: (commits.append(1), original_commit())
+            return session
+        
+        db_manager.writer.session_factory = counting_factory
+        
+        # 先以阻塞的操作佔住寫入執行緒，讓並行寫入全部排入佇列
+        release = threading.Event()
+        blocker = db_manager.writer.submit(lambda session: release.wait(5))
+        threads = [threading.Thread(target=repo.create_notification, args=(make_notification(i),)) for i in range(50)]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + 5
+        while db_manager.writer._queue.qsize() < 50 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+        
+        assert blocker.result() is True
+        assert len(repo.get_pending_notifications()) == 50
+        assert len(commits) <= 2  # 阻塞操作一次，排隊的 50 筆合併為一次
+    
+    def test_failed_operation_does_not_fail_batch(self, db_manager):
+        """測試批次中單一操作失敗不影響其他操作"""
+        def insert(notification_id):
+            def operation(session):
+                session.add(NotificationTable(id=notification_id, type=NotificationType.STATUS, title="t", content="c"))
+                return notification_id
+            return operation
+        
+        futures = [db_manager.writer.submit(insert(notification_id)) for notification_id in ("a", "a", "b")]
+        
+        assert futures[0].result() == "a"
+        with pytest.raises(Exception):
+            futures[1].result()
+        assert futures[2].result() == "b"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])